@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+"""
+Latency comparison: sklearn predict vs compiled NumPy evaluators
+Run from the Heart-Disease-Prediction-System directory after exporting
+the compiled models (python train_and_save_models.py --export-only).
+"""
+
+import pickle
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from health.compiled_models import EVALUATORS, load_compiled
+from health.model_registry import FEATURE_COLUMNS
+
+warnings.filterwarnings('ignore')
+
+
+def time_call(fn, repeats):
+    """Return per-call latencies in milliseconds"""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return np.array(times)
+
+
+def main(repeats=300):
+    X = pd.read_csv('Machine_Learning/heart.csv')[FEATURE_COLUMNS]
+    compiled = load_compiled('trained_models/heart_models.bundle')
+    row_df = X.iloc[:1]
+    row = row_df.values.astype(np.float64)
+    batch_df = X
+    batch = X.values.astype(np.float64)
+
+    print("=" * 78)
+    print("SKLEARN vs COMPILED NUMPY INFERENCE")
+    print("=" * 78)
+    print(f"{'Model':<22}{'sklearn 1 row':>14}{'numpy 1 row':>14}{'speedup':>9}"
+          f"{'sklearn ' + str(len(X)):>13}{'numpy ' + str(len(X)):>11}")
+    print("-" * 78)
+
+    for model_key in EVALUATORS:
+        with open(f'trained_models/{model_key}.pkl', 'rb') as f:
+            model = pickle.load(f)
+        evaluator = compiled[model_key]
+
+        sk_row = np.median(time_call(lambda: model.predict(row_df), repeats))
+        np_row = np.median(time_call(lambda: evaluator.predict(row), repeats))
+        sk_batch = np.median(time_call(lambda: model.predict(batch_df), 20))
+        np_batch = np.median(time_call(lambda: evaluator.predict(batch), 20))
+
+        print(f"{model_key:<22}{sk_row:>12.3f}ms{np_row:>12.3f}ms{sk_row / np_row:>8.1f}x"
+              f"{sk_batch:>11.2f}ms{np_batch:>9.2f}ms")
+
+    print("-" * 78)
+    print("Latencies are medians; batch columns score the full heart.csv.")
+
+
+if __name__ == "__main__":
+    main()
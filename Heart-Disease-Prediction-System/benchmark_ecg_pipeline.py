@@ -0,0 +1,302 @@
+#!/usr/bin/env python
+"""
+ECG feature extraction benchmark on the sample images in media/ecg_images
+1. files: image -> 3060 signal features with the previous file-based
+   pipeline (12 one-row CSVs written to a temp directory after os.chdir,
+   then read back with pandas) and with the in-memory pipeline in
+   health/ecg_predictor.py, checking that both produce the same features.
+2. threads: single-image latency with the leads extracted on 1, 2, 4 ...
+   threads (ECGPredictor(lead_workers=n)). The gain depends on the cores
+   available; on a single-core host only the threading overhead shows.
+3. crop: leads from resizing the whole grayscale image (divide_leads of
+   gray_image) vs cropping each lead region first (crop_leads), time and
+   peak allocation per image. --scan-sizes adds synthetic uploads, the
+   first sample image upscaled to phone-camera sizes.
+4. decode: full-size RGB decode vs the reduced grayscale JPEG decode
+   (get_image with min_shape), time and peak RSS growth of a fresh
+   process per decode (Pillow's buffers are not visible to tracemalloc;
+   Linux only), plus how
+   far the features move. --decode-sizes sets the synthetic JPEG uploads.
+5. batch: every image through extract_features + the projection one at a
+   time (the upload_ecg path) vs extract_features_batch on the image pool
+   and one projection call for the whole matrix (the batch API path).
+   The pool size comes from ECG_BATCH_WORKERS. The classifier call is
+   left out, since the ensemble may not be installed.
+
+Usage:
+    python benchmark_ecg_pipeline.py
+    python benchmark_ecg_pipeline.py --only threads --workers 1 2 4 8
+    python benchmark_ecg_pipeline.py --repeats 5 --images media/ecg_images/HB2.jpg
+    python benchmark_ecg_pipeline.py --only crop --scan-sizes 3264x2448 4032x3024
+    python benchmark_ecg_pipeline.py --only decode --decode-sizes 4608x3456 8064x6048
+    ECG_BATCH_WORKERS=4 python benchmark_ecg_pipeline.py --only batch
+"""
+
+import argparse
+import glob
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+
+import numpy as np
+import pandas as pd
+from skimage import measure
+from skimage.filters import gaussian, threshold_otsu
+from skimage.transform import resize
+from skimage.util import img_as_ubyte
+from PIL import Image
+from sklearn.preprocessing import MinMaxScaler
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'health_desease.settings')
+import django  # noqa: E402
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from health.ecg_predictor import WORKING_SHAPE, ECGPredictor  # noqa: E402
+
+warnings.filterwarnings('ignore')
+
+SAMPLE_IMAGES = 'media/ecg_images/*'
+
+
+def file_based_features(predictor, image_path):
+    """The pipeline as it was before: per-lead CSV files in a temp directory"""
+    leads = predictor.divide_leads(predictor.gray_image(predictor.get_image(image_path)))
+    temp_dir = tempfile.mkdtemp()
+    original_dir = os.getcwd()
+    os.chdir(temp_dir)
+    try:
+        for lead_no, lead in enumerate(leads[:12]):
+            blurred_image = gaussian(lead, sigma=0.7)
+            binary_global = resize(blurred_image < threshold_otsu(blurred_image), (300, 450))
+            contours = measure.find_contours(binary_global, 0.8)
+            contours_shape = sorted([c.shape for c in contours])[::-1][0:1]
+            for contour in contours:
+                if contour.shape in contours_shape:
+                    test = resize(contour, (255, 2))
+            scaled = MinMaxScaler().fit_transform(test)
+            pd.DataFrame(scaled[:, 0], columns=['X']).T.to_csv(f'Scaled_1DLead_{lead_no + 1}.csv', index=False)
+
+        # Lead files in numeric order (what natsorted gave)
+        files = sorted((f for f in os.listdir('.') if f.endswith('.csv')),
+                       key=lambda name: int(name[len('Scaled_1DLead_'):-len('.csv')]))
+        return pd.concat([pd.read_csv(f) for f in files], axis=1, ignore_index=True).values
+    finally:
+        os.chdir(original_dir)
+        shutil.rmtree(temp_dir)
+
+
+def median_seconds(fn, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return float(np.median(times))
+
+
+def files_vs_memory(images, repeats):
+    predictor = ECGPredictor(lead_workers=1)
+    print("=" * 78)
+    print("ECG FEATURE EXTRACTION: file-based vs in-memory")
+    print("=" * 78)
+    print(f"{'Image':<36}{'Size':>12}{'Files':>10}{'In-memory':>11}{'Max diff':>9}")
+    print("-" * 78)
+    totals = []
+    for image_path in images:
+        name = os.path.basename(image_path)
+        try:
+            features = predictor.extract_features(image_path)
+        except ValueError as e:
+            print(f"{name[:35]:<36}skipped: {e}")
+            continue
+        diff = np.abs(file_based_features(predictor, image_path) - features).max()
+        before = median_seconds(lambda: file_based_features(predictor, image_path), repeats)
+        after = median_seconds(lambda: predictor.extract_features(image_path), repeats)
+        totals.append((before, after))
+        height, width = predictor.get_image(image_path).shape[:2]
+        print(f"{name[:35]:<36}{f'{width}x{height}':>12}{before * 1000:>8.0f}ms{after * 1000:>9.0f}ms{diff:>9.0e}")
+    print("-" * 78)
+    before, after = np.mean(totals, axis=0)
+    print(f"Mean over {len(totals)} images: {before * 1000:.0f}ms -> {after * 1000:.0f}ms "
+          f"({(1 - after / before) * 100:.0f}% less)")
+    print("Differences of ~1e-16 come from the float round trip through the CSV files.")
+
+
+def lead_threads(images, repeats, worker_counts):
+    predictors = {n: ECGPredictor(lead_workers=n) for n in worker_counts}
+    times = {n: [] for n in worker_counts}
+    reference = predictors[worker_counts[0]]
+    for image_path in images:
+        try:
+            expected = reference.extract_features(image_path)
+        except ValueError:
+            continue
+        for n, predictor in predictors.items():
+            assert np.array_equal(predictor.extract_features(image_path), expected)
+            times[n].append(median_seconds(lambda: predictor.extract_features(image_path), repeats))
+
+    print("=" * 78)
+    print(f"PARALLEL LEAD EXTRACTION ({os.cpu_count()} CPUs, {len(times[worker_counts[0]])} images)")
+    print("=" * 78)
+    print(f"{'Threads':>8}{'Mean':>12}{'Median':>12}{'Speedup':>10}")
+    print("-" * 78)
+    base = np.mean(times[worker_counts[0]])
+    for n in worker_counts:
+        print(f"{n:>8}{np.mean(times[n]) * 1000:>10.0f}ms{np.median(times[n]) * 1000:>10.0f}ms"
+              f"{base / np.mean(times[n]):>9.2f}x")
+
+
+def peak_allocation(fn):
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def full_vs_cropped(images, repeats, scan_sizes):
+    predictor = ECGPredictor(lead_workers=1)
+    uploads = [(os.path.basename(path), predictor.get_image(path)) for path in images]
+    base = uploads[0][1]
+    for size in scan_sizes:
+        width, height = (int(n) for n in size.split('x'))
+        uploads.append((f'{uploads[0][0]} as scan', img_as_ubyte(resize(base, (height, width)))))
+
+    print("=" * 78)
+    print("LEAD EXTRACTION: resize whole image vs crop regions first")
+    print("=" * 78)
+    print(f"{'Image':<28}{'Size':>11}{'Full':>9}{'Cropped':>9}{'Peak full':>11}{'Peak crop':>11}")
+    print("-" * 78)
+    mb = 1024 * 1024
+    totals = []
+    for name, image in uploads:
+        full = lambda: predictor.divide_leads(predictor.gray_image(image))[:12]
+        cropped = lambda: predictor.crop_leads(image, 12)
+        diff = max(np.abs(a - b).max() for a, b in zip(full(), cropped()))
+        assert diff < 1e-9, f'{name}: leads differ by {diff}'
+        before, after = median_seconds(full, repeats), median_seconds(cropped, repeats)
+        totals.append((before, after))
+        height, width = image.shape[:2]
+        print(f"{name[:27]:<28}{f'{width}x{height}':>11}{before * 1000:>7.0f}ms{after * 1000:>7.0f}ms"
+              f"{peak_allocation(full) / mb:>9.1f}MB{peak_allocation(cropped) / mb:>9.1f}MB")
+    print("-" * 78)
+    before, after = np.mean(totals, axis=0)
+    print(f"Mean over {len(totals)} images: {before * 1000:.0f}ms -> {after * 1000:.0f}ms")
+
+
+DECODE = '''
+import json, sys, time
+from health.ecg_predictor import WORKING_SHAPE, ECGPredictor
+
+def status(field):
+    with open('/proc/self/status') as f:
+        return next(int(line.split()[1]) * 1024 for line in f if line.startswith(field + ':'))
+
+path, reduced = sys.argv[1], sys.argv[2] == 'True'
+predictor = ECGPredictor(lead_workers=1, reduced_decode=reduced)
+with open('/proc/self/clear_refs', 'w') as f:
+    f.write('5')  # reset the peak RSS (VmHWM) left behind by the imports
+before = status('VmRSS')
+start = time.perf_counter()
+image = predictor.get_image(path, min_shape=WORKING_SHAPE)
+seconds = time.perf_counter() - start
+print(json.dumps({'seconds': seconds, 'peak_bytes': status('VmHWM') - before, 'shape': image.shape}))
+'''
+
+
+def decode_in_subprocess(path, reduced, repeats):
+    runs = [json.loads(subprocess.check_output([sys.executable, '-W', 'ignore', '-c', DECODE, path, str(reduced)],
+                                               text=True).strip().splitlines()[-1])
+            for _ in range(repeats)]
+    runs.sort(key=lambda r: r['seconds'])
+    return runs[len(runs) // 2]
+
+
+def full_vs_reduced_decode(images, repeats, scan_sizes):
+    full_predictor = ECGPredictor(lead_workers=1, reduced_decode=False)
+    reduced_predictor = ECGPredictor(lead_workers=1, reduced_decode=True)
+    base = Image.open(images[0]).convert('RGB')
+    scans_dir = tempfile.mkdtemp()
+
+    print("=" * 78)
+    print(f"JPEG DECODE: full RGB vs reduced grayscale (working grid {WORKING_SHAPE[1]}x{WORKING_SHAPE[0]})")
+    print("=" * 78)
+    print(f"{'Upload':>11}{'Decoded':>16}{'Full':>9}{'Reduced':>9}{'Peak full':>11}{'Peak red.':>11}{'Feat diff':>11}")
+    print("-" * 78)
+    mb = 1024 * 1024
+    try:
+        for size in scan_sizes:
+            width, height = (int(n) for n in size.split('x'))
+            path = os.path.join(scans_dir, f'scan_{size}.jpg')
+            base.resize((width, height), Image.BILINEAR).save(path, quality=90)
+            full = decode_in_subprocess(path, False, repeats)
+            reduced = decode_in_subprocess(path, True, repeats)
+            diff = np.abs(full_predictor.extract_features(path) - reduced_predictor.extract_features(path)).mean()
+            decoded = 'x'.join(str(n) for n in reversed(reduced['shape'][:2]))
+            print(f"{size:>11}{decoded:>16}{full['seconds'] * 1000:>7.0f}ms{reduced['seconds'] * 1000:>7.0f}ms"
+                  f"{full['peak_bytes'] / mb:>9.1f}MB{reduced['peak_bytes'] / mb:>9.1f}MB{diff:>11.4f}")
+    finally:
+        shutil.rmtree(scans_dir)
+    print("-" * 78)
+    print("Feat diff is the mean absolute change of the 3060 features (all in [0, 1]).")
+    print("Uploads under twice the working grid decode at full size either way.")
+
+
+def one_by_one_vs_batch(images, repeats):
+    predictor = ECGPredictor(lead_workers=1)
+    images = [path for path in images if not isinstance(predictor.extract_features_batch([path])[0], Exception)]
+
+    def one_by_one():
+        return np.vstack([predictor.dimensional_reduction(predictor.extract_features(path)) for path in images])
+
+    def batch():
+        features = predictor.extract_features_batch(images)
+        return predictor.dimensional_reduction(np.vstack(features))
+
+    diff = np.abs(one_by_one() - batch()).max()
+    before, after = median_seconds(one_by_one, repeats), median_seconds(batch, repeats)
+    print("=" * 78)
+    print(f"BATCH ANALYSIS: {len(images)} images, features + projection "
+          f"({settings.ECG_BATCH_WORKERS} image threads, {os.cpu_count()} CPUs)")
+    print("=" * 78)
+    print(f"One at a time:   {before * 1000:>8.0f}ms  ({before / len(images) * 1000:.0f}ms per image)")
+    print(f"Batch:           {after * 1000:>8.0f}ms  ({after / len(images) * 1000:.0f}ms per image, "
+          f"{before / after:.2f}x)")
+    print(f"Max difference of the projected features: {diff:.1e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', nargs='+', default=sorted(glob.glob(SAMPLE_IMAGES)))
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--only', choices=['files', 'threads', 'crop', 'decode', 'batch'], help='Run one section')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4],
+                        help='Lead extraction thread counts to compare')
+    parser.add_argument('--scan-sizes', nargs='*', default=['3264x2448', '4032x3024'],
+                        help='WIDTHxHEIGHT of synthetic scans added to the crop section')
+    parser.add_argument('--decode-sizes', nargs='*', default=['3264x2448', '4608x3456', '6000x4000', '8064x6048'],
+                        help='WIDTHxHEIGHT of the JPEG uploads in the decode section')
+    args = parser.parse_args()
+
+    if args.only in (None, 'files'):
+        files_vs_memory(args.images, args.repeats)
+    if args.only in (None, 'threads'):
+        lead_threads(args.images, args.repeats, args.workers)
+    if args.only in (None, 'crop'):
+        full_vs_cropped(args.images, args.repeats, args.scan_sizes)
+    if args.only in (None, 'decode'):
+        full_vs_reduced_decode(args.images, args.repeats, args.decode_sizes)
+    if args.only in (None, 'batch'):
+        one_by_one_vs_batch(args.images, args.repeats)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+"""
+ECG standardize + PCA step: sklearn vs NumPy vs the fused float32 projection
+For 1, 16 and 256 feature vectors of 3060 signal points:
+- sklearn: StandardScaler.transform then PCA.transform on a DataFrame
+  (how the original pipeline called them) and on an array
+- two-step: StandardScalerTransform + PCATransform in float64 (the bundle
+  arrays, as served before the fold)
+- fused: ProjectionTransform, one float32 x @ weights + offset
+and the largest difference of each from sklearn.
+
+Usage:
+    python export_model_bundles.py   # once, to write the projection entry
+    python benchmark_ecg_projection.py
+"""
+
+import os
+import time
+import warnings
+
+import joblib
+import numpy as np
+import pandas as pd
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'health_desease.settings')
+import django  # noqa: E402
+django.setup()
+
+from health.compiled_models import PCATransform, ProjectionTransform, StandardScalerTransform  # noqa: E402
+from health.model_bundle import ModelBundle  # noqa: E402
+
+warnings.filterwarnings('ignore')
+
+
+def median_ms(fn, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return float(np.median(times)) * 1000
+
+
+def main():
+    scaler = joblib.load('trained_models/scaler_ECG.pkl')
+    pca = joblib.load('trained_models/PCA_ECG (1).pkl')
+    bundle = ModelBundle('trained_models/ecg_models.bundle')
+    scaler_arrays = StandardScalerTransform(**bundle.arrays('scaler'))
+    pca_arrays = PCATransform(**bundle.arrays('pca'), **bundle.params('pca'))
+    projection = ProjectionTransform(**bundle.arrays('projection'))
+
+    paths = {
+        'sklearn (DataFrame)': lambda X: pca.transform(scaler.transform(pd.DataFrame(X))),
+        'sklearn (array)': lambda X: pca.transform(scaler.transform(X)),
+        'two-step float64': lambda X: pca_arrays.transform(scaler_arrays.transform(X)),
+        'fused float32': projection.transform,
+    }
+
+    print("=" * 78)
+    print(f"ECG STANDARDIZE + PCA ({scaler.n_features_in_} -> {pca.n_components_} features)")
+    print("=" * 78)
+    print(f"{'Path':<22}" + ''.join(f"{f'{n} rows':>14}" for n in (1, 16, 256)) + f"{'Max error':>14}")
+    print("-" * 78)
+    rng = np.random.default_rng(0)
+    batches = {n: rng.random((n, scaler.n_features_in_)) for n in (1, 16, 256)}
+    expected = pca.transform(scaler.transform(batches[256]))
+    for name, fn in paths.items():
+        timings = [median_ms(lambda: fn(X), max(5, 2000 // len(X))) for X in batches.values()]
+        error = np.abs(fn(batches[256]) - expected).max()
+        print(f"{name:<22}" + ''.join(f"{t:>12.3f}ms" for t in timings) + f"{error:>14.1e}")
+    print("-" * 78)
+    print(f"Projected values reach {np.abs(expected).max():.1f}; the fused weights take "
+          f"{projection.weights.nbytes / 1e6:.1f}MB vs {(pca_arrays.components.nbytes + 2 * scaler_arrays.mean.nbytes) / 1e6:.1f}MB.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+"""
+Random Forest: compact node table vs the previous layout and sklearn
+1. Batch scoring time for the previous per-level traversal (int64/float64
+   node arrays, active-node mask), the packed traversal in
+   health/compiled_models.py and sklearn's predict.
+2. Per-worker memory of a fresh process that loads the registry and
+   serves one prediction, with every pickle unpickled up front (previous
+   behaviour) and with compiled models unpickled on demand.
+
+RssAnon is private memory each gunicorn worker pays for separately;
+RssFile is page cache backed by the bundle files, shared between workers.
+
+Usage:
+    python train_and_save_models.py --export-only   # once, to write the bundle
+    python benchmark_forest_layout.py
+"""
+
+import json
+import os
+import pickle
+import subprocess
+import sys
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'health_desease.settings')
+import django  # noqa: E402
+django.setup()
+
+from health.compiled_models import load_compiled  # noqa: E402
+from health.feature_schema import FEATURE_COLUMNS  # noqa: E402
+
+warnings.filterwarnings('ignore')
+
+
+def previous_leaves(forest, X):
+    """Traversal used before the packed layout: int64/float64 arrays, explicit leaf mask"""
+    n = len(forest.children)
+    nodes = np.arange(n)
+    is_leaf = forest.children[:, 0] == nodes
+    feature = forest.feature.astype(np.intp)
+    threshold = forest.threshold.astype(np.float64)
+    left = np.where(is_leaf, -1, forest.children[:, 0]).astype(np.intp)
+    right = np.where(is_leaf, -1, forest.children[:, 1]).astype(np.intp)
+    X = np.asarray(X, dtype=np.float32).astype(np.float64)
+    rows = np.arange(X.shape[0])[:, None]
+    node = np.broadcast_to(forest.roots.astype(np.intp), (X.shape[0], len(forest.roots))).copy()
+    while True:
+        children_left = left[node]
+        active = children_left != -1
+        if not active.any():
+            return node
+        go_left = X[rows, feature[node]] <= threshold[node]
+        node = np.where(active, np.where(go_left, children_left, right[node]), node)
+
+
+def best_of(fn, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return float(np.median(times)) * 1000
+
+
+def batch_speed(sizes):
+    forest = load_compiled('trained_models/heart_models.bundle')['random_forest']
+    with open('trained_models/random_forest.pkl', 'rb') as f:
+        model = pickle.load(f)
+    df = pd.read_csv('Machine_Learning/heart.csv')
+    data = df[FEATURE_COLUMNS].values.astype(np.float64)
+
+    print(f"{'Rows':>8}{'Previous':>14}{'Packed':>14}{'sklearn':>14}{'Speedup':>10}")
+    print("-" * 60)
+    for size in sizes:
+        X = data[np.random.RandomState(size).randint(0, len(data), size)]
+        X_df = pd.DataFrame(X, columns=FEATURE_COLUMNS)
+        assert (previous_leaves(forest, X) == forest.leaves(X)).all()
+        repeats = max(3, min(200, 20000 // size))
+        previous = best_of(lambda: previous_leaves(forest, X), repeats)
+        packed = best_of(lambda: forest.leaves(X), repeats)
+        sklearn = best_of(lambda: model.predict(X_df), repeats)
+        print(f"{size:>8,}{previous:>12.2f}ms{packed:>12.2f}ms{sklearn:>12.2f}ms{previous / packed:>9.1f}x")
+
+
+WORKER = '''
+import json, os, warnings
+warnings.filterwarnings('ignore')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'health_desease.settings')
+import django
+django.setup()
+import numpy as np, pandas, sklearn.ensemble, sklearn.tree, sklearn.neighbors, sklearn.linear_model, sklearn.naive_bayes
+from health.model_registry import ModelRegistry
+
+def memory():
+    fields = {}
+    with open('/proc/self/status') as f:
+        for line in f:
+            key, _, value = line.partition(':')
+            if key in ('RssAnon', 'RssFile'):
+                fields[key] = int(value.split()[0]) * 1024
+    return fields
+
+before = memory()
+loaded = ModelRegistry().get()
+if EAGER:
+    for key in loaded.models:
+        loaded.models[key]
+loaded.predict_all(np.array([[57, 0, 1, 130, 236, 0, 0, 174, 0, 0.0, 1, 1, 2]], dtype=np.float64))
+after = memory()
+print(json.dumps({'anon_bytes': after['RssAnon'] - before['RssAnon'],
+                  'file_bytes': after['RssFile'] - before['RssFile']}))
+'''
+
+
+def worker_memory(eager, repeats=5):
+    results = []
+    for _ in range(repeats):
+        output = subprocess.check_output([sys.executable, '-c', f'EAGER = {eager}\n' + WORKER], text=True)
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    results.sort(key=lambda r: r['anon_bytes'])
+    return results[len(results) // 2]
+
+
+def main():
+    print("=" * 60)
+    print("RANDOM FOREST BATCH SCORING (100 trees)")
+    print("=" * 60)
+    batch_speed([1, 100, 256, 10000])
+
+    print()
+    print("=" * 60)
+    print("PER-WORKER MEMORY: registry load + one prediction")
+    print("=" * 60)
+    eager = worker_memory(True)
+    lazy = worker_memory(False)
+    mb = 1024 * 1024
+    print(f"{'':<28}{'Private':>12}{'Shared':>12}")
+    print(f"{'Unpickle everything':<28}{eager['anon_bytes'] / mb:>10.1f}MB{eager['file_bytes'] / mb:>10.1f}MB")
+    print(f"{'Compiled, unpickle on demand':<28}{lazy['anon_bytes'] / mb:>10.1f}MB{lazy['file_bytes'] / mb:>10.1f}MB")
+    saved = eager['anon_bytes'] - lazy['anon_bytes']
+    print(f"Private memory saved per worker: {saved / mb:.1f}MB "
+          f"({saved * 4 / mb:.1f}MB across 4 workers)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+"""
+Update cost: full retraining vs incremental updates
+Times fitting all five models from scratch on N historical rows against
+folding a batch of new confirmed cases into Naive Bayes and Logistic
+Regression (health/incremental.py). Training sets are heart.csv
+resampled to N rows.
+
+Usage:
+    python benchmark_incremental_updates.py
+    python benchmark_incremental_updates.py --sizes 1000 10000 100000 --new 100 1000
+"""
+
+import argparse
+import os
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'health_desease.settings')
+import django  # noqa: E402
+django.setup()
+
+from health.feature_schema import FEATURE_COLUMNS  # noqa: E402
+from health.incremental import apply_update, init_state  # noqa: E402
+from health.training import fit_arrays  # noqa: E402
+
+warnings.filterwarnings('ignore')
+
+
+def resample(df, n, seed):
+    rows = df.sample(n, replace=True, random_state=seed)
+    return rows[FEATURE_COLUMNS].values.astype(np.float32), rows['target'].values
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000],
+                        help='Historical training set sizes')
+    parser.add_argument('--new', type=int, nargs='+', default=[100, 1000],
+                        help='Confirmed cases per incremental update')
+    args = parser.parse_args()
+
+    df = pd.read_csv('Machine_Learning/heart.csv')
+
+    print("=" * 70)
+    print("FULL RETRAIN vs INCREMENTAL UPDATE")
+    print("=" * 70)
+    print(f"{'History rows':>12}{'Full retrain':>16}" + ''.join(f"{'+' + str(n) + ' cases':>18}" for n in args.new))
+    print("-" * 70)
+    for size in args.sizes:
+        X, y = resample(df, size, seed=size)
+        start = time.perf_counter()
+        models, _ = fit_arrays(X, y)
+        full = time.perf_counter() - start
+
+        state = init_state(models)
+        updates = []
+        for n in args.new:
+            X_new, y_new = resample(df, n, seed=n)
+            start = time.perf_counter()
+            apply_update(models, state, X_new, y_new)
+            updates.append(time.perf_counter() - start)
+
+        print(f"{size:>12,}{full:>14.2f}s" + ''.join(
+            f"{u * 1000:>9.1f}ms ({full / u:>4.0f}x)" for u in updates))
+    print("-" * 70)
+    print("Full retrain fits all five models; incremental updates refit only")
+    print("Naive Bayes and Logistic Regression, and cost depends on the number")
+    print("of new cases rather than on the size of the history.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+"""
+Cold load benchmark: pickles/joblib vs memory-mapped model bundles
+Each measurement runs in a fresh Python process, loads every tabular and
+ECG model, scores one input and reports wall time and memory growth.
+
+RssAnon is private memory that every gunicorn worker pays for separately;
+RssFile is page cache backed by the bundle files, shared between workers.
+
+Usage:
+    python export_model_bundles.py   # once, to create the bundles
+    python benchmark_model_bundles.py
+"""
+
+import json
+import subprocess
+import sys
+
+PICKLE_LOADER = '''
+import pickle, joblib
+import numpy as np
+import pandas as pd
+cols = ['age','sex','cp','trestbps','chol','fbs','restecg','thalach','exang','oldpeak','slope','ca','thal']
+row = pd.DataFrame([[57, 0, 1, 130, 236, 0, 0, 174, 0, 0.0, 1, 1, 2]], columns=cols)
+for name in ['logistic_regression', 'random_forest', 'decision_tree', 'knn', 'naive_bayes']:
+    with open(f'trained_models/{name}.pkl', 'rb') as f:
+        pickle.load(f).predict(row)
+scaler = joblib.load('trained_models/scaler_ECG.pkl')
+pca = joblib.load('trained_models/PCA_ECG (1).pkl')
+pca.transform(scaler.transform(np.zeros((1, scaler.n_features_in_))))
+'''
+
+BUNDLE_LOADER = '''
+import numpy as np
+from health.compiled_models import load_compiled, StandardScalerTransform, PCATransform
+from health.model_bundle import ModelBundle
+row = np.array([[57, 0, 1, 130, 236, 0, 0, 174, 0, 0.0, 1, 1, 2]], dtype=np.float64)
+for evaluator in load_compiled('trained_models/heart_models.bundle').values():
+    evaluator.predict(row)
+bundle = ModelBundle('trained_models/ecg_models.bundle')
+scaler = StandardScalerTransform(**bundle.arrays('scaler'))
+pca = PCATransform(**bundle.arrays('pca'), **bundle.params('pca'))
+pca.transform(scaler.transform(np.zeros((1, scaler.mean.shape[0]))))
+'''
+
+HARNESS = '''
+import json, time, warnings
+warnings.filterwarnings('ignore')
+import numpy, pandas, joblib  # imports are common to both paths, keep them out of the timing
+import sklearn.linear_model, sklearn.ensemble, sklearn.tree, sklearn.neighbors, sklearn.naive_bayes, sklearn.decomposition
+
+def memory():
+    fields = {}
+    with open('/proc/self/status') as f:
+        for line in f:
+            key, _, value = line.partition(':')
+            if key in ('RssAnon', 'RssFile'):
+                fields[key] = int(value.split()[0]) * 1024
+    return fields
+
+before = memory()
+start = time.perf_counter()
+exec(compile(LOADER, 'loader', 'exec'))
+seconds = time.perf_counter() - start
+after = memory()
+print(json.dumps({'seconds': seconds,
+                  'anon_bytes': after['RssAnon'] - before['RssAnon'],
+                  'file_bytes': after['RssFile'] - before['RssFile']}))
+'''
+
+
+def run(loader, repeats=5):
+    results = []
+    for _ in range(repeats):
+        code = f'LOADER = {loader!r}\n' + HARNESS
+        output = subprocess.check_output([sys.executable, '-c', code], text=True)
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    results.sort(key=lambda r: r['seconds'])
+    return results[len(results) // 2]
+
+
+def main():
+    print("=" * 64)
+    print("COLD LOAD: PICKLES vs MODEL BUNDLES (median of 5 processes)")
+    print("=" * 64)
+    print(f"{'Format':<12}{'load + 1 predict':>18}{'RssAnon':>14}{'RssFile':>14}")
+    print("-" * 64)
+    for label, loader in (('pickles', PICKLE_LOADER), ('bundles', BUNDLE_LOADER)):
+        r = run(loader)
+        print(f"{label:<12}{r['seconds'] * 1000:>16.1f}ms"
+              f"{r['anon_bytes'] / 1e6:>12.2f}MB{r['file_bytes'] / 1e6:>12.2f}MB")
+    print("-" * 64)
+    print("RssAnon is private per worker; RssFile pages are shared between workers.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+"""
+Per-worker memory of gunicorn with and without the preloaded startup mode
+Starts gunicorn (gunicorn.conf.py) once with GUNICORN_PRELOAD=False and once
+with GUNICORN_PRELOAD=True, sends every worker model status and batch
+prediction requests so it has loaded the models, then reads
+/proc/<pid>/smaps_rollup for the master and each worker.
+
+USS (Private_Clean + Private_Dirty) is what a worker costs on its own;
+PSS splits shared pages between the processes that map them, so the PSS
+sum is the real memory footprint of the whole server.
+
+Usage:
+    python benchmark_worker_memory.py
+    python benchmark_worker_memory.py --workers 4 --requests 200
+"""
+
+import argparse
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+FEATURES = {'age': 57, 'sex': 0, 'cp': 1, 'trestbps': 130, 'chol': 236, 'fbs': 0, 'restecg': 0,
+            'thalach': 174, 'exang': 0, 'oldpeak': 0.0, 'slope': 1, 'ca': 1, 'thal': 2}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def smaps_rollup(pid):
+    """Memory fields of one process in bytes"""
+    fields = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            key, _, value = line.partition(':')
+            if value.strip().endswith('kB'):
+                fields[key] = int(value.split()[0]) * 1024
+    return {'rss': fields['Rss'], 'pss': fields['Pss'],
+            'uss': fields['Private_Clean'] + fields['Private_Dirty']}
+
+
+def child_pids(pid):
+    children = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # Field 4 is the parent pid; the command name before it may contain spaces
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == pid:
+            children.append(int(entry))
+    return sorted(children)
+
+
+def request(url, data=None):
+    body = json.dumps(data).encode() if data is not None else None
+    req = urllib.request.Request(url, data=body, headers={'Content-Type': 'application/json'})
+    start = time.perf_counter()
+    with urllib.request.urlopen(req, timeout=60) as response:
+        response.read()
+    return time.perf_counter() - start
+
+
+def wait_until_up(url, process, timeout=120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('gunicorn exited during startup')
+        try:
+            request(url)
+            return
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.2)
+    raise RuntimeError('gunicorn did not start in time')
+
+
+def measure(preload, workers, n_requests):
+    port = free_port()
+    base = f'http://127.0.0.1:{port}'
+    env = dict(os.environ, GUNICORN_PRELOAD=str(preload), SHADOW_SCORING='False', PYTHONWARNINGS='ignore')
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--workers', str(workers),
+         '--bind', f'127.0.0.1:{port}', 'health_desease.wsgi:application'],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_until_up(f'{base}/model_status', process)
+        startup = time.perf_counter() - start
+        # Requests are spread over the workers by the kernel, so send enough to reach every one
+        latencies = []
+        for _ in range(n_requests):
+            latencies.append(request(f'{base}/model_status'))
+            latencies.append(request(f'{base}/api/v1/predict-batch/', [FEATURES]))
+        time.sleep(0.5)
+
+        master = smaps_rollup(process.pid)
+        worker_stats = [smaps_rollup(pid) for pid in child_pids(process.pid)]
+    finally:
+        process.send_signal(signal.SIGTERM)
+        process.wait(timeout=30)
+
+    n = len(worker_stats)
+    return {
+        'startup_seconds': startup,
+        'slowest_request_ms': max(latencies) * 1000,
+        'workers': n,
+        'worker_uss': sum(w['uss'] for w in worker_stats) / n,
+        'worker_pss': sum(w['pss'] for w in worker_stats) / n,
+        'worker_rss': sum(w['rss'] for w in worker_stats) / n,
+        'master_uss': master['uss'],
+        'total_pss': master['pss'] + sum(w['pss'] for w in worker_stats),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=100, help='Request pairs sent to warm the workers')
+    args = parser.parse_args()
+
+    results = {label: measure(preload, args.workers, args.requests)
+               for label, preload in (('Per-worker load', False), ('Preloaded', True))}
+
+    mb = 1024 * 1024
+    rows = [
+        ('Worker USS (private)', 'worker_uss', mb, 'MB'),
+        ('Worker PSS', 'worker_pss', mb, 'MB'),
+        ('Worker RSS', 'worker_rss', mb, 'MB'),
+        ('Master USS', 'master_uss', mb, 'MB'),
+        ('Total PSS (master + workers)', 'total_pss', mb, 'MB'),
+        ('Startup until first response', 'startup_seconds', 1, 's'),
+        ('Slowest warm-up request', 'slowest_request_ms', 1, 'ms'),
+    ]
+    print("=" * 72)
+    print(f"GUNICORN MEMORY, {args.workers} sync workers")
+    print("=" * 72)
+    print(f"{'':<32}" + ''.join(f"{label:>20}" for label in results))
+    print("-" * 72)
+    for name, key, scale, unit in rows:
+        print(f"{name:<32}" + ''.join(f"{r[key] / scale:>18.1f}{unit:<2}" for r in results.values()))
+    print("-" * 72)
+    before, after = results['Per-worker load'], results['Preloaded']
+    print(f"Private memory per worker: {before['worker_uss'] / mb:.1f}MB -> {after['worker_uss'] / mb:.1f}MB; "
+          f"whole server: {before['total_pss'] / mb:.1f}MB -> {after['total_pss'] / mb:.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
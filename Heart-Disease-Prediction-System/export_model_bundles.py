@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+"""
+Export the tabular and ECG models as memory-mappable model bundles
+
+    trained_models/heart_models.bundle/  <- the five tabular model pickles
+    trained_models/ecg_models.bundle/    <- scaler_ECG.pkl, PCA_ECG (1).pkl and the ECG ensemble
+
+Usage:
+    python export_model_bundles.py
+    python export_model_bundles.py --verify   # check every payload checksum
+"""
+
+import argparse
+import warnings
+
+from health.ecg_predictor import export_ecg_bundle
+from health.model_bundle import ModelBundle
+from health.training import export_compiled_models
+
+warnings.filterwarnings('ignore')
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Export model bundles')
+    parser.add_argument('--models-dir', default='trained_models')
+    parser.add_argument('--verify', action='store_true',
+                        help='Verify the checksums of existing bundles instead of exporting')
+    args = parser.parse_args()
+
+    paths = [f'{args.models_dir}/heart_models.bundle', f'{args.models_dir}/ecg_models.bundle']
+    if not args.verify:
+        paths = [export_compiled_models(args.models_dir), export_ecg_bundle(args.models_dir)]
+
+    for path in paths:
+        bundle = ModelBundle(path)
+        if args.verify:
+            bundle.verify()
+        print(f"{path}: version {bundle.version}, entries: {', '.join(bundle.entries)}"
+              f"{' (verified)' if args.verify else ''}")
@@ -0,0 +1,92 @@
+"""
+Gunicorn configuration (read automatically from this directory)
+
+    gunicorn health_desease.wsgi:application
+
+With GUNICORN_PRELOAD=True (the default) the app is loaded once in the
+master process: health/preload.py imports the heavy modules and loads the
+models, then freezes the garbage collector, and only then are the workers
+forked, so they share those pages copy-on-write. GUNICORN_PRELOAD=False
+loads the app separately in every worker, which makes code reloads on HUP
+possible at the cost of memory.
+
+ECG uploads are analysed off the request path. The master starts
+ECG_QUEUE_WORKERS queue workers (python manage.py process_ecg_queue,
+default 1) alongside the web workers, restarts the command (with backoff)
+if it exits, and stops it on exit. ECG_ASYNC_ANALYSIS defaults to True
+here (False in settings, for runserver) unless it is set explicitly. Set
+ECG_QUEUE_WORKERS to 0 when the queue is run as a separate service, and
+ECG_ASYNC_ANALYSIS=True in that case.
+
+Workers and bind address come from gunicorn's usual WEB_CONCURRENCY and
+PORT environment variables.
+"""
+
+import os
+import subprocess
+import sys
+import threading
+import time
+
+preload_app = os.getenv('GUNICORN_PRELOAD', 'True') == 'True'
+
+ecg_queue_workers = int(os.getenv('ECG_QUEUE_WORKERS', '1'))
+if ecg_queue_workers > 0:
+    # Read by settings.py, which the app (preloaded or per worker) imports after this file
+    os.environ.setdefault('ECG_ASYNC_ANALYSIS', 'True')
+
+_ecg_queue = None
+_stopping = threading.Event()
+
+
+def _start_ecg_queue(server):
+    global _ecg_queue
+    _ecg_queue = subprocess.Popen([sys.executable, 'manage.py', 'process_ecg_queue',
+                                   '--workers', str(ecg_queue_workers)],
+                                  cwd=os.path.dirname(os.path.abspath(__file__)))
+    server.log.info("Started %d ECG queue worker(s) (pid %d)", ecg_queue_workers, _ecg_queue.pid)
+
+
+def _supervise_ecg_queue(server):
+    # Restart the queue command whenever it exits, waiting longer after each quick failure
+    delay = 1
+    started = time.monotonic()
+    while not _stopping.wait(5):
+        # The master's SIGCHLD handler may already have reaped it, so the exit code is not reliable
+        if _ecg_queue.poll() is None:
+            continue
+        if time.monotonic() - started > 60:
+            delay = 1
+        server.log.warning("ECG queue workers (pid %d) exited; restarting in %ds", _ecg_queue.pid, delay)
+        if _stopping.wait(delay):
+            break
+        _start_ecg_queue(server)
+        started = time.monotonic()
+        delay = min(delay * 2, 60)
+
+
+def when_ready(server):
+    # Runs in the master after the preloaded app was imported and before any worker is forked
+    if ecg_queue_workers > 0 and os.getenv('ECG_ASYNC_ANALYSIS') == 'True':
+        _start_ecg_queue(server)
+        threading.Thread(target=_supervise_ecg_queue, args=(server,), name='ecg-queue-supervisor',
+                         daemon=True).start()
+
+    if not server.cfg.preload_app:
+        return
+    from health.preload import warm_up, freeze
+
+    timings = warm_up()
+    frozen = freeze()
+    server.log.info("Preloaded app: imports %.2fs, models %.2fs, ECG models %.2fs, %d objects frozen",
+                    timings['imports'], timings['models'], timings['ecg_models'], frozen)
+
+
+def on_exit(server):
+    _stopping.set()
+    if _ecg_queue is not None and _ecg_queue.poll() is None:
+        _ecg_queue.terminate()
+        try:
+            _ecg_queue.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            _ecg_queue.kill()
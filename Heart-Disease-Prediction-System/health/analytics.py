@@ -0,0 +1,185 @@
+"""
+Prediction Analytics Summary
+Running counts of predictions and positive (unhealthy) results per age
+band, sex and chest pain type, stored in Prediction_Summary.
+
+The counts are adjusted by the Search_Data post_save/post_delete signals
+(signals.py) and by an explicit call after bulk_create, so the admin
+analytics page reads a few dozen summary rows no matter how many
+predictions have been stored. Django runs post_delete inside the delete's
+transaction, but post_save runs after the insert has been written: the
+writers (add_heartdetail, the batch API, the admin) wrap the insert in
+transaction.atomic() so the row and its counts commit together. Saving
+an existing row moves its counts from the old features and result to the
+new ones; queryset update() and bulk_update() bypass the signals, so
+callers changing features or result that way must rebuild the summary.
+backfill_prediction_summary (and migration 0020) rebuild the table from
+the full history. Removals never take a count below zero.
+"""
+
+from collections import Counter
+
+import numpy as np
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+from .feature_schema import FEATURE_COLUMNS
+from .models import Prediction_Summary, Search_Data
+
+AGE = FEATURE_COLUMNS.index('age')
+SEX = FEATURE_COLUMNS.index('sex')
+CP = FEATURE_COLUMNS.index('cp')
+
+# Age band upper bounds (exclusive) and labels
+AGE_BANDS = [(40, 'Under 40'), (50, '40-49'), (60, '50-59'), (70, '60-69'), (np.inf, '70+')]
+SEX_LABELS = {0: 'Female', 1: 'Male'}
+CP_LABELS = {0: 'Typical angina', 1: 'Atypical angina', 2: 'Non-anginal pain', 3: 'Asymptomatic'}
+
+# Dimension key -> (title, bucket labels in display order)
+DIMENSIONS = {
+    'all': ('All predictions', ['All']),
+    'age_band': ('Age band', [label for _, label in AGE_BANDS]),
+    'sex': ('Sex', list(SEX_LABELS.values())),
+    'cp': ('Chest pain type', list(CP_LABELS.values())),
+}
+
+
+def _labels(codes, mapping):
+    return np.array([mapping.get(int(code), 'Other') for code in codes], dtype=object)
+
+
+def bucket_labels(X):
+    """
+    Bucket of every row for each dimension
+
+    Args:
+        X: Feature matrix in FEATURE_COLUMNS order
+    Returns:
+        dict of dimension -> array of bucket labels
+    """
+    X = np.asarray(X, dtype=np.float64).reshape(-1, len(FEATURE_COLUMNS))
+    bounds = np.array([upper for upper, _ in AGE_BANDS])
+    age_labels = np.array([label for _, label in AGE_BANDS], dtype=object)
+    return {
+        'all': np.full(len(X), 'All', dtype=object),
+        'age_band': age_labels[np.searchsorted(bounds, X[:, AGE], side='right')],
+        'sex': _labels(X[:, SEX], SEX_LABELS),
+        'cp': _labels(X[:, CP], CP_LABELS),
+    }
+
+
+def summary_deltas(X, results):
+    """
+    Count predictions and positives per (dimension, bucket)
+
+    Returns:
+        Counter of (dimension, bucket) -> [total, positive]
+    """
+    results = np.asarray(results).astype(np.int64).ravel()
+    deltas = Counter()
+    for dimension, labels in bucket_labels(X).items():
+        for bucket in np.unique(labels):
+            mask = labels == bucket
+            deltas[(dimension, bucket)] = np.array([int(mask.sum()), int(results[mask].sum())])
+    return deltas
+
+
+def apply_deltas(deltas, sign=1):
+    """
+    Add (sign=1) or remove (sign=-1) counts with atomic F() updates
+
+    Removals skip buckets that have no row and stop at zero, so deleting
+    predictions the summary never counted cannot break its constraints.
+    """
+    with transaction.atomic():
+        for (dimension, bucket), (total, positive) in sorted(deltas.items()):
+            if sign > 0:
+                Prediction_Summary.objects.get_or_create(dimension=dimension, bucket=bucket)
+                Prediction_Summary.objects.filter(dimension=dimension, bucket=bucket).update(
+                    total=F('total') + int(total),
+                    positive=F('positive') + int(positive),
+                )
+            else:
+                Prediction_Summary.objects.filter(dimension=dimension, bucket=bucket).update(
+                    total=Greatest(F('total') - int(total), 0),
+                    positive=Greatest(F('positive') - int(positive), 0),
+                )
+
+
+def record_predictions(X, results, sign=1):
+    """
+    Update the summary for newly stored (or, with sign=-1, deleted) predictions
+
+    Args:
+        X: Feature matrix (or a single row) in FEATURE_COLUMNS order
+        results: Predicted class per row (1 = heart disease)
+    """
+    if len(np.atleast_1d(results)):
+        apply_deltas(summary_deltas(X, results), sign)
+
+
+def record_search(search, sign=1):
+    """Summary update for one Search_Data row; rows without features are not counted"""
+    row = search.feature_row
+    if row is not None and search.result is not None:
+        record_predictions(row, [int(search.result)], sign)
+
+
+def record_change(old, search):
+    """
+    Move one saved Search_Data row's counts from its old values to its new ones
+
+    Args:
+        old: (features, result) stored before the save, or None if unknown
+        search: The saved instance
+    """
+    if old is None or old == (search.features, search.result):
+        return
+    with transaction.atomic():
+        record_search(Search_Data(features=old[0], result=old[1]), sign=-1)
+        record_search(search)
+
+
+def rebuild_summary():
+    """
+    Recompute the whole summary from Search_Data
+
+    Returns:
+        Number of predictions counted
+    """
+    with transaction.atomic():
+        searches = Search_Data.objects.exclude(features=None).exclude(result=None)
+        ids, X = searches.feature_matrix()
+        results = np.array(searches.order_by('id').values_list('result', flat=True), dtype=np.int64)
+        Prediction_Summary.objects.select_for_update().all().delete()
+        Prediction_Summary.objects.bulk_create([
+            Prediction_Summary(dimension=dimension, bucket=bucket, total=total, positive=positive)
+            for (dimension, bucket), (total, positive) in summary_deltas(X, results).items()
+        ])
+    return len(ids)
+
+
+def summary_tables():
+    """
+    Summary rows grouped for display
+
+    Returns:
+        list of {'key', 'title', 'rows': [{'bucket', 'total', 'positive', 'rate'}]}
+    """
+    counts = {(s.dimension, s.bucket): s for s in Prediction_Summary.objects.all()}
+    tables = []
+    for dimension, (title, buckets) in DIMENSIONS.items():
+        rows = []
+        for bucket in buckets + ['Other']:
+            summary = counts.get((dimension, bucket))
+            if summary is None:
+                if bucket == 'Other':
+                    continue
+                total = positive = 0
+            else:
+                total, positive = summary.total, summary.positive
+            rows.append({'bucket': bucket, 'total': total, 'positive': positive,
+                         'rate': positive / total * 100 if total else None})
+        tables.append({'key': dimension, 'title': title, 'rows': rows})
+    return tables
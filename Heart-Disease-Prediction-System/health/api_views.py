@@ -1,6 +1,24 @@
-from rest_framework import viewsets
+from rest_framework import viewsets, status
+from rest_framework.response import Response
+import io
+import pandas as pd
+from django.core.files.base import ContentFile
+from django.db import transaction
 from . import models
 from . import serializers
+from .analytics import record_predictions
+from .ecg_dedup import cached_results, content_hash, stored_images
+from .feature_schema import parse_frame, pack_row
+from .model_registry import model_registry, MODEL_NAMES
+from .training import background_trainer, ModelWarmingError
+
+# Upper bound on rows scored in one batch request
+MAX_BATCH_ROWS = 50000
+
+# Upper bound on ECG images analysed in one batch request
+MAX_ECG_BATCH_IMAGES = 100
+
+RESULT_KEYS = ('prediction_code', 'prediction_label', 'prediction_message', 'confidence')
 
 class PatientViewset(viewsets.ModelViewSet):
     queryset = models.Patient.objects.all()
@@ -8,4 +26,205 @@ class PatientViewset(viewsets.ModelViewSet):
     lookup_field = 'user'
     lookup_url_kwarg = 'user'
     filterset_fields = ('id','user' )
-    extra_kwargs = {'url': {'lookup_field':'user'}}
\ No newline at end of file
+    extra_kwargs = {'url': {'lookup_field':'user'}}
+
+
+class BatchPredictionViewSet(viewsets.ViewSet):
+    """
+    Score many patients in one request
+
+    POST a JSON array of {"age": .., ..., "thal": ..} objects, or upload a
+    CSV file with those columns as "file". Rows are validated against
+    feature_schema.py into one float32 matrix and every model runs a single
+    predict over the whole batch. Pass save=true to store the results as
+    Search_Data rows for the logged-in patient.
+    """
+
+    def create(self, request):
+        options = serializers.BatchPredictionOptionsSerializer(data=request.query_params)
+        options.is_valid(raise_exception=True)
+        save = options.validated_data['save']
+        if save and not request.user.is_authenticated:
+            return Response({'error': 'Login required to save predictions'},
+                            status=status.HTTP_403_FORBIDDEN)
+        patient = models.Patient.objects.filter(user=request.user).first() if save else None
+        if save and patient is None:
+            return Response({'error': 'Only patients can save predictions'}, status=status.HTTP_403_FORBIDDEN)
+
+        try:
+            frame = self.read_rows(request)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        X, errors = parse_frame(frame)
+        if errors:
+            return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        loaded = model_registry.get()
+        if loaded is None:
+            try:
+                background_trainer.ensure_models()
+                error = ModelWarmingError()
+            except ModelWarmingError as e:
+                error = e
+            return Response({'error': str(error), 'training': background_trainer.status()},
+                            status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+        predictions = loaded.predict_all(X)
+        best_key = loaded.best_model_key()
+        best_accuracy = loaded.model_info[best_key]['test_accuracy']
+
+        results = []
+        for i in range(len(X)):
+            results.append({
+                'row': i,
+                'prediction': int(predictions[best_key][i]),
+                'model': MODEL_NAMES[best_key],
+                'accuracy': best_accuracy,
+                'predictions': {MODEL_NAMES[key]: int(pred[i]) for key, pred in predictions.items()},
+            })
+
+        saved = 0
+        if save:
+            search_data = [
+                models.Search_Data(patient=patient, prediction_accuracy=best_accuracy,
+                                   result=result['prediction'], features=pack_row(row))
+                for row, result in zip(X, results)
+            ]
+            with transaction.atomic():
+                saved = len(models.Search_Data.objects.bulk_create(search_data, batch_size=1000))
+                # bulk_create sends no post_save signals, so update the analytics summary here
+                record_predictions(X, predictions[best_key])
+
+        return Response({
+            'count': len(results),
+            'model_version': loaded.version,
+            'saved': saved,
+            'results': results,
+        })
+
+    def read_rows(self, request):
+        """Build a DataFrame from a CSV upload or a JSON array"""
+        upload = request.FILES.get('file')
+        if upload is not None:
+            try:
+                frame = pd.read_csv(upload)
+            except (pd.errors.ParserError, pd.errors.EmptyDataError, UnicodeDecodeError) as e:
+                raise ValueError(f'Could not read CSV: {e}')
+        else:
+            data = request.data
+            if isinstance(data, dict):
+                data = data.get('rows')
+            if not isinstance(data, list):
+                raise ValueError('Expected a JSON array of rows or a CSV file upload')
+            if data and not all(isinstance(row, dict) for row in data):
+                raise ValueError('Each row must be an object keyed by feature name')
+            frame = pd.DataFrame.from_records(data)
+
+        if len(frame) == 0:
+            raise ValueError('No rows to score')
+        if len(frame) > MAX_BATCH_ROWS:
+            raise ValueError(f'At most {MAX_BATCH_ROWS} rows can be scored per request')
+        return frame
+
+
+class ECGBatchPredictionViewSet(viewsets.ViewSet):
+    """
+    Analyse many ECG images in one request
+
+    POST the scans as multipart files, all under the field name "images".
+    Signal features are extracted for every image on the ECG image thread
+    pool, stacked into one matrix and classified with a single projection
+    and ensemble call. Each analysed image is stored with its result as an
+    ECG_Prediction of the logged-in patient; the rows are created in bulk.
+    Images whose signal cannot be extracted are reported and not stored.
+    Repeated images (by content hash, see ecg_dedup.py) share one stored
+    file and reuse the result of the current model version ("reused").
+    """
+
+    def create(self, request):
+        if not request.user.is_authenticated:
+            return Response({'error': 'Login required to upload ECG images'}, status=status.HTTP_403_FORBIDDEN)
+        patient = models.Patient.objects.filter(user=request.user).first()
+        if patient is None:
+            return Response({'error': 'Only patients can upload ECG images'}, status=status.HTTP_403_FORBIDDEN)
+
+        uploads = request.FILES.getlist('images')
+        if not uploads:
+            return Response({'error': 'Upload the ECG images as "images" files'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(uploads) > MAX_ECG_BATCH_IMAGES:
+            return Response({'error': f'At most {MAX_ECG_BATCH_IMAGES} images can be analysed per request'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        from .ecg_predictor import shared_predictor
+        predictor = shared_predictor()
+        contents = [upload.read() for upload in uploads]
+        hashes = [content_hash(data) for data in contents]
+        try:
+            version = predictor.loaded_models().version
+            # Images analysed before by these models are not analysed again, and
+            # an image repeated within the batch is analysed once
+            cached = cached_results(hashes, version)
+            new = list(dict.fromkeys(digest for digest in hashes if digest not in cached))
+            first = {digest: hashes.index(digest) for digest in new}
+            analysed = dict(zip(new, predictor.predict_from_ecg_images(
+                [io.BytesIO(contents[first[digest]]) for digest in new]))) if new else {}
+        except Exception as e:
+            # Models missing or unloadable: nothing in the batch can be classified
+            return Response({'error': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+        predictions = []
+        for i, digest in enumerate(hashes):
+            if digest in cached:
+                prediction = {'success': True, 'reused': True}
+                prediction.update((key, getattr(cached[digest], key)) for key in RESULT_KEYS)
+            else:
+                prediction = dict(analysed[digest], reused=first[digest] != i)
+            predictions.append(prediction)
+
+        # Each new image is written to storage once; repeats link to the stored file
+        stored = stored_images(digest for digest, prediction in zip(hashes, predictions)
+                               if prediction['success'])
+        image_field = models.ECG_Prediction._meta.get_field('ecg_image')
+        records = []
+        for upload, data, digest, prediction in zip(uploads, contents, hashes, predictions):
+            if prediction['success']:
+                image_reused = digest in stored
+                if not image_reused:
+                    stored[digest] = image_field.storage.save(
+                        image_field.generate_filename(None, upload.name), ContentFile(data))
+                records.append(models.ECG_Prediction(
+                    patient=patient,
+                    ecg_image=stored[digest],
+                    content_hash=digest,
+                    image_size=len(data),
+                    image_reused=image_reused,
+                    result_reused=prediction['reused'],
+                    model_version=version,
+                    prediction_code=prediction['prediction_code'],
+                    prediction_label=prediction['prediction_label'],
+                    prediction_message=prediction['prediction_message'],
+                    confidence=prediction['confidence'],
+                    status=models.ECG_Prediction.STATUS_DONE,
+                ))
+        with transaction.atomic():
+            created = iter(models.ECG_Prediction.objects.bulk_create(records))
+
+        results = []
+        for i, (upload, prediction) in enumerate(zip(uploads, predictions)):
+            result = {'image': i, 'name': upload.name, 'success': prediction['success']}
+            if prediction['success']:
+                result['id'] = next(created).id
+                for key in RESULT_KEYS + ('reused',):
+                    result[key] = prediction[key]
+            else:
+                result['error'] = prediction['error']
+            results.append(result)
+
+        return Response({
+            'count': len(results),
+            'saved': len(records),
+            'analysed': len(new),
+            'model_version': version,
+            'results': results,
+        })
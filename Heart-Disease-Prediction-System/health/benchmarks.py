@@ -0,0 +1,255 @@
+"""
+Prediction Hot Path Benchmarks
+Measurements behind `manage.py benchmark_predictions`: cold start, warm
+latency percentiles, batch throughput, memory per model and the full
+add_heartdetail request. Results are flat {metric: value} dicts so runs
+can be saved as JSON and compared against a stored baseline.
+
+Metric names carry their unit, which also gives the comparison direction:
+*_ms, *_seconds and *_bytes are better when lower, *_per_sec when higher.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.test.utils import override_settings
+
+from .feature_schema import FEATURE_COLUMNS, parse_frame
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+HEART_CSV = BASE_DIR / 'Machine_Learning' / 'heart.csv'
+
+# Every request computes a prediction instead of hitting the shared cache
+NO_PREDICTION_CACHE = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'predictions': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+}
+LOCAL_PREDICTION_CACHE = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'predictions': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'benchmark'},
+}
+
+LOWER_IS_BETTER = ('_ms', '_seconds', '_bytes')
+HIGHER_IS_BETTER = ('_per_sec',)
+
+
+def sample_features(n, seed=0):
+    """n rows drawn (with replacement) from heart.csv as a float32 matrix"""
+    X, _ = parse_frame(pd.read_csv(HEART_CSV))
+    return X[np.random.RandomState(seed).randint(0, len(X), n)]
+
+
+def time_calls(fn, args_list):
+    """Latency of fn(*args) for every args tuple, in milliseconds"""
+    times = np.empty(len(args_list))
+    for i, args in enumerate(args_list):
+        start = time.perf_counter()
+        fn(*args)
+        times[i] = (time.perf_counter() - start) * 1000
+    return times
+
+
+def percentiles(prefix, times_ms):
+    return {
+        f'{prefix}_p50_ms': float(np.percentile(times_ms, 50)),
+        f'{prefix}_p99_ms': float(np.percentile(times_ms, 99)),
+        f'{prefix}_mean_ms': float(np.mean(times_ms)),
+    }
+
+
+COLD_START_SCRIPT = '''
+import json, os, sys, time, warnings
+warnings.filterwarnings("ignore")
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "health_desease.settings")
+start = time.perf_counter()
+import django
+django.setup()
+from django.conf import settings
+from django.test.utils import override_settings
+from health.benchmarks import NO_PREDICTION_CACHE
+with override_settings(CACHES=NO_PREDICTION_CACHE, SHADOW_SCORING=False):
+    from health.views import prdict_heart_disease
+    imported = time.perf_counter()
+    prdict_heart_disease([57, 0, 1, 130, 236, 0, 0, 174, 0, 0.0, 1, 1, 2])
+    done = time.perf_counter()
+print(json.dumps({"import": imported - start, "first_prediction": done - imported}))
+'''
+
+
+def cold_start(runs=3):
+    """
+    Time from a fresh interpreter to the first prediction
+
+    Each run is a new process, so it includes Django setup, the app
+    imports and the registry loading the models on first use.
+    """
+    results = []
+    for _ in range(runs):
+        output = subprocess.check_output([sys.executable, '-c', COLD_START_SCRIPT],
+                                         cwd=BASE_DIR, text=True, env=dict(os.environ))
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    imports = sorted(r['import'] for r in results)
+    first = sorted(r['first_prediction'] for r in results)
+    return {
+        'cold_start_import_seconds': imports[len(imports) // 2],
+        'cold_start_first_prediction_seconds': first[len(first) // 2],
+        'cold_start_total_seconds': imports[len(imports) // 2] + first[len(first) // 2],
+    }
+
+
+def warm_latency(n=1000):
+    """prdict_heart_disease latency once the models are loaded, uncached and cached (configured and local cache)"""
+    from .shadow_scoring import shadow_scorer
+    from .views import prdict_heart_disease
+
+    X = sample_features(n, seed=1)
+    results = {}
+    with override_settings(CACHES=NO_PREDICTION_CACHE):
+        prdict_heart_disease(X[0])  # load the registry outside the timing
+        shadow_scorer.wait()
+        times = np.empty(n)
+        for i, row in enumerate(X):
+            start = time.perf_counter()
+            prdict_heart_disease(row)
+            times[i] = (time.perf_counter() - start) * 1000
+            # Let shadow scoring finish so it does not steal CPU from the next call
+            shadow_scorer.wait()
+        results.update(percentiles('warm_single_row', times))
+
+    # cached_single_row uses the 'predictions' cache configured in settings
+    # (Redis or the per-process LocMemCache); local_cached_single_row always
+    # uses an in-process cache, as a reference for the backend's overhead
+    for prefix, caches in (('cached_single_row', settings.CACHES),
+                           ('local_cached_single_row', LOCAL_PREDICTION_CACHE)):
+        with override_settings(CACHES=caches):
+            prdict_heart_disease(X[0])
+            shadow_scorer.wait()
+            results.update(percentiles(prefix, time_calls(prdict_heart_disease, [(X[0],)] * n)))
+    return results
+
+
+def batch_throughput(sizes=(1, 100, 10000), repeats=5):
+    """predict_all over batches of each size: per-batch latency and rows per second"""
+    from .model_registry import model_registry
+
+    loaded = model_registry.get()
+    results = {}
+    if loaded is None:
+        return results
+    for size in sizes:
+        X = sample_features(size, seed=size)
+        for _ in range(3):
+            loaded.predict_all(X)
+        # Small batches are cheap and noisy, so they get more repeats
+        n = max(repeats, min(200, 20000 // size))
+        best = np.median(time_calls(loaded.predict_all, [(X,)] * n))
+        results[f'batch_{size}_ms'] = float(best)
+        results[f'batch_{size}_rows_per_sec'] = float(size / (best / 1000))
+    return results
+
+
+def model_memory(rows=10000):
+    """
+    Memory per model: resident size measured at load time and the peak
+    Python allocation while scoring a batch of `rows` rows
+    """
+    from .model_registry import model_registry
+
+    loaded = model_registry.get()
+    results = {}
+    if loaded is None:
+        return results
+    X = sample_features(rows, seed=2)
+    for key in loaded.models:
+        loaded.models[key]  # unpickle deferred models outside the traced predict
+        tracemalloc.start()
+        loaded.predict(key, X)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        stats = loaded.stats.get(key, {})
+        results[f'model_{key}_resident_bytes'] = int(stats.get('resident_bytes', 0))
+        results[f'model_{key}_load_seconds'] = float(stats.get('load_seconds', 0.0))
+        results[f'model_{key}_predict_{rows}_peak_bytes'] = int(peak)
+    return results
+
+
+def heartdetail_request(n=200):
+    """
+    Full POST /add_heartdetail through the Django test client
+
+    Runs against a throwaway test database with one logged-in patient,
+    so it includes middleware, form parsing, prediction and the
+    Search_Data insert (with its analytics update).
+    """
+    from django.contrib.auth.models import User
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    from .models import Patient
+
+    X = sample_features(n, seed=3)
+    form_names = {'chol': 'chole', 'oldpeak': 'old_peak'}
+    posts = [{form_names.get(name, name): str(value) for name, value in zip(FEATURE_COLUMNS, row.tolist())}
+             for row in X]
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        with override_settings(CACHES=NO_PREDICTION_CACHE):
+            user = User.objects.create_user('benchmark', password='benchmark')
+            Patient.objects.create(user=user, address='Benchmark')
+            client = Client()
+            client.force_login(user)
+            client.post('/add_heartdetail', posts[0])
+            times = np.empty(n)
+            for i, post in enumerate(posts):
+                start = time.perf_counter()
+                response = client.post('/add_heartdetail', post)
+                times[i] = (time.perf_counter() - start) * 1000
+                if response.status_code != 302:
+                    raise RuntimeError(f'add_heartdetail returned {response.status_code}')
+        return percentiles('add_heartdetail_request', times)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def compare(current, baseline, tolerance=0.2):
+    """
+    Compare two result dicts
+
+    Args:
+        current, baseline: {metric: value} dicts
+        tolerance: Allowed relative slowdown before a metric counts as a regression
+    Returns:
+        list of (metric, baseline, current, relative change, status) where
+        status is 'regression', 'improved', 'ok' or 'new'
+    """
+    rows = []
+    for metric, value in current.items():
+        if not isinstance(value, (int, float)):
+            continue
+        old = baseline.get(metric)
+        if metric.endswith(HIGHER_IS_BETTER):
+            sign = -1
+        elif metric.endswith(LOWER_IS_BETTER):
+            sign = 1
+        else:
+            continue
+        if not isinstance(old, (int, float)) or old == 0:
+            rows.append((metric, old, value, None, 'new'))
+            continue
+        change = (value - old) / abs(old)
+        worse = sign * change
+        status = 'regression' if worse > tolerance else 'improved' if worse < -tolerance else 'ok'
+        rows.append((metric, old, value, change, status))
+    return rows
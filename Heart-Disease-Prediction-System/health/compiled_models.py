@@ -0,0 +1,387 @@
+"""
+Compiled NumPy Evaluators for the Tabular Heart Disease Models
+Turns the trained scikit-learn models into plain arrays and scores them
+with NumPy operations, skipping sklearn's per-call input validation and
+estimator dispatch.
+
+- Logistic Regression: weight vector + intercept
+- Naive Bayes: class means, variances and priors
+- Decision Tree / Random Forest: one compact node table for all trees
+- KNN: training matrix + labels
+- StandardScaler / PCA (ECG pipeline): mean/scale and projection arrays,
+  and both folded into one float32 matrix product
+
+The arrays are stored in a model bundle (model_bundle.py) and memory-mapped
+when loaded.
+"""
+
+import hashlib
+import numpy as np
+
+from .model_bundle import write_bundle, ModelBundle
+
+
+class LinearEvaluator:
+    """Logistic Regression decision function"""
+
+    kind = 'linear'
+
+    def __init__(self, coef, intercept, classes):
+        self.coef = np.asarray(coef, dtype=np.float64)
+        self.intercept = np.asarray(intercept, dtype=np.float64)
+        self.classes = np.asarray(classes)
+
+    @classmethod
+    def from_sklearn(cls, model):
+        return cls(model.coef_, model.intercept_, model.classes_)
+
+    def arrays(self):
+        return {'coef': self.coef, 'intercept': self.intercept, 'classes': self.classes}
+
+    def predict(self, X):
+        scores = X @ self.coef.T + self.intercept
+        if scores.shape[1] == 1:
+            return self.classes[(scores[:, 0] > 0).astype(np.intp)]
+        return self.classes[np.argmax(scores, axis=1)]
+
+
+class GaussianNBEvaluator:
+    """Gaussian Naive Bayes joint log likelihood"""
+
+    kind = 'gaussian_nb'
+
+    def __init__(self, theta, var, class_prior, classes):
+        self.theta = np.asarray(theta, dtype=np.float64)
+        self.var = np.asarray(var, dtype=np.float64)
+        self.class_prior = np.asarray(class_prior, dtype=np.float64)
+        self.classes = np.asarray(classes)
+        # Terms that do not depend on the input
+        self.log_norm = np.log(self.class_prior) - 0.5 * np.sum(np.log(2.0 * np.pi * self.var), axis=1)
+        self.inv_var = 1.0 / self.var
+
+    @classmethod
+    def from_sklearn(cls, model):
+        return cls(model.theta_, model.var_, model.class_prior_, model.classes_)
+
+    def arrays(self):
+        return {'theta': self.theta, 'var': self.var,
+                'class_prior': self.class_prior, 'classes': self.classes}
+
+    def predict(self, X):
+        diff = X[:, None, :] - self.theta[None, :, :]
+        jll = self.log_norm - 0.5 * np.sum(diff * diff * self.inv_var, axis=2)
+        return self.classes[np.argmax(jll, axis=1)]
+
+
+class TreeEnsembleEvaluator:
+    """
+    Decision Tree or Random Forest as one compact, flattened node table
+
+    All trees are concatenated into shared node arrays; roots holds the
+    index of each tree's root node and child indices are absolute:
+
+    - feature: split feature per node, in the smallest integer type that fits
+    - threshold: float32 split threshold, rounded down so that comparing a
+      float32 input gives the same branch as sklearn's float64 threshold
+    - children: (n_nodes, 2) int32 left/right child
+    - value: normalized class probabilities per node
+
+    Leaves point to themselves with a +inf threshold, so every tree can be
+    stepped the same number of times without checking which ones are done.
+    The arrays are used as loaded, so a memory-mapped bundle is shared by
+    every worker instead of being copied into each one.
+    """
+
+    kind = 'packed_tree_ensemble'
+
+    # Stop early once every tree reached a leaf, checked every few levels
+    LEAF_CHECK_EVERY = 4
+
+    def __init__(self, feature, threshold, children, value, roots, classes, max_depth):
+        self.feature = np.asarray(feature)
+        self.threshold = np.asarray(threshold, dtype=np.float32)
+        self.children = np.asarray(children, dtype=np.int32)
+        self.value = np.asarray(value, dtype=np.float64)
+        self.roots = np.asarray(roots, dtype=np.int32)
+        self.classes = np.asarray(classes)
+        self.max_depth = int(max_depth)
+        # Views of the node table, no copies
+        self.flat_children = self.children.reshape(-1)
+        self.is_leaf = self.children[:, 0] == np.arange(len(self.children), dtype=np.int32)
+
+    @classmethod
+    def from_sklearn(cls, model):
+        trees = getattr(model, 'estimators_', [model])
+        features, thresholds, children, values, roots = [], [], [], [], []
+        offset = max_depth = 0
+        for estimator in trees:
+            tree = estimator.tree_
+            nodes = np.arange(tree.node_count) + offset
+            is_leaf = tree.children_left == -1
+            value = tree.value[:, 0, :].astype(np.float64)
+            value = value / value.sum(axis=1, keepdims=True)
+
+            threshold = tree.threshold.astype(np.float32)
+            # Largest float32 not above the float64 threshold: x <= t and
+            # x <= threshold agree for every float32 x
+            above = threshold.astype(np.float64) > tree.threshold
+            threshold[above] = np.nextafter(threshold[above], np.float32(-np.inf))
+            threshold[is_leaf] = np.inf
+
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(threshold)
+            children.append(np.column_stack([np.where(is_leaf, nodes, tree.children_left + offset),
+                                             np.where(is_leaf, nodes, tree.children_right + offset)]))
+            values.append(value)
+            roots.append(offset)
+            offset += tree.node_count
+            max_depth = max(max_depth, tree.max_depth)
+
+        feature = np.concatenate(features)
+        return cls(feature.astype(np.min_scalar_type(feature.max())), np.concatenate(thresholds),
+                   np.concatenate(children), np.concatenate(values), np.array(roots),
+                   model.classes_, max_depth)
+
+    def arrays(self):
+        return {'feature': self.feature, 'threshold': self.threshold, 'children': self.children,
+                'value': self.value, 'roots': self.roots, 'classes': self.classes,
+                'max_depth': np.array(self.max_depth)}
+
+    def leaves(self, X):
+        """
+        Index of the leaf reached in every tree, for all rows at once
+
+        Returns:
+            array of shape (n_samples, n_trees)
+        """
+        # sklearn compares float32 inputs against the stored thresholds
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n_rows, n_trees = X.shape[0], len(self.roots)
+        values = X.reshape(-1)
+        # One entry per (row, tree) pair: the row's offset into values and its current node
+        row_offset = np.repeat(np.arange(n_rows, dtype=np.int64) * X.shape[1], n_trees)
+        node = np.tile(self.roots, n_rows)
+        for level in range(self.max_depth):
+            go_right = np.take(values, row_offset + np.take(self.feature, node)) > np.take(self.threshold, node)
+            node = np.take(self.flat_children, 2 * node + go_right)
+            if level % self.LEAF_CHECK_EVERY == self.LEAF_CHECK_EVERY - 1 and np.take(self.is_leaf, node).all():
+                break
+        return node.reshape(n_rows, n_trees)
+
+    def predict_proba(self, X):
+        return self.value[self.leaves(X)].mean(axis=1)
+
+    def predict(self, X):
+        return self.classes[np.argmax(self.predict_proba(X), axis=1)]
+
+
+class KNNEvaluator:
+    """Brute-force k-nearest neighbours with uniform weights (Euclidean)"""
+
+    kind = 'knn'
+
+    def __init__(self, fit_X, fit_y, n_neighbors, classes):
+        self.fit_X = np.asarray(fit_X, dtype=np.float64)
+        self.fit_y = np.asarray(fit_y, dtype=np.intp)
+        self.n_neighbors = int(n_neighbors)
+        self.classes = np.asarray(classes)
+        self.fit_sq = np.einsum('ij,ij->i', self.fit_X, self.fit_X)
+
+    @classmethod
+    def from_sklearn(cls, model):
+        if model.weights != 'uniform' or model.effective_metric_ != 'euclidean':
+            raise ValueError('Only uniform-weight Euclidean KNN can be compiled')
+        return cls(model._fit_X, model._y, model.n_neighbors, model.classes_)
+
+    def arrays(self):
+        return {'fit_X': self.fit_X, 'fit_y': self.fit_y,
+                'n_neighbors': np.array(self.n_neighbors), 'classes': self.classes}
+
+    def predict(self, X):
+        sq = np.einsum('ij,ij->i', X, X)[:, None] - 2.0 * (X @ self.fit_X.T) + self.fit_sq
+        k = self.n_neighbors
+        if sq.shape[1] > k:
+            nearest = np.argpartition(sq, k - 1, axis=1)[:, :k]
+        else:
+            nearest = np.broadcast_to(np.arange(sq.shape[1]), sq.shape)
+        votes = np.zeros((X.shape[0], len(self.classes)), dtype=np.intp)
+        np.add.at(votes, (np.arange(X.shape[0])[:, None], self.fit_y[nearest]), 1)
+        return self.classes[np.argmax(votes, axis=1)]
+
+
+EVALUATORS = {
+    'logistic_regression': LinearEvaluator,
+    'naive_bayes': GaussianNBEvaluator,
+    'decision_tree': TreeEnsembleEvaluator,
+    'random_forest': TreeEnsembleEvaluator,
+    'knn': KNNEvaluator,
+}
+
+
+
+class StandardScalerTransform:
+    """StandardScaler.transform as (x - mean) / scale"""
+
+    kind = 'standard_scaler'
+
+    def __init__(self, mean, scale):
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+
+    @classmethod
+    def from_sklearn(cls, scaler):
+        mean = scaler.mean_ if scaler.with_mean else np.zeros(scaler.n_features_in_)
+        scale = scaler.scale_ if scaler.with_std else np.ones(scaler.n_features_in_)
+        return cls(mean, scale)
+
+    def arrays(self):
+        return {'mean': self.mean, 'scale': self.scale}
+
+    def transform(self, X):
+        return (X - self.mean) / self.scale
+
+
+class PCATransform:
+    """PCA.transform as (x - mean) @ components.T, optionally whitened"""
+
+    kind = 'pca'
+
+    def __init__(self, components, mean, explained_variance=None, whiten=False):
+        self.components = np.asarray(components, dtype=np.float64)
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.whiten = bool(whiten)
+        self.explained_variance = None
+        if explained_variance is not None:
+            self.explained_variance = np.asarray(explained_variance, dtype=np.float64)
+
+    @classmethod
+    def from_sklearn(cls, pca):
+        return cls(pca.components_, pca.mean_, pca.explained_variance_, pca.whiten)
+
+    def arrays(self):
+        arrays = {'components': self.components, 'mean': self.mean, 'whiten': np.array(self.whiten)}
+        if self.explained_variance is not None:
+            arrays['explained_variance'] = self.explained_variance
+        return arrays
+
+    def transform(self, X):
+        projected = (X - self.mean) @ self.components.T
+        if self.whiten:
+            projected /= np.sqrt(self.explained_variance)
+        return projected
+
+
+class ProjectionTransform:
+    """
+    StandardScaler followed by PCA, folded into x @ weights + offset
+
+    ((x - m) / s - mu) @ C.T is x @ (C / s).T - (m / s + mu) @ C.T, so the
+    scaling is absorbed into the projection matrix and both means into one
+    offset (whitening divides both by sqrt(explained_variance)). The fold
+    is done in float64 and stored as float32.
+    """
+
+    kind = 'projection'
+
+    def __init__(self, weights, offset):
+        self.weights = np.asarray(weights, dtype=np.float32)
+        self.offset = np.asarray(offset, dtype=np.float32)
+
+    @classmethod
+    def fold(cls, pca, scaler=None):
+        """
+        Args:
+            pca: PCATransform
+            scaler: Optional StandardScalerTransform applied before the PCA
+        """
+        weights = pca.components.T
+        offset = -(pca.mean @ pca.components.T)
+        if scaler is not None:
+            weights = weights / scaler.scale[:, None]
+            offset = offset - (scaler.mean / scaler.scale) @ pca.components.T
+        if pca.whiten:
+            weights = weights / np.sqrt(pca.explained_variance)
+            offset = offset / np.sqrt(pca.explained_variance)
+        return cls(weights, offset)
+
+    def arrays(self):
+        return {'weights': self.weights, 'offset': self.offset}
+
+    def transform(self, X):
+        """
+        Args:
+            X: array of shape (n_features,) or (n, n_features)
+        Returns:
+            float32 array of shape (n_components,) or (n, n_components)
+        """
+        return np.asarray(X, dtype=np.float32) @ self.weights + self.offset
+
+
+EVALUATOR_KINDS = {cls.kind: cls for cls in
+                   list(EVALUATORS.values()) + [StandardScalerTransform, PCATransform, ProjectionTransform]}
+
+
+def file_digest(path):
+    """SHA-1 of a model pickle, used to tie a compiled model to its source"""
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def compile_model(model_key, model):
+    """
+    Convert one trained sklearn model to its NumPy evaluator
+
+    Args:
+        model_key: Key in EVALUATORS (e.g. 'random_forest')
+        model: Fitted sklearn estimator
+    Returns:
+        Evaluator object with a predict(X) method
+    """
+    return EVALUATORS[model_key].from_sklearn(model)
+
+
+def save_compiled(path, evaluators, sources, version=None):
+    """
+    Write evaluators to a model bundle (see model_bundle.py)
+
+    Args:
+        path: Bundle directory
+        evaluators: dict of model key -> evaluator
+        sources: dict of model key -> digest of the source pickle
+        version: Optional bundle version string
+    """
+    entries = {}
+    for model_key, evaluator in evaluators.items():
+        entries[model_key] = {
+            'kind': evaluator.kind,
+            'arrays': evaluator.arrays(),
+            'metadata': {'source': sources.get(model_key, '')},
+        }
+    return write_bundle(path, entries, version=version)
+
+
+def load_compiled(path, sources=None, mmap=True):
+    """
+    Read evaluators written by save_compiled
+
+    Args:
+        path: Bundle directory
+        sources: Optional dict of model key -> digest of the currently loaded
+                 pickle; evaluators compiled from a different pickle are skipped
+        mmap: Map the arrays instead of reading them into memory
+    Returns:
+        dict of model key -> evaluator
+    """
+    bundle = ModelBundle(path, mmap=mmap)
+    evaluators = {}
+    for model_key in bundle.entries:
+        source = bundle.metadata(model_key).get('source')
+        if sources is not None and sources.get(model_key) != source:
+            continue
+        cls = EVALUATOR_KINDS.get(bundle.kind(model_key))
+        if cls is None:
+            # Written by a version with a different array layout; the
+            # sklearn model serves until the bundle is re-exported
+            continue
+        evaluators[model_key] = cls(**bundle.arrays(model_key), **bundle.params(model_key))
+    return evaluators
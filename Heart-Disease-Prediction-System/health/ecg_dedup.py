@@ -0,0 +1,153 @@
+"""
+ECG Upload Deduplication
+Patients often upload the same ECG file several times. Every upload is
+hashed (SHA-256 of its bytes) on ingest and the digest is stored on its
+ECG_Prediction row, so a repeated image:
+- points at the file already stored under media/ecg_images/ instead of
+  writing another copy, and
+- takes the result of an earlier analysis by the current ECG model
+  version instead of running the pipeline again.
+Only the new ECG_Prediction row linking the patient to the image is
+written.
+
+Results are reused only for the same model version (the ECG registry's
+artifact fingerprint), so redeploying the models analyses every image
+afresh once. dedup_stats() reports the storage and analysis time saved.
+"""
+
+import hashlib
+
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from .models import ECG_Prediction
+
+RESULT_FIELDS = ('prediction_code', 'prediction_label', 'prediction_message', 'confidence', 'model_version')
+
+
+def content_hash(upload):
+    """
+    SHA-256 hex digest of an upload
+
+    Args:
+        upload: Django UploadedFile (read in chunks and rewound) or bytes
+    """
+    if isinstance(upload, bytes):
+        return hashlib.sha256(upload).hexdigest()
+    digest = hashlib.sha256()
+    for chunk in upload.chunks():
+        digest.update(chunk)
+    upload.seek(0)
+    return digest.hexdigest()
+
+
+def stored_images(hashes):
+    """
+    Files already stored for the given digests
+
+    Returns:
+        dict of digest -> storage name of the newest row's file that still exists
+    """
+    storage = ECG_Prediction._meta.get_field('ecg_image').storage
+    names = {}
+    rows = (ECG_Prediction.objects.filter(content_hash__in=set(hashes)).exclude(ecg_image='')
+            .exclude(ecg_image=None).order_by('-created', '-id').values_list('content_hash', 'ecg_image'))
+    for digest, name in rows:
+        if digest not in names and storage.exists(name):
+            names[digest] = name
+    return names
+
+
+def cached_results(hashes, version):
+    """
+    Finished analyses of the given digests by one model version
+
+    Args:
+        hashes: Content digests to look up
+        version: Current ECG model version (None finds nothing)
+    Returns:
+        dict of digest -> newest finished ECG_Prediction with that digest and version
+    """
+    if version is None:
+        return {}
+    rows = ECG_Prediction.objects.filter(content_hash__in=set(hashes), model_version=version,
+                                         status=ECG_Prediction.STATUS_DONE).order_by('created', 'id')
+    return {row.content_hash: row for row in rows}
+
+
+def reuse_result(record, source):
+    """Copy a finished analysis onto another record (not saved)"""
+    for name in RESULT_FIELDS:
+        setattr(record, name, getattr(source, name))
+    record.status = ECG_Prediction.STATUS_DONE
+    record.result_reused = True
+    record.error = None
+    record.finished_at = timezone.now()
+
+
+def ingest(record, upload, version=None):
+    """
+    Attach an uploaded image to a new ECG_Prediction and save it
+
+    The stored file of an identical earlier upload is reused instead of
+    writing the upload again, and so is its result when it was analysed
+    by `version`.
+
+    Args:
+        record: Unsaved ECG_Prediction with the patient set
+        upload: Django UploadedFile
+        version: Current ECG model version, or None to never reuse results
+    Returns:
+        The saved record (status done if a result was reused)
+    """
+    digest = content_hash(upload)
+    record.content_hash = digest
+    record.image_size = upload.size
+    name = stored_images([digest]).get(digest)
+    if name is not None:
+        record.ecg_image = name
+        record.image_reused = True
+    else:
+        record.ecg_image = upload
+    cached = cached_results([digest], version).get(digest)
+    if cached is not None:
+        reuse_result(record, cached)
+    record.save()
+    return record
+
+
+def dedup_stats():
+    """
+    Storage and analysis time saved by deduplication
+
+    Analysis time saved is the processing time (started_at to finished_at)
+    of the analysis each reused result came from, or the mean processing
+    time where that analysis was not timed (e.g. batch API uploads).
+
+    Returns:
+        dict suitable for a JSON response (sizes in bytes, times in seconds)
+    """
+    records = ECG_Prediction.objects.all()
+    hashed = records.exclude(content_hash=None)
+    files = hashed.aggregate(uploads=Count('id'), files=Count('ecg_image', distinct=True),
+                             upload_bytes=Sum('image_size'))
+    reused_files = hashed.filter(image_reused=True).aggregate(count=Count('id'), bytes=Sum('image_size'))
+
+    reused = list(hashed.filter(result_reused=True).values_list('content_hash', 'model_version'))
+    timed = (hashed.filter(status=ECG_Prediction.STATUS_DONE, result_reused=False,
+                           started_at__isnull=False, finished_at__isnull=False)
+             .values_list('content_hash', 'model_version', 'started_at', 'finished_at'))
+    seconds = {(digest, version): (finished - started).total_seconds()
+               for digest, version, started, finished in timed.iterator()}
+    mean = sum(seconds.values()) / len(seconds) if seconds else 0.0
+
+    return {
+        'hashed_uploads': files['uploads'],
+        'stored_files': files['files'],
+        'upload_bytes': files['upload_bytes'] or 0,
+        'reused_files': reused_files['count'],
+        'storage_saved_bytes': reused_files['bytes'] or 0,
+        'reused_results': len(reused),
+        'analysis_seconds_saved': sum(seconds.get(key, mean) for key in reused),
+        'mean_analysis_seconds': mean,
+    }
@@ -4,6 +4,7 @@ Adapted for Django from: https://github.com/rameshavinash94/Cardiovascular-Detec
 """
 
 from skimage.io import imread
+from PIL import Image
 from skimage import color
 import matplotlib
 matplotlib.use('Agg')  # Use non-interactive backend for Django
@@ -11,15 +12,128 @@ import matplotlib.pyplot as plt
 from skimage.filters import threshold_otsu, gaussian
 from skimage.transform import resize
 from skimage import measure
+from skimage.util import img_as_float
+from scipy import ndimage as ndi
 import joblib
-from sklearn.preprocessing import MinMaxScaler
-import pandas as pd
 import numpy as np
-import os
-from natsort import natsorted
 from pathlib import Path
-import tempfile
-import shutil
+from concurrent.futures import ThreadPoolExecutor
+import os
+import threading
+
+from .compiled_models import StandardScalerTransform, PCATransform, ProjectionTransform
+from .ecg_registry import (ECG_BUNDLE_NAME, ECG_MODEL_FILE, ECG_PCA_FILE, ECG_SCALER_FILE, ecg_registry,
+                           entry_sources, source_digests)
+from .model_bundle import write_bundle
+
+# Grid the lead regions are defined on: (rows, columns) of the resized image
+WORKING_SHAPE = (1572, 2213)
+
+# (row range, column range) of each lead on the working grid; leads 1-12
+# are the standard 12-lead layout, lead 13 the long rhythm strip
+LEAD_REGIONS = [
+    ((300, 600), (150, 643)), ((300, 600), (646, 1135)), ((300, 600), (1140, 1625)), ((300, 600), (1630, 2125)),
+    ((600, 900), (150, 643)), ((600, 900), (646, 1135)), ((600, 900), (1140, 1625)), ((600, 900), (1630, 2125)),
+    ((900, 1200), (150, 643)), ((900, 1200), (646, 1135)), ((900, 1200), (1140, 1625)), ((900, 1200), (1630, 2125)),
+    ((1250, 1480), (150, 2125)),
+]
+
+# The first 12 leads are used as features, each resampled to this many points
+FEATURE_LEADS = 12
+SIGNAL_POINTS = 255
+
+# Class code -> (label, message) shown on the ECG result page
+PREDICTION_MAP = {
+    0: ("Abnormal Heartbeat", "Your ECG shows signs of abnormal heartbeat (arrhythmia). Please consult a cardiologist."),
+    1: ("Myocardial Infarction", "Your ECG indicates Myocardial Infarction (heart attack). Seek immediate medical attention!"),
+    2: ("Normal", "Your ECG appears normal. Your heart rhythm is healthy."),
+    3: ("History of MI", "Your ECG shows signs of previous Myocardial Infarction. Follow up with your cardiologist.")
+}
+
+_pools = {}
+_pools_lock = threading.Lock()
+_shared_predictor = None
+
+
+def _thread_pool(name, max_workers):
+    """
+    Named thread pool shared by every request in the process
+
+    Threads do not survive a fork, so each worker process builds its own.
+    """
+    with _pools_lock:
+        pool, pid = _pools.get(name, (None, None))
+        if pool is None or pid != os.getpid():
+            pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f'ecg-{name}')
+            _pools[name] = (pool, os.getpid())
+        return pool
+
+
+def lead_pool():
+    """
+    Thread pool for per-lead signal extraction
+
+    The gaussian filter, resizes and contour tracing run in compiled
+    skimage/SciPy code that releases the GIL, so leads extract in
+    parallel on multi-core hosts.
+    """
+    return _thread_pool('leads', FEATURE_LEADS)
+
+
+def image_pool():
+    """Thread pool extracting the images of a batch, ECG_BATCH_WORKERS threads"""
+    return _thread_pool('images', ecg_setting('ECG_BATCH_WORKERS', 1))
+
+
+def ecg_setting(name, default):
+    """An ECG_* value from the Django settings, or the default outside Django"""
+    from django.conf import settings
+    return getattr(settings, name, default) if settings.configured else default
+
+
+def shared_predictor():
+    """ECGPredictor used by the views, created once per process"""
+    global _shared_predictor
+    if _shared_predictor is None:
+        _shared_predictor = ECGPredictor()
+    return _shared_predictor
+
+
+def export_ecg_bundle(models_dir, version=None):
+    """
+    Convert the joblib ECG artifacts into a model bundle
+
+    The scaler and PCA are stored as arrays, and also folded into one
+    float32 projection (the entry the ECG registry serves from); the
+    voting ensemble has no array form and is stored as a checksummed
+    joblib blob. Each entry records the digests of its source joblib
+    files, so the registry stops serving it once they are retrained.
+
+    Args:
+        models_dir: Directory holding the ECG joblib files
+        version: Optional bundle version string
+    Returns:
+        Path of the written bundle
+    """
+    models_dir = Path(models_dir)
+    digests = source_digests(models_dir)
+    entries = {}
+    scaler = None
+    scaler_path = models_dir / ECG_SCALER_FILE
+    if scaler_path.exists():
+        scaler = StandardScalerTransform.from_sklearn(joblib.load(scaler_path))
+        entries['scaler'] = {'kind': scaler.kind, 'arrays': scaler.arrays(),
+                             'metadata': entry_sources('scaler', digests)}
+    pca = PCATransform.from_sklearn(joblib.load(models_dir / ECG_PCA_FILE))
+    entries['pca'] = {'kind': pca.kind, 'arrays': pca.arrays(), 'metadata': entry_sources('pca', digests)}
+    projection = ProjectionTransform.fold(pca, scaler)
+    entries['projection'] = {'kind': projection.kind, 'arrays': projection.arrays(),
+                             'metadata': entry_sources('projection', digests)}
+    model_path = models_dir / ECG_MODEL_FILE
+    if model_path.exists():
+        entries['classifier'] = {'kind': 'joblib', 'blobs': {'model': model_path.read_bytes()},
+                                 'metadata': entry_sources('classifier', digests)}
+    return write_bundle(models_dir / ECG_BUNDLE_NAME, entries, version=version)
 
 class ECGPredictor:
     """
@@ -32,31 +146,39 @@ class ECGPredictor:
     - History of Myocardial Infarction
     """
     
-    def __init__(self):
-        """Initialize with model paths"""
+    def __init__(self, lead_workers=None, reduced_decode=None, registry=None):
+        """
+        Initialize with model paths
+        
+        Args:
+            lead_workers: Threads used to extract the leads of one image
+                          (default: ECG_LEAD_WORKERS setting)
+            reduced_decode: Decode large JPEGs at reduced resolution for feature
+                            extraction (default: ECG_REDUCED_DECODE setting)
+            registry: ECGModelRegistry serving the scaler, PCA and classifier
+                      (default: the process-wide ecg_registry)
+        """
         self.base_dir = Path(__file__).resolve().parent.parent
         self.models_dir = self.base_dir / 'trained_models'
-        self.temp_dir = None
-        
-    def create_temp_workspace(self):
-        """Create temporary directory for processing"""
-        self.temp_dir = tempfile.mkdtemp()
-        return self.temp_dir
+        self.registry = registry if registry is not None else ecg_registry
+        self.lead_workers = lead_workers if lead_workers is not None else ecg_setting('ECG_LEAD_WORKERS', 1)
+        self.reduced_decode = reduced_decode if reduced_decode is not None else ecg_setting('ECG_REDUCED_DECODE', False)
     
-    def cleanup_temp_workspace(self):
-        """Clean up temporary files"""
-        if self.temp_dir and os.path.exists(self.temp_dir):
-            shutil.rmtree(self.temp_dir)
-            self.temp_dir = None
-    
-    def get_image(self, image_path):
+    def get_image(self, image_path, min_shape=None):
         """
         Load ECG image from file path
         Args:
             image_path: Path to ECG image file
+            min_shape: (rows, columns) the caller needs at least; a JPEG
+                       twice that size or more is decoded smaller (see draft_image)
         Returns:
-            numpy array of image (RGB format)
+            numpy array of image (RGB format, grayscale if decoded smaller)
         """
+        if min_shape is not None and self.reduced_decode:
+            image = self.draft_image(image_path, min_shape)
+            if image is not None:
+                return image
+        
         image = imread(image_path)
         
         # Handle different image formats
@@ -79,6 +201,51 @@ class ECGPredictor:
         
         return image
     
+    def draft_image(self, image_path, min_shape):
+        """
+        Decode a large JPEG straight to a smaller grayscale image
+        
+        libjpeg can scale the image by 1/2, 1/4 or 1/8 while decoding and
+        skip the color channels, so the full-size RGB array is never
+        allocated. Pillow picks the smallest scale that is still at least
+        min_shape. The result is the luma channel, which differs slightly
+        from rgb2gray of the full decode.
+        
+        Args:
+            image_path: Path to ECG image file
+            min_shape: (rows, columns) the decoded image must cover
+        Returns:
+            2D uint8 array, or None for other formats and for JPEGs too
+            small to be scaled down (those decode as before)
+        """
+        rows, columns = min_shape
+        with Image.open(image_path) as image:
+            if (image.format != 'JPEG' or image.mode not in ('L', 'RGB')
+                    or image.height < 2 * rows or image.width < 2 * columns):
+                return None
+            image.draft('L', (columns, rows))
+            return np.asarray(image.convert('L'))
+    
+    def grayscale(self, image):
+        """
+        Convert an RGB, RGBA, or grayscale image array to grayscale
+        """
+        # Check if already grayscale
+        if len(image.shape) == 2:
+            return image
+        # Handle different channel formats
+        if image.shape[2] == 4:
+            # RGBA (4 channels) - remove alpha channel first
+            image = image[:, :, :3]
+        elif image.shape[2] == 2:
+            # 2 channels (grayscale + alpha) - use first channel only
+            image = np.stack([image[:, :, 0], image[:, :, 0], image[:, :, 0]], axis=-1)
+        elif image.shape[2] == 1:
+            # Single channel - convert to RGB
+            image = np.concatenate([image, image, image], axis=-1)
+        # Convert to grayscale
+        return color.rgb2gray(image)
+    
     def gray_image(self, image):
         """
         Convert image to grayscale and resize
@@ -87,25 +254,7 @@ class ECGPredictor:
         Returns:
             Grayscale image resized to standard dimensions
         """
-        # Check if already grayscale
-        if len(image.shape) == 2:
-            image_gray = image
-        else:
-            # Handle different channel formats
-            if image.shape[2] == 4:
-                # RGBA (4 channels) - remove alpha channel first
-                image = image[:, :, :3]
-            elif image.shape[2] == 2:
-                # 2 channels (grayscale + alpha) - use first channel only
-                image = np.stack([image[:, :, 0], image[:, :, 0], image[:, :, 0]], axis=-1)
-            elif image.shape[2] == 1:
-                # Single channel - convert to RGB
-                image = np.concatenate([image, image, image], axis=-1)
-            # Convert to grayscale
-            image_gray = color.rgb2gray(image)
-        
-        image_gray = resize(image_gray, (1572, 2213))
-        return image_gray
+        return resize(self.grayscale(image), WORKING_SHAPE)
     
     def divide_leads(self, image):
         """
@@ -119,181 +268,210 @@ class ECGPredictor:
         Returns:
             List of 13 lead images
         """
-        Lead_1 = image[300:600, 150:643]
-        Lead_2 = image[300:600, 646:1135]
-        Lead_3 = image[300:600, 1140:1625]
-        Lead_4 = image[300:600, 1630:2125]
-        Lead_5 = image[600:900, 150:643]
-        Lead_6 = image[600:900, 646:1135]
-        Lead_7 = image[600:900, 1140:1625]
-        Lead_8 = image[600:900, 1630:2125]
-        Lead_9 = image[900:1200, 150:643]
-        Lead_10 = image[900:1200, 646:1135]
-        Lead_11 = image[900:1200, 1140:1625]
-        Lead_12 = image[900:1200, 1630:2125]
-        Lead_13 = image[1250:1480, 150:2125]
-        
-        Leads = [Lead_1, Lead_2, Lead_3, Lead_4, Lead_5, Lead_6, 
-                 Lead_7, Lead_8, Lead_9, Lead_10, Lead_11, Lead_12, Lead_13]
-        
-        return Leads
+        return [image[r0:r1, c0:c1] for (r0, r1), (c0, c1) in LEAD_REGIONS]
+    
+    def crop_leads(self, image, count=len(LEAD_REGIONS)):
+        """
+        Same leads as divide_leads(gray_image(image)), cropped first
+        
+        Each lead region is mapped back to source coordinates, and only
+        that part of the upload (plus a border for the filters) is
+        converted to grayscale and resampled, straight to the region's
+        size on the working grid. The resampling repeats what resize()
+        does for the whole image: a Gaussian low-pass with the same sigma
+        when shrinking, then linear interpolation at the same positions.
+        
+        Args:
+            image: RGB, RGBA, or grayscale image array
+            count: Number of leads to return (FEATURE_LEADS skips the rhythm strip)
+        Returns:
+            List of lead images
+        """
+        height, width = image.shape[:2]
+        factors = np.divide((height, width), WORKING_SHAPE)
+        if (factors == 1).all():
+            # Already on the working grid: resize() would not change a pixel
+            return [img_as_float(self.grayscale(image[r0:r1, c0:c1]))
+                    for (r0, r1), (c0, c1) in LEAD_REGIONS[:count]]
+        
+        sigma = np.maximum(0, (factors - 1) / 2) if (factors > 1).any() else np.zeros(2)
+        # Gaussian kernel radius (truncate=4) plus one pixel for the interpolation
+        margin = int(4 * sigma.max() + 0.5) + 2
+        leads = []
+        for (r0, r1), (c0, c1) in LEAD_REGIONS[:count]:
+            # Source position of the region's first pixel center, as resize() computes it
+            first = (np.array([r0, c0]) + 0.5) * factors - 0.5
+            last = (np.array([r1, c1]) - 0.5) * factors - 0.5
+            top, left = np.maximum(np.floor(first).astype(int) - margin, 0)
+            bottom, right = np.minimum(np.ceil(last).astype(int) + 1 + margin, (height, width))
+            
+            crop = img_as_float(self.grayscale(image[top:bottom, left:right]))
+            if sigma.any():
+                crop = ndi.gaussian_filter(crop, sigma, mode='mirror')
+            leads.append(ndi.affine_transform(crop, factors, offset=first - (top, left),
+                                              output_shape=(r1 - r0, c1 - c0), order=1, mode='mirror'))
+        return leads
+    
+    def lead_signal(self, lead):
+        """
+        Extract the ECG signal of one lead using contour detection
+        and convert it to a 1D normalized signal
+        
+        Args:
+            lead: Lead image
+        Returns:
+            array of SIGNAL_POINTS values scaled to [0, 1]
+        """
+        # Convert to grayscale if needed
+        if len(lead.shape) == 2:
+            grayscale = lead  # Already grayscale
+        else:
+            # Handle different channel formats
+            if lead.shape[2] == 4:
+                # RGBA (4 channels) - remove alpha channel
+                lead = lead[:, :, :3]
+            elif lead.shape[2] == 2:
+                # 2 channels (grayscale + alpha) - use first channel only
+                lead = np.stack([lead[:, :, 0], lead[:, :, 0], lead[:, :, 0]], axis=-1)
+            elif lead.shape[2] == 1:
+                # Single channel - convert to RGB
+                lead = np.concatenate([lead, lead, lead], axis=-1)
+            grayscale = color.rgb2gray(lead)
+        
+        # Apply gaussian smoothing
+        blurred_image = gaussian(grayscale, sigma=0.7)
+        # Threshold to separate signal from background
+        global_thresh = threshold_otsu(blurred_image)
+        binary_global = blurred_image < global_thresh
+        # Resize
+        binary_global = resize(binary_global, (300, 450))
+        
+        # Find contours (ECG waveform); the largest one is the signal
+        contours = measure.find_contours(binary_global, 0.8)
+        if not contours:
+            raise ValueError("No ECG signal found in one of the leads")
+        largest = max(contour.shape for contour in contours)
+        contour = [c for c in contours if c.shape == largest][-1]
+        signal = resize(contour, (SIGNAL_POINTS, 2))[:, 0]
+        
+        # Min-max scale, computed the way MinMaxScaler does
+        span = signal.max() - signal.min()
+        scale = 1.0 / span if span else 1.0
+        return signal * scale - signal.min() * scale
     
     def signal_extraction_scaling(self, Leads):
         """
-        Extract ECG signal from each lead using contour detection
-        and convert to 1D normalized signal
+        Extract the 1D normalized signal of each of the first 12 leads
+        
+        With lead_workers > 1 the leads are split into that many groups
+        and the groups are extracted concurrently on lead_pool().
         
         Args:
             Leads: List of lead images
         Returns:
-            None (saves CSV files to temp directory)
+            array of shape (12, SIGNAL_POINTS)
         """
-        # Change to temp directory for CSV output
-        original_dir = os.getcwd()
-        os.chdir(self.temp_dir)
-        
-        try:
-            for x, y in enumerate(Leads[:len(Leads)-1]):  # Process first 12 leads
-                # Convert to grayscale if needed
-                if len(y.shape) == 2:
-                    grayscale = y  # Already grayscale
-                else:
-                    # Handle different channel formats
-                    if y.shape[2] == 4:
-                        # RGBA (4 channels) - remove alpha channel
-                        y = y[:, :, :3]
-                    elif y.shape[2] == 2:
-                        # 2 channels (grayscale + alpha) - use first channel only
-                        y = np.stack([y[:, :, 0], y[:, :, 0], y[:, :, 0]], axis=-1)
-                    elif y.shape[2] == 1:
-                        # Single channel - convert to RGB
-                        y = np.concatenate([y, y, y], axis=-1)
-                    grayscale = color.rgb2gray(y)
-                
-                # Apply gaussian smoothing
-                blurred_image = gaussian(grayscale, sigma=0.7)
-                # Threshold to separate signal from background
-                global_thresh = threshold_otsu(blurred_image)
-                binary_global = blurred_image < global_thresh
-                # Resize
-                binary_global = resize(binary_global, (300, 450))
-                
-                # Find contours (ECG waveform)
-                contours = measure.find_contours(binary_global, 0.8)
-                contours_shape = sorted([c.shape for c in contours])[::-1][0:1]
-                
-                # Extract largest contour (the signal)
-                for contour in contours:
-                    if contour.shape in contours_shape:
-                        test = resize(contour, (255, 2))
-                
-                # Normalize and scale
-                lead_no = x
-                scaler = MinMaxScaler()
-                fit_transform_data = scaler.fit_transform(test)
-                Normalized_Scaled = pd.DataFrame(fit_transform_data[:, 0], columns=['X'])
-                Normalized_Scaled = Normalized_Scaled.T
-                
-                # Save to CSV
-                csv_filename = f'Scaled_1DLead_{lead_no+1}.csv'
-                Normalized_Scaled.to_csv(csv_filename, index=False)
-        
-        finally:
-            # Return to original directory
-            os.chdir(original_dir)
+        leads = Leads[:FEATURE_LEADS]
+        workers = min(self.lead_workers, len(leads))
+        if workers <= 1:
+            return np.stack([self.lead_signal(lead) for lead in leads])
+        groups = np.array_split(np.arange(len(leads)), workers)
+        futures = [lead_pool().submit(self.lead_signals, [leads[i] for i in group]) for group in groups]
+        return np.stack([signal for future in futures for signal in future.result()])
+    
+    def lead_signals(self, leads):
+        """lead_signal for a group of leads, in order"""
+        return [self.lead_signal(lead) for lead in leads]
     
-    def combine_convert_1d_signal(self):
+    def combine_convert_1d_signal(self, signals):
         """
-        Combine all 12 lead signals into single dataframe
+        Combine all 12 lead signals into a single feature row
         
+        Args:
+            signals: array of shape (12, SIGNAL_POINTS) from signal_extraction_scaling
         Returns:
-            DataFrame with combined 1D signals (3060 features)
+            array of shape (1, 3060), lead 1 first
         """
-        # Change to temp directory
-        original_dir = os.getcwd()
-        os.chdir(self.temp_dir)
+        return np.asarray(signals, dtype=np.float64).reshape(1, -1)
+    
+    def extract_features(self, image_path):
+        """
+        Steps 1-5 of the pipeline: ECG image to signal features
         
-        try:
-            # Read first lead
-            test_final = pd.read_csv('Scaled_1DLead_1.csv')
-            
-            # Combine remaining leads
-            for files in natsorted(os.listdir('.')):
-                if files.endswith(".csv") and files != 'Scaled_1DLead_1.csv':
-                    df = pd.read_csv(files)
-                    test_final = pd.concat([test_final, df], axis=1, ignore_index=True)
-            
-            return test_final
+        Args:
+            image_path: Path to the ECG image
+        Returns:
+            array of shape (1, 3060)
+        """
+        ecg_image = self.get_image(image_path, min_shape=WORKING_SHAPE)
+        leads = self.crop_leads(ecg_image, FEATURE_LEADS)
+        signals = self.signal_extraction_scaling(leads)
+        return self.combine_convert_1d_signal(signals)
+    
+    def loaded_models(self):
+        """
+        Current models from the registry (reloaded if the artifacts changed)
         
-        finally:
-            os.chdir(original_dir)
+        Returns:
+            LoadedECGModels
+        """
+        loaded = self.registry.get()
+        if loaded is None:
+            raise Exception(self.registry.error or f"ECG models not found in {self.registry.models_dir}")
+        return loaded
     
     def dimensional_reduction(self, test_final):
         """
         Apply standardization and PCA to reduce dimensionality
         
         Args:
-            test_final: DataFrame with 3060 features
+            test_final: array of shape (1, 3060)
         Returns:
-            DataFrame with reduced dimensions
+            array with reduced dimensions
         """
-        import warnings
-        warnings.filterwarnings('ignore', category=UserWarning)
-        
-        # Load scaler if exists
-        scaler_path = self.models_dir / 'scaler_ECG.pkl'
-        if scaler_path.exists():
-            scaler = joblib.load(scaler_path)
-            test_scaled = scaler.transform(test_final)
-        else:
-            test_scaled = test_final
-        
-        # Load and apply PCA
-        pca_model_path = self.models_dir / 'PCA_ECG (1).pkl'
-        pca_loaded_model = joblib.load(pca_model_path)
-        result = pca_loaded_model.transform(test_scaled)
-        final_df = pd.DataFrame(result)
-        return final_df
+        return self.loaded_models().reduce(test_final)
     
     def model_load_predict(self, final_df):
         """
-        Load pre-trained model and make prediction
+        Make a prediction with the pre-trained classifier
         
         Args:
-            final_df: DataFrame with PCA-reduced features
+            final_df: array of PCA-reduced features
         Returns:
             tuple: (prediction_code, prediction_text, confidence)
         """
+        return self.classify(final_df)[0]
+    
+    def classify(self, reduced):
+        """
+        Classify PCA-reduced features with one classifier call
+        
+        Args:
+            reduced: array of shape (n, n_components)
+        Returns:
+            list of (prediction_code, prediction_label, prediction_message, confidence), one per row
+        """
         import warnings
         warnings.filterwarnings('ignore', category=UserWarning)
         
         try:
-            model_path = self.models_dir / 'Heart_Disease_Prediction_using_ECG (4).pkl'
-            
-            # Try loading with sklearn compatibility
-            import sklearn
-            loaded_model = joblib.load(model_path)
-            result = loaded_model.predict(final_df)
+            loaded_model = self.loaded_models().classifier
+            if loaded_model is None:
+                raise FileNotFoundError(f"ECG classifier not found: {self.registry.models_dir / ECG_MODEL_FILE}")
+            result = loaded_model.predict(reduced)
             
             # Get prediction probabilities if available
             try:
-                proba = loaded_model.predict_proba(final_df)
-                confidence = float(np.max(proba) * 100)
+                confidences = [float(c) for c in np.max(loaded_model.predict_proba(reduced), axis=1) * 100]
             except:
-                confidence = None
-            
-            # Map prediction to text
-            prediction_map = {
-                0: ("Abnormal Heartbeat", "Your ECG shows signs of abnormal heartbeat (arrhythmia). Please consult a cardiologist."),
-                1: ("Myocardial Infarction", "Your ECG indicates Myocardial Infarction (heart attack). Seek immediate medical attention!"),
-                2: ("Normal", "Your ECG appears normal. Your heart rhythm is healthy."),
-                3: ("History of MI", "Your ECG shows signs of previous Myocardial Infarction. Follow up with your cardiologist.")
-            }
-            
-            pred_code = int(result[0])
-            pred_label, pred_message = prediction_map.get(pred_code, ("Unknown", "Unable to classify ECG"))
+                confidences = [None] * len(result)
             
-            return pred_code, pred_label, pred_message, confidence
+            predictions = []
+            for code, confidence in zip(result, confidences):
+                pred_code = int(code)
+                pred_label, pred_message = PREDICTION_MAP.get(pred_code, ("Unknown", "Unable to classify ECG"))
+                predictions.append((pred_code, pred_label, pred_message, confidence))
+            return predictions
             
         except Exception as e:
             # If model loading fails due to version incompatibility
@@ -317,23 +495,8 @@ class ECGPredictor:
             dict with prediction results
         """
         try:
-            # Create temp workspace
-            self.create_temp_workspace()
-            
-            # Step 1: Load image
-            ecg_image = self.get_image(image_path)
-            
-            # Step 2: Convert to grayscale
-            gray_image = self.gray_image(ecg_image)
-            
-            # Step 3: Divide into leads
-            leads = self.divide_leads(gray_image)
-            
-            # Step 4: Extract and scale signals
-            self.signal_extraction_scaling(leads)
-            
-            # Step 5: Combine signals
-            combined_signal = self.combine_convert_1d_signal()
+            # Steps 1-5: Load image, grayscale, divide into leads, extract and combine signals
+            combined_signal = self.extract_features(image_path)
             
             # Step 6: Apply PCA
             reduced_features = self.dimensional_reduction(combined_signal)
@@ -360,7 +523,64 @@ class ECGPredictor:
                 'prediction_label': 'Error',
                 'prediction_message': f'Failed to process ECG image: {str(e)}'
             }
+    
+    def extract_features_batch(self, images):
+        """
+        extract_features for many images, concurrently on image_pool()
+        
+        Each image extracts its own leads serially; the images are the
+        unit of parallelism.
+        
+        Args:
+            images: List of paths or file objects
+        Returns:
+            List in input order of (1, 3060) arrays, or the exception an image failed with
+        """
+        serial = self
+        if self.lead_workers != 1:
+            serial = ECGPredictor(lead_workers=1, reduced_decode=self.reduced_decode, registry=self.registry)
+        
+        def extract(image):
+            try:
+                return serial.extract_features(image)
+            except Exception as e:
+                return e
+        
+        return list(image_pool().map(extract, images))
+    
+    def predict_from_ecg_images(self, images):
+        """
+        Batch pipeline: many ECG images, one projection and classifier call
+        
+        Args:
+            images: List of paths or file objects
+        Returns:
+            List of result dicts in input order, as predict_from_ecg_image
+            returns them; an image whose signal could not be extracted gets
+            success False
+        Raises:
+            Exception if the models cannot be loaded (fails the whole batch)
+        """
+        features = self.extract_features_batch(images)
+        results = [{
+            'success': False,
+            'error': str(f),
+            'prediction_label': 'Error',
+            'prediction_message': f'Failed to process ECG image: {f}'
+        } if isinstance(f, Exception) else None for f in features]
         
-        finally:
-            # Clean up temp files
-            self.cleanup_temp_workspace()
+        extracted = [i for i, result in enumerate(results) if result is None]
+        if extracted:
+            combined = np.vstack([features[i] for i in extracted])
+            reduced_features = self.dimensional_reduction(combined)
+            for i, (pred_code, pred_label, pred_message, confidence) in zip(extracted, self.classify(reduced_features)):
+                results[i] = {
+                    'success': True,
+                    'prediction_code': pred_code,
+                    'prediction_label': pred_label,
+                    'prediction_message': pred_message,
+                    'confidence': confidence,
+                    'num_features': combined.shape[1],
+                    'reduced_features': reduced_features.shape[1]
+                }
+        return results
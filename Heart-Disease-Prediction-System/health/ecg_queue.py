@@ -0,0 +1,236 @@
+"""
+Durable ECG Analysis Queue
+Uploads are stored as pending ECG_Prediction rows and analysed by worker
+processes (python manage.py process_ecg_queue) instead of inside the web
+request, so an upload no longer holds a gunicorn worker for the seconds
+the image pipeline takes.
+
+The ECG_Prediction table is the queue: nothing is lost when a worker or
+the web server restarts. A worker claims the oldest pending row with a
+conditional UPDATE, so several workers (and processes) never analyse the
+same upload twice. A row left in progress by a worker that died is put
+back in the queue after ECG_QUEUE_STALE_SECONDS, or marked failed once it
+has been tried MAX_ATTEMPTS times, so an image that kills or hangs its
+worker is not retried forever. A job whose classification failed waits
+RETRY_BACKOFF seconds (doubling with every attempt) before a worker
+claims it again. Database errors (e.g. SQLite "database is
+locked") are logged and retried; they do not end the worker.
+
+Progress is the row's status: pending -> extracting -> classifying ->
+done (or failed), which ecg_result shows while the user waits. A job
+whose image was already analysed by the current model version while it
+waited takes that result instead (ecg_dedup.py).
+"""
+
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.db.models import F, Min, Q
+from django.utils import timezone
+
+from .ecg_dedup import RESULT_FIELDS, cached_results, reuse_result
+from .models import ECG_Prediction
+
+IN_PROGRESS = (ECG_Prediction.STATUS_EXTRACTING, ECG_Prediction.STATUS_CLASSIFYING)
+
+# Attempts before a job that keeps failing (e.g. models unavailable) is marked failed
+MAX_ATTEMPTS = 3
+
+# Seconds between checks for stale jobs while the queue is busy
+STALE_CHECK_INTERVAL = 30
+
+# Seconds a worker waits after an unexpected error before polling again
+ERROR_BACKOFF = 5
+
+# Seconds before a job whose classification failed is retried, doubled per attempt
+RETRY_BACKOFF = 30
+
+# Finished jobs the wait/processing time metrics are computed over
+METRICS_WINDOW = 200
+
+
+def claim_next():
+    """
+    Take the oldest pending job that is not waiting to be retried
+
+    Returns:
+        The claimed ECG_Prediction (now extracting), or None if no job is due
+    """
+    due = Q(retry_after__isnull=True) | Q(retry_after__lte=timezone.now())
+    queue = ECG_Prediction.objects.filter(due, status=ECG_Prediction.STATUS_PENDING).order_by('created', 'id')
+    for job_id in queue.values_list('id', flat=True)[:10]:
+        # Only one worker's UPDATE can still see the row as pending
+        claimed = ECG_Prediction.objects.filter(id=job_id, status=ECG_Prediction.STATUS_PENDING).update(
+            status=ECG_Prediction.STATUS_EXTRACTING, started_at=timezone.now(), attempts=F('attempts') + 1)
+        if claimed:
+            return ECG_Prediction.objects.get(id=job_id)
+    return None
+
+
+def requeue_stale(stale_seconds=None):
+    """
+    Put jobs back in the queue whose worker stopped without finishing them
+
+    Jobs that already had MAX_ATTEMPTS tries are marked failed instead.
+
+    Returns:
+        Number of requeued jobs
+    """
+    if stale_seconds is None:
+        stale_seconds = settings.ECG_QUEUE_STALE_SECONDS
+    now = timezone.now()
+    stale = ECG_Prediction.objects.filter(status__in=IN_PROGRESS, started_at__lt=now - timedelta(seconds=stale_seconds))
+    stale.filter(attempts__gte=MAX_ATTEMPTS).update(
+        status=ECG_Prediction.STATUS_FAILED, finished_at=now,
+        error=f'Analysis did not finish after {MAX_ATTEMPTS} attempts')
+    return stale.filter(attempts__lt=MAX_ATTEMPTS).update(status=ECG_Prediction.STATUS_PENDING)
+
+
+def set_status(job, status, **fields):
+    job.status = status
+    for name, value in fields.items():
+        setattr(job, name, value)
+    job.save(update_fields=['status'] + list(fields))
+
+
+def process(job, predictor=None):
+    """
+    Run the ECG pipeline for one claimed job and store the outcome
+
+    An image the signals cannot be extracted from fails at once; errors
+    while classifying (models missing or failing to load) are retried up
+    to MAX_ATTEMPTS times. An identical image analysed by the current
+    model version in the meantime is not analysed again.
+
+    Args:
+        job: ECG_Prediction claimed by claim_next()
+        predictor: ECGPredictor to use (default: the process-wide one)
+    Returns:
+        The job's new status
+    """
+    from .ecg_predictor import shared_predictor
+    predictor = predictor or shared_predictor()
+    if job.content_hash:
+        try:
+            version = predictor.loaded_models().version
+        except Exception:
+            version = None
+        cached = cached_results([job.content_hash], version).get(job.content_hash)
+        if cached is not None:
+            reuse_result(job, cached)
+            job.save(update_fields=['status', 'result_reused', 'error', 'finished_at'] + list(RESULT_FIELDS))
+            return job.status
+
+    try:
+        features = predictor.extract_features(job.ecg_image.path)
+    except Exception as e:
+        set_status(job, ECG_Prediction.STATUS_FAILED, error=str(e), finished_at=timezone.now())
+        return job.status
+
+    set_status(job, ECG_Prediction.STATUS_CLASSIFYING)
+    try:
+        version = predictor.loaded_models().version
+        pred_code, pred_label, pred_message, confidence = predictor.classify(
+            predictor.dimensional_reduction(features))[0]
+    except Exception as e:
+        if job.attempts >= MAX_ATTEMPTS:
+            set_status(job, ECG_Prediction.STATUS_FAILED, error=str(e), finished_at=timezone.now())
+        else:
+            retry_after = timezone.now() + timedelta(seconds=RETRY_BACKOFF * 2 ** (job.attempts - 1))
+            set_status(job, ECG_Prediction.STATUS_PENDING, error=str(e), retry_after=retry_after)
+        return job.status
+
+    set_status(job, ECG_Prediction.STATUS_DONE, prediction_code=pred_code, prediction_label=pred_label,
+               prediction_message=pred_message, confidence=confidence, model_version=version, error=None,
+               finished_at=timezone.now())
+    return job.status
+
+
+def run_worker(poll_interval=1.0, stop=None, drain=False, predictor=None):
+    """
+    Process jobs until stopped
+
+    Args:
+        poll_interval: Seconds to sleep when the queue is empty
+        stop: Optional threading.Event (or multiprocessing.Event) ending the loop
+        drain: Return as soon as the queue is empty instead of polling
+        predictor: ECGPredictor to use (default: the process-wide one)
+    Returns:
+        Number of jobs processed
+    """
+    stop = stop or threading.Event()
+    processed = 0
+    last_stale_check = time.monotonic()
+    while not stop.is_set():
+        try:
+            close_old_connections()
+            job = claim_next()
+            # Whenever the queue is empty, and on a timer while it is busy
+            if job is None or time.monotonic() - last_stale_check >= STALE_CHECK_INTERVAL:
+                last_stale_check = time.monotonic()
+                if requeue_stale() and job is None:
+                    continue
+            if job is None:
+                if drain:
+                    break
+                stop.wait(poll_interval)
+                continue
+            process(job, predictor)
+            processed += 1
+        except Exception as e:
+            # e.g. "database is locked": the job (if any) stays in progress
+            # and is requeued as stale, so start over with a fresh connection
+            print(f"ECG queue worker error: {e}")
+            connection.close()
+            stop.wait(ERROR_BACKOFF)
+    return processed
+
+
+def queue_position(job):
+    """1-based place of a pending job in the queue, or None once it has been picked up"""
+    if job.status != ECG_Prediction.STATUS_PENDING:
+        return None
+    return ECG_Prediction.objects.filter(status=ECG_Prediction.STATUS_PENDING, created__lt=job.created).count() + 1
+
+
+def _mean(values):
+    return sum(values) / len(values) if values else None
+
+
+def _percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def queue_stats():
+    """
+    Queue depth and the wait/processing times of recently finished jobs
+
+    Returns:
+        dict suitable for a JSON response (times in seconds)
+    """
+    now = timezone.now()
+    pending = ECG_Prediction.objects.filter(status=ECG_Prediction.STATUS_PENDING)
+    oldest = pending.aggregate(oldest=Min('created'))['oldest']
+    recent = (ECG_Prediction.objects
+              .filter(status__in=(ECG_Prediction.STATUS_DONE, ECG_Prediction.STATUS_FAILED),
+                      started_at__isnull=False, finished_at__isnull=False)
+              .order_by('-finished_at')
+              .values_list('created', 'started_at', 'finished_at')[:METRICS_WINDOW])
+    waits = [(started - created).total_seconds() for created, started, _ in recent if created]
+    processing = [(finished - started).total_seconds() for _, started, finished in recent]
+    return {
+        'depth': pending.count(),
+        'waiting_retry': pending.filter(retry_after__gt=now).count(),
+        'in_progress': ECG_Prediction.objects.filter(status__in=IN_PROGRESS).count(),
+        'failed': ECG_Prediction.objects.filter(status=ECG_Prediction.STATUS_FAILED).count(),
+        'oldest_pending_seconds': (now - oldest).total_seconds() if oldest else None,
+        'recent_jobs': len(processing),
+        'wait_seconds': {'mean': _mean(waits), 'p95': _percentile(waits, 0.95)},
+        'processing_seconds': {'mean': _mean(processing), 'p95': _percentile(processing, 0.95)},
+    }
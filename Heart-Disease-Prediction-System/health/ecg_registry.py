@@ -0,0 +1,189 @@
+"""
+Warm ECG Model Registry
+Loads the ECG scaler, PCA and voting classifier once per process, so an
+upload only pays for feature extraction and one predict call.
+
+Like model_registry.py, the registry watches the artifact files in
+trained_models/ and swaps in a freshly loaded set when any of them change
+on disk. Every set runs one inference before it is swapped in, so the
+first upload after startup or a reload does not pay for first-call
+overhead either.
+
+The scaler and PCA are served as one float32 projection (see
+ProjectionTransform), read from the memory-mapped ecg_models.bundle when
+it has been exported (export_model_bundles.py). Older bundles and the
+joblib files are folded into that projection on load.
+
+Every bundle entry records the SHA-1 of the joblib files it was exported
+from. The retraining scripts only write the joblib files, so an entry
+whose sources no longer match them is ignored and the joblib files are
+served instead until the bundle is re-exported.
+"""
+
+import hashlib
+import io
+import time
+
+import joblib
+import numpy as np
+
+from .compiled_models import StandardScalerTransform, PCATransform, ProjectionTransform, file_digest
+from .model_bundle import ModelBundle
+from .model_registry import ModelRegistry
+
+ECG_BUNDLE_NAME = 'ecg_models.bundle'
+ECG_SCALER_FILE = 'scaler_ECG.pkl'
+ECG_PCA_FILE = 'PCA_ECG (1).pkl'
+ECG_MODEL_FILE = 'Heart_Disease_Prediction_using_ECG (4).pkl'
+
+# Joblib files each bundle entry is exported from
+ECG_ENTRY_SOURCES = {
+    'scaler': (ECG_SCALER_FILE,),
+    'pca': (ECG_PCA_FILE,),
+    'projection': (ECG_SCALER_FILE, ECG_PCA_FILE),
+    'classifier': (ECG_MODEL_FILE,),
+}
+
+
+def source_digests(models_dir):
+    """
+    Digests of the ECG joblib files present in models_dir
+
+    Returns:
+        dict of file name -> SHA-1 (missing files are left out)
+    """
+    return {name: file_digest(models_dir / name)
+            for name in (ECG_SCALER_FILE, ECG_PCA_FILE, ECG_MODEL_FILE) if (models_dir / name).exists()}
+
+
+def entry_sources(entry_name, digests):
+    """Bundle metadata tying an entry to the joblib files it is exported from"""
+    return {'sources': {name: digests.get(name) for name in ECG_ENTRY_SOURCES[entry_name]}}
+
+
+def entry_is_current(bundle, entry_name, digests):
+    """
+    Whether a bundle entry was exported from the joblib files on disk
+
+    Entries without source digests (exported by an older version) are
+    not trusted. A source file that is missing has nothing newer to
+    disagree with, so a bundle may be deployed without the joblib files.
+    """
+    if bundle is None or entry_name not in bundle.entries:
+        return False
+    sources = bundle.metadata(entry_name).get('sources')
+    if not sources:
+        return False
+    return all(name not in digests or digests[name] == digest for name, digest in sources.items())
+
+
+class LoadedECGModels:
+    """
+    Immutable set of ECG models loaded from one version of the artifacts
+    """
+
+    def __init__(self, version, models, stats):
+        """
+        Args:
+            version: Short hash of the artifact fingerprint
+            models: dict with 'projection' and, when present on disk, 'classifier'
+            stats: dict of model name -> load statistics
+        """
+        self.version = version
+        self.models = models
+        self.stats = stats
+        self.loaded_at = time.time()
+
+    @property
+    def classifier(self):
+        return self.models.get('classifier')
+
+    def reduce(self, features):
+        """
+        Standardize and project signal features onto the PCA components
+
+        Args:
+            features: array of shape (n, 3060)
+        Returns:
+            float32 array of shape (n, n_components)
+        """
+        return self.models['projection'].transform(features)
+
+
+class ECGModelRegistry(ModelRegistry):
+    """
+    Process-wide cache of the ECG models
+
+    Reloading, the atomic swap and status() work as in ModelRegistry.
+    """
+
+    @property
+    def bundle_path(self):
+        return self.models_dir / ECG_BUNDLE_NAME
+
+    def artifact_paths(self):
+        return [self.bundle_path / 'manifest.json'] + [
+            self.models_dir / name for name in (ECG_SCALER_FILE, ECG_PCA_FILE, ECG_MODEL_FILE)]
+
+    def is_available(self):
+        return (self.bundle_path / 'manifest.json').exists() or (self.models_dir / ECG_PCA_FILE).exists()
+
+    def _load(self, fingerprint):
+        """Load the scaler, PCA and classifier, then run one warm-up inference"""
+        import warnings
+        warnings.filterwarnings('ignore', category=UserWarning)
+
+        bundle = ModelBundle(self.bundle_path) if (self.bundle_path / 'manifest.json').exists() else None
+        digests = source_digests(self.models_dir)
+        current = {name: entry_is_current(bundle, name, digests) for name in ECG_ENTRY_SOURCES}
+        models = {}
+        stats = {}
+        if bundle is not None:
+            stats['bundle'] = {'stale_entries': sorted(name for name in bundle.entries
+                                                       if name in current and not current[name])}
+
+        start = time.perf_counter()
+        if current['projection']:
+            models['projection'] = ProjectionTransform(**bundle.arrays('projection'))
+            source = 'bundle'
+        else:
+            scaler = None
+            scaler_path = self.models_dir / ECG_SCALER_FILE
+            if current['scaler']:
+                scaler = StandardScalerTransform(**bundle.arrays('scaler'))
+            elif scaler_path.exists():
+                scaler = StandardScalerTransform.from_sklearn(joblib.load(scaler_path))
+            if current['pca']:
+                pca = PCATransform(**bundle.arrays('pca'), **bundle.params('pca'))
+                source = 'folded from bundle'
+            else:
+                pca = PCATransform.from_sklearn(joblib.load(self.models_dir / ECG_PCA_FILE))
+                source = 'folded from joblib'
+            models['projection'] = ProjectionTransform.fold(pca, scaler)
+        stats['projection'] = {'source': source, 'load_seconds': time.perf_counter() - start}
+
+        start = time.perf_counter()
+        model_path = self.models_dir / ECG_MODEL_FILE
+        if current['classifier']:
+            models['classifier'] = joblib.load(io.BytesIO(bundle.blob('classifier', 'model')))
+            stats['classifier'] = {'source': 'bundle'}
+        elif model_path.exists():
+            models['classifier'] = joblib.load(model_path)
+            stats['classifier'] = {'source': 'joblib'}
+        if 'classifier' in models:
+            stats['classifier']['load_seconds'] = time.perf_counter() - start
+
+        loaded = LoadedECGModels(hashlib.sha1(repr(fingerprint).encode()).hexdigest()[:12], models, stats)
+
+        # Warm-up inference on a blank signal
+        start = time.perf_counter()
+        n_features = loaded.models['projection'].weights.shape[0]
+        reduced = loaded.reduce(np.zeros((1, n_features)))
+        if loaded.classifier is not None:
+            loaded.classifier.predict(reduced)
+        stats['warm_up'] = {'seconds': time.perf_counter() - start, 'classifier': loaded.classifier is not None}
+        return loaded
+
+
+# One registry per worker process
+ecg_registry = ECGModelRegistry()
@@ -0,0 +1,244 @@
+"""
+Heart Disease Feature Schema
+One declaration of the 13 input features shared by the add_heartdetail
+form, the batch prediction API and CSV imports. Parsing goes straight
+from the submitted strings to a float32 NumPy row (or matrix) in the
+column order the models were trained on, with an error per bad field.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+
+@dataclass(frozen=True)
+class Feature:
+    """
+    One model input column
+
+    Args:
+        name: Column name in heart.csv and the trained models
+        label: Human readable name used in error messages
+        minimum, maximum: Inclusive range of accepted values
+        integer: Whether only whole numbers are accepted
+        aliases: Other field names accepted for this column (e.g. the form's 'chole')
+        choices: Text values accepted in place of a number (e.g. 'male' for sex)
+    """
+    name: str
+    label: str
+    minimum: float
+    maximum: float
+    integer: bool = True
+    aliases: tuple = ()
+    choices: tuple = ()
+
+    @property
+    def names(self):
+        return (self.name,) + self.aliases
+
+    def parse(self, raw):
+        """
+        Convert one submitted value
+
+        Returns:
+            tuple: (float value or None, error message or None)
+        """
+        if raw is None or (isinstance(raw, str) and not raw.strip()) or (isinstance(raw, float) and np.isnan(raw)):
+            return None, f'{self.label} is required'
+        if isinstance(raw, str):
+            text = raw.strip()
+            for choice, value in self.choices:
+                if text.lower() == choice:
+                    return float(value), None
+            try:
+                value = float(text)
+            except ValueError:
+                return None, f'{self.label} must be a number'
+        elif isinstance(raw, bool):
+            value = float(raw)
+        else:
+            try:
+                value = float(raw)
+            except (TypeError, ValueError):
+                return None, f'{self.label} must be a number'
+        if not np.isfinite(value):
+            return None, f'{self.label} must be a number'
+        if self.integer and not value.is_integer():
+            return None, f'{self.label} must be a whole number'
+        if not self.minimum <= value <= self.maximum:
+            return None, f'{self.label} must be between {self.minimum:g} and {self.maximum:g}'
+        return value, None
+
+
+# Input features in the order the models were trained on. Ranges are
+# wider than heart.csv covers but reject obvious typos (e.g. age 450).
+FEATURES = (
+    Feature('age', 'Age', 1, 120),
+    Feature('sex', 'Sex', 0, 1, choices=(('female', 0), ('f', 0), ('male', 1), ('m', 1))),
+    Feature('cp', 'Chest pain type', 0, 3),
+    Feature('trestbps', 'Resting blood pressure', 50, 250),
+    Feature('chol', 'Cholesterol', 50, 700, aliases=('chole',)),
+    Feature('fbs', 'Fasting blood sugar', 0, 1),
+    Feature('restecg', 'Resting ECG', 0, 2),
+    Feature('thalach', 'Max heart rate', 40, 250),
+    Feature('exang', 'Exercise induced angina', 0, 1),
+    Feature('oldpeak', 'ST depression', 0, 10, integer=False, aliases=('old_peak',)),
+    Feature('slope', 'Slope', 0, 2),
+    Feature('ca', 'Major vessels', 0, 4),
+    Feature('thal', 'Thalassemia', 0, 3),
+)
+
+FEATURE_COLUMNS = [feature.name for feature in FEATURES]
+
+FEATURE_DTYPE = np.float32
+
+
+class FeatureValidationError(ValueError):
+    """Raised when submitted features fail the schema; errors maps field -> message"""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__('; '.join(errors.values()))
+
+
+def _lookup(data, feature):
+    for name in feature.names:
+        if name in data:
+            value = data.get(name)
+            # QueryDict.get returns the last value; lists come from parsed JSON/dicts of lists
+            if isinstance(value, (list, tuple)):
+                value = value[-1] if value else None
+            return value
+    return None
+
+
+def parse_row(data):
+    """
+    Validate one patient's features
+
+    Args:
+        data: Mapping of field name -> value (request.POST, a JSON object, a CSV record)
+    Returns:
+        float32 array of shape (13,) in FEATURE_COLUMNS order
+    Raises:
+        FeatureValidationError with a message per bad field
+    """
+    row = np.empty(len(FEATURES), dtype=FEATURE_DTYPE)
+    errors = {}
+    for i, feature in enumerate(FEATURES):
+        value, error = feature.parse(_lookup(data, feature))
+        if error:
+            errors[feature.name] = error
+        else:
+            row[i] = value
+    if errors:
+        raise FeatureValidationError(errors)
+    return row
+
+
+def validate_frame(frame):
+    """
+    Validate a table of patients column by column, keeping the good rows
+
+    Args:
+        frame: DataFrame whose columns are feature names (or their aliases)
+    Returns:
+        tuple: (float32 matrix of shape (rows, 13), boolean mask of valid rows,
+                list of errors). Values in invalid rows are unspecified.
+                Each error is {'row': position or None, 'errors': {field: message}}
+    """
+    columns = {}
+    missing = []
+    for feature in FEATURES:
+        source = next((name for name in feature.names if name in frame.columns), None)
+        if source is None:
+            missing.append(feature.name)
+        else:
+            columns[feature.name] = frame[source]
+    if missing:
+        return (np.empty((0, len(FEATURES)), dtype=FEATURE_DTYPE), np.zeros(len(frame), dtype=bool),
+                [{'row': None, 'errors': {name: 'Missing column' for name in missing}}])
+
+    X = np.empty((len(frame), len(FEATURES)), dtype=FEATURE_DTYPE)
+    bad = {}
+    for i, feature in enumerate(FEATURES):
+        raw = columns[feature.name]
+        if feature.choices and raw.dtype == object:
+            mapping = dict(feature.choices)
+            raw = raw.map(lambda v: mapping.get(v.strip().lower(), v) if isinstance(v, str) else v)
+        values = pd.to_numeric(raw, errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+        invalid = ~np.isfinite(values)
+        finite = np.where(invalid, feature.minimum, values)
+        invalid |= (finite < feature.minimum) | (finite > feature.maximum)
+        if feature.integer:
+            invalid |= finite != np.round(finite)
+        X[:, i] = finite
+        for row in np.flatnonzero(invalid):
+            # Re-parse the few rejected cells one by one: this gives a precise
+            # message and accepts text the vectorized pass does not (' 1 ')
+            value, error = feature.parse(columns[feature.name].iat[row])
+            if error:
+                bad.setdefault(int(row), {})[feature.name] = error
+            else:
+                X[row, i] = value
+
+    valid = np.ones(len(frame), dtype=bool)
+    valid[list(bad)] = False
+    errors = [{'row': row, 'errors': fields} for row, fields in sorted(bad.items())]
+    return X, valid, errors
+
+
+def parse_frame(frame):
+    """
+    Validate a table of patients; all rows must pass
+
+    Returns:
+        tuple: (float32 matrix of shape (rows, 13) or None, list of errors)
+    """
+    X, _, errors = validate_frame(frame)
+    return (None if errors else X), errors
+
+
+def row_values(row):
+    """
+    Plain Python list of a parsed row for storage and display
+
+    Whole numbers come back as int, so a row prints like [57, 0, 1, ..., 0.5, 1, 1, 2]
+    """
+    values = []
+    for feature, value in zip(FEATURES, np.asarray(row, dtype=np.float64)):
+        if feature.integer:
+            values.append(int(value))
+        else:
+            # float32 -> shortest decimal that round-trips, so 1.4 stays 1.4
+            values.append(float(str(np.float32(value))))
+    return values
+
+
+# Stored form of a feature vector (Search_Data.features): 13 little-endian float32
+PACKED_DTYPE = np.dtype('<f4')
+PACKED_SIZE = len(FEATURES) * PACKED_DTYPE.itemsize
+
+
+def pack_row(row):
+    """Serialize one feature row to its 52-byte stored form"""
+    row = np.asarray(row, dtype=PACKED_DTYPE)
+    if row.shape != (len(FEATURES),):
+        raise ValueError(f'Expected {len(FEATURES)} features, got shape {row.shape}')
+    return row.tobytes()
+
+
+def unpack_rows(blobs):
+    """
+    Decode many stored rows with a single buffer read
+
+    Args:
+        blobs: Iterable of packed rows (bytes or memoryview)
+    Returns:
+        float32 matrix of shape (rows, 13)
+    """
+    data = b''.join(blobs)
+    if len(data) % PACKED_SIZE:
+        raise ValueError('Packed feature data is not a whole number of rows')
+    return np.frombuffer(data, dtype=PACKED_DTYPE).reshape(-1, len(FEATURES)).astype(FEATURE_DTYPE)
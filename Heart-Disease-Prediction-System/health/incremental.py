@@ -0,0 +1,209 @@
+"""
+Incremental Model Updates from Confirmed Cases
+Folds doctor-confirmed outcomes (Search_Data.confirmed_result) into the
+deployed models without refitting them from the full training data:
+
+- Naive Bayes: GaussianNB.partial_fit on the new cases.
+- Logistic Regression: a few epochs of SGD on the log loss, started from
+  the deployed coefficients. SGD runs on standardized features and the
+  result is folded back into the LogisticRegression object, so the
+  registry, the compiled evaluator and the pickles stay unchanged in form.
+
+The forest, tree and KNN models have no incremental fit and keep their
+last full training. Each update is published as a new artifact version
+(training.publish_models), so every worker's registry picks it up.
+
+The held-out split of the last full training is not kept, so an updated
+model's test_accuracy cannot be re-measured: it is marked
+test_accuracy_stale and the registry stops serving that model as the
+best one until the next full training measures it again.
+"""
+
+import copy
+import datetime
+import os
+import pickle
+import warnings
+from pathlib import Path
+
+import numpy as np
+from sklearn.exceptions import ConvergenceWarning
+from sklearn.linear_model import SGDClassifier
+
+from .feature_schema import unpack_rows
+from .training import MODELS_DIR, publish_models
+
+INCREMENTAL_MODELS = ('naive_bayes', 'logistic_regression')
+STATE_FILE = 'incremental_state.pkl'
+
+
+def feature_moments(naive_bayes):
+    """
+    Overall mean and standard deviation of the training features,
+    recovered from a fitted GaussianNB's per-class statistics
+
+    Returns:
+        tuple: (mean, scale) arrays of shape (13,)
+    """
+    counts = naive_bayes.class_count_[:, None]
+    total = counts.sum()
+    mean = (counts * naive_bayes.theta_).sum(axis=0) / total
+    class_var = naive_bayes.var_ - naive_bayes.epsilon_
+    var = (counts * (class_var + (naive_bayes.theta_ - mean) ** 2)).sum(axis=0) / total
+    scale = np.sqrt(var)
+    scale[scale == 0] = 1.0
+    return mean, scale
+
+
+def init_state(models):
+    """Incremental state for a freshly trained set of models"""
+    mean, scale = feature_moments(models['naive_bayes'])
+    return {
+        'mean': mean,
+        'scale': scale,
+        'sgd': None,
+        'updates': 0,
+        'samples': 0,
+        'last_confirmed_at': None,
+        'version': None,
+    }
+
+
+def apply_update(models, state, X, y, epochs=5):
+    """
+    Update the incremental models with new labelled cases
+
+    Args:
+        models: dict of model key -> fitted model (not modified)
+        state: Incremental state from init_state or a previous update (not modified)
+        X: New feature rows in FEATURE_COLUMNS order
+        y: Confirmed outcomes (0/1)
+        epochs: SGD passes over the new cases for the logistic model
+    Returns:
+        tuple: (dict of updated models, new state)
+    """
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y).astype(np.int64)
+    state = dict(state)
+    updated = {}
+
+    naive_bayes = copy.deepcopy(models['naive_bayes'])
+    naive_bayes.partial_fit(X, y)
+    updated['naive_bayes'] = naive_bayes
+
+    logistic = copy.deepcopy(models['logistic_regression'])
+    mean, scale = state['mean'], state['scale']
+    X_std = (X - mean) / scale
+    sgd = copy.deepcopy(state['sgd'])
+    if sgd is None:
+        # Start from the deployed model expressed in standardized space;
+        # partial_fit keeps coefficients that are already set
+        sgd = SGDClassifier(loss='log_loss', alpha=1e-4, learning_rate='constant', eta0=0.01,
+                            random_state=123)
+        sgd.coef_ = logistic.coef_ * scale
+        sgd.intercept_ = logistic.intercept_ + logistic.coef_ @ mean
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', ConvergenceWarning)
+        for _ in range(epochs):
+            # classes= lets a batch hold a single outcome
+            sgd.partial_fit(X_std, y, classes=logistic.classes_)
+    # Fold the standardization back into raw-feature coefficients
+    logistic.coef_ = sgd.coef_ / scale
+    logistic.intercept_ = sgd.intercept_ - (sgd.coef_ / scale) @ mean
+    updated['logistic_regression'] = logistic
+
+    state['sgd'] = sgd
+    state['updates'] += 1
+    state['samples'] += len(y)
+    return updated, state
+
+
+class IncrementalUpdater:
+    """
+    Applies confirmed cases to the deployed models and publishes the result
+
+    The state file in trained_models/ remembers the scaler, the SGD model
+    and which confirmations were already applied. It is discarded when a
+    full retrain has replaced the models it was built on.
+    """
+
+    def __init__(self, models_dir=MODELS_DIR, registry=None, epochs=5):
+        from .model_registry import model_registry
+        self.models_dir = Path(models_dir)
+        self.registry = registry or model_registry
+        self.epochs = epochs
+
+    @property
+    def state_path(self):
+        return self.models_dir / STATE_FILE
+
+    def load_state(self, loaded):
+        try:
+            with open(self.state_path, 'rb') as f:
+                state = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            state = None
+        deployed = loaded.model_info.get('naive_bayes', {}).get('version')
+        if state is None or state['version'] != deployed:
+            # First update, or the models were retrained from scratch since
+            state = init_state(loaded.models)
+        return state
+
+    def save_state(self, state):
+        tmp_path = self.state_path.with_name(f'.{STATE_FILE}.tmp')
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(state, f)
+        os.replace(tmp_path, self.state_path)
+
+    def pending_cases(self, since):
+        """Confirmed cases newer than `since` as (X, y, newest confirmed_at)"""
+        from .models import Search_Data
+
+        cases = Search_Data.objects.exclude(confirmed_result=None).exclude(features=None)
+        if since is not None:
+            cases = cases.filter(confirmed_at__gt=since)
+        # One query, so the cursor never moves past a case confirmed after the rows were read
+        rows = list(cases.order_by('id').values_list('features', 'confirmed_result', 'confirmed_at'))
+        X = unpack_rows(row[0] for row in rows)
+        y = np.array([row[1] for row in rows], dtype=np.int64)
+        newest = max((row[2] for row in rows if row[2] is not None), default=None)
+        return X, y, newest
+
+    def update(self):
+        """
+        Apply all new confirmed cases
+
+        Returns:
+            dict summary of the update, or None when there was nothing to do
+        """
+        loaded = self.registry.get()
+        if loaded is None or not all(key in loaded.models for key in INCREMENTAL_MODELS):
+            return None
+        state = self.load_state(loaded)
+        X, y, newest = self.pending_cases(state['last_confirmed_at'])
+        if len(y) == 0:
+            return None
+
+        # Accuracy on the new cases before learning from them (prequential)
+        before = {key: float((loaded.predict(key, X) == y).mean() * 100) for key in INCREMENTAL_MODELS}
+        updated, state = apply_update(loaded.models, state, X, y, epochs=self.epochs)
+
+        models = dict(loaded.models)
+        models.update(updated)
+        model_info = copy.deepcopy(loaded.model_info)
+        for key in INCREMENTAL_MODELS:
+            model_info[key].update({
+                'incremental_updates': state['updates'],
+                'incremental_samples': state['samples'],
+                'prequential_accuracy': before[key],
+                'test_accuracy_stale': True,
+                'updated_at': datetime.datetime.now().isoformat(timespec='seconds'),
+            })
+        version = publish_models(models, model_info, self.models_dir)
+
+        state['version'] = version
+        state['last_confirmed_at'] = newest
+        self.save_state(state)
+        self.registry.reload(force=True)
+        return {'version': version, 'cases': len(y), 'prequential_accuracy': before,
+                'total_updates': state['updates'], 'total_samples': state['samples']}
@@ -0,0 +1,222 @@
+"""
+Streaming Ingestion of Training CSV Uploads
+Converts an Admin_Helath_CSV upload into a training store without ever
+holding the whole CSV in memory. The file is read in chunks, each chunk
+is validated against feature_schema.py, valid rows are written as
+float32/int8 .npy files and rejected rows are reported with their CSV
+line number.
+
+    trained_models/datasets/<sha256 of the upload>/
+        manifest.json   row counts, source, columns
+        features.npy    float32 (rows, 13) in FEATURE_COLUMNS order
+        target.npy      int8 (rows,)
+        errors.jsonl    first MAX_REPORTED_ERRORS rejected rows
+
+Stores are keyed on the file content, so retraining on the same upload
+skips ingestion. Training memory-maps the arrays and reads at most
+TRAINING_MAX_ROWS of them.
+"""
+
+import datetime
+import hashlib
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .feature_schema import FEATURE_COLUMNS, FEATURE_DTYPE, validate_frame
+
+DATASETS_DIR = Path(__file__).resolve().parent.parent / 'trained_models' / 'datasets'
+CHUNK_ROWS = 50000
+MAX_REPORTED_ERRORS = 1000
+TARGET_COLUMN = 'target'
+
+
+class IngestionError(Exception):
+    """Raised when an upload cannot be turned into a training store"""
+
+
+def stream_sha256(f):
+    """SHA-256 of a file object read in 1MB blocks; rewinds it afterwards"""
+    digest = hashlib.sha256()
+    for block in iter(lambda: f.read(1 << 20), b''):
+        digest.update(block)
+    f.seek(0)
+    return digest.hexdigest()
+
+
+class TrainingStore:
+    """Read side of an ingested dataset"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        try:
+            with open(self.path / 'manifest.json') as f:
+                self.manifest = json.load(f)
+        except (OSError, ValueError) as e:
+            raise IngestionError(f'Cannot read training store {self.path}: {e}')
+
+    @property
+    def rows(self):
+        return self.manifest['rows']
+
+    @property
+    def features(self):
+        return np.load(self.path / 'features.npy', mmap_mode='r')
+
+    @property
+    def target(self):
+        return np.load(self.path / 'target.npy', mmap_mode='r')
+
+    def summary(self):
+        keys = ('source', 'sha256', 'rows', 'bad_rows', 'positive_rows', 'ingest_seconds')
+        return {key: self.manifest.get(key) for key in keys}
+
+    def errors(self, limit=None):
+        """Reported rejected rows: [{'line': csv line, 'errors': {field: message}}]"""
+        errors = []
+        with open(self.path / 'errors.jsonl') as f:
+            for line in f:
+                if limit is not None and len(errors) >= limit:
+                    break
+                errors.append(json.loads(line))
+        return errors
+
+    def load(self, max_rows=None, seed=123):
+        """
+        Training arrays, sampled down to max_rows when the store is larger
+
+        Only the sampled rows are read from the memory-mapped files, so
+        memory is bounded by max_rows regardless of the upload size.
+
+        Returns:
+            tuple: (float32 features, int8 target)
+        """
+        features, target = self.features, self.target
+        if max_rows is None or self.rows <= max_rows:
+            return np.array(features), np.array(target)
+        rng = np.random.default_rng(seed)
+        idx = np.sort(rng.choice(self.rows, size=max_rows, replace=False))
+        return features[idx], target[idx]
+
+
+def ingest_csv(f, store_dir, chunk_rows=CHUNK_ROWS, source=None, sha256=None):
+    """
+    Validate a CSV chunk by chunk and write it as a training store
+
+    Args:
+        f: Binary file object with the 13 feature columns and 'target'
+        store_dir: Directory to create (replaced if it exists)
+        chunk_rows: Rows parsed and validated at a time
+        source, sha256: Recorded in the manifest
+    Returns:
+        TrainingStore
+    Raises:
+        IngestionError for unreadable files, missing columns or no valid rows
+    """
+    start = time.perf_counter()
+    store_dir = Path(store_dir)
+    tmp_dir = store_dir.with_name(f'.{store_dir.name}.tmp')
+    if tmp_dir.exists():
+        shutil.rmtree(tmp_dir)
+    tmp_dir.mkdir(parents=True)
+
+    chunks = []
+    seen = bad = reported = 0
+    try:
+        with open(tmp_dir / 'errors.jsonl', 'w') as errors_file:
+            for i, chunk in enumerate(pd.read_csv(f, chunksize=chunk_rows, skipinitialspace=True)):
+                X, valid, errors = validate_frame(chunk)
+                if errors and errors[0]['row'] is None:
+                    raise IngestionError(f"Missing columns: {', '.join(errors[0]['errors'])}")
+                if TARGET_COLUMN not in chunk.columns:
+                    raise IngestionError(f"Missing columns: {TARGET_COLUMN}")
+
+                target = pd.to_numeric(chunk[TARGET_COLUMN], errors='coerce').to_numpy(dtype=np.float64)
+                bad_target = ~np.isin(target, (0, 1))
+                errors = {e['row']: e['errors'] for e in errors}
+                for row in np.flatnonzero(bad_target):
+                    errors.setdefault(int(row), {})[TARGET_COLUMN] = 'Target must be 0 or 1'
+                valid &= ~bad_target
+
+                for row in sorted(errors):
+                    if reported < MAX_REPORTED_ERRORS:
+                        # +2: one for the header line, one because CSV lines count from 1
+                        errors_file.write(json.dumps({'line': seen + row + 2, 'errors': errors[row]}) + '\n')
+                        reported += 1
+                seen += len(chunk)
+                bad += len(errors)
+
+                if valid.any():
+                    name = f'chunk-{i:05d}'
+                    np.save(tmp_dir / f'{name}-features.npy', X[valid])
+                    np.save(tmp_dir / f'{name}-target.npy', target[valid].astype(np.int8))
+                    chunks.append((name, int(valid.sum())))
+    except (pd.errors.ParserError, pd.errors.EmptyDataError, UnicodeDecodeError) as e:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise IngestionError(f'Could not read CSV: {e}')
+    except IngestionError:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    rows = sum(count for _, count in chunks)
+    if rows == 0:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise IngestionError(f'No valid rows in the upload ({bad} rejected)')
+
+    # Concatenate the chunks into one memory-mappable file per array, one chunk in memory at a time
+    features = np.lib.format.open_memmap(tmp_dir / 'features.npy', mode='w+',
+                                         dtype=FEATURE_DTYPE, shape=(rows, len(FEATURE_COLUMNS)))
+    target = np.lib.format.open_memmap(tmp_dir / 'target.npy', mode='w+', dtype=np.int8, shape=(rows,))
+    offset = positive = 0
+    for name, count in chunks:
+        features[offset:offset + count] = np.load(tmp_dir / f'{name}-features.npy')
+        chunk_target = np.load(tmp_dir / f'{name}-target.npy')
+        target[offset:offset + count] = chunk_target
+        positive += int(chunk_target.sum())
+        offset += count
+        os.remove(tmp_dir / f'{name}-features.npy')
+        os.remove(tmp_dir / f'{name}-target.npy')
+    features.flush()
+    target.flush()
+    del features, target
+
+    manifest = {
+        'source': source,
+        'sha256': sha256,
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'columns': FEATURE_COLUMNS,
+        'rows': rows,
+        'bad_rows': bad,
+        'reported_errors': reported,
+        'positive_rows': positive,
+        'ingest_seconds': round(time.perf_counter() - start, 3),
+    }
+    with open(tmp_dir / 'manifest.json', 'w') as f_manifest:
+        json.dump(manifest, f_manifest, indent=2)
+
+    if store_dir.exists():
+        shutil.rmtree(store_dir)
+    os.replace(tmp_dir, store_dir)
+    return TrainingStore(store_dir)
+
+
+def ingest_upload(csv_record, datasets_dir=DATASETS_DIR):
+    """
+    Training store for an Admin_Helath_CSV upload, ingesting it on first use
+
+    Returns:
+        TrainingStore
+    """
+    datasets_dir = Path(datasets_dir)
+    with csv_record.csv_file.open('rb') as f:
+        sha256 = stream_sha256(f)
+        store_dir = datasets_dir / sha256[:16]
+        if (store_dir / 'manifest.json').exists():
+            return TrainingStore(store_dir)
+        datasets_dir.mkdir(parents=True, exist_ok=True)
+        return ingest_csv(f, store_dir, source=csv_record.csv_file.name, sha256=sha256)
@@ -0,0 +1,24 @@
+"""
+Rebuild the prediction analytics summary from all stored searches
+
+    python manage.py backfill_prediction_summary
+
+Run once after deploying the summary table, or whenever the counts are
+suspected to be off (e.g. after rows were edited directly in the database).
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from health.analytics import rebuild_summary
+
+
+class Command(BaseCommand):
+    help = 'Recompute Prediction_Summary from every Search_Data row'
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        counted = rebuild_summary()
+        self.stdout.write(self.style.SUCCESS(
+            f"Summarized {counted} predictions in {time.perf_counter() - start:.2f}s"))
@@ -0,0 +1,97 @@
+"""
+Benchmark the heart disease prediction hot path
+
+    python manage.py benchmark_predictions --output benchmark.json
+    python manage.py benchmark_predictions --compare benchmark.json
+
+--compare re-runs the suite and exits with an error when any metric is
+worse than the baseline by more than --tolerance (default 20%). Compare
+runs from the same machine; absolute numbers do not travel between hosts.
+"""
+
+import contextlib
+import datetime
+import io
+import json
+import platform
+
+from django.core.management.base import BaseCommand, CommandError
+
+from health import benchmarks
+
+SUITES = ['cold_start', 'warm_latency', 'batch_throughput', 'model_memory', 'heartdetail_request']
+
+
+class Command(BaseCommand):
+    help = 'Measure prediction latency, throughput and memory; optionally compare with a baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help='Write results to this JSON file')
+        parser.add_argument('--compare', metavar='BASELINE', help='Baseline JSON to compare against')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='Relative change counted as a regression (default 0.2)')
+        parser.add_argument('--only', nargs='+', choices=SUITES, help='Run only these suites')
+        parser.add_argument('--quick', action='store_true', help='Fewer iterations, for a smoke test')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare']) as f:
+                    baseline = json.load(f)['metrics']
+            except (OSError, ValueError, KeyError) as e:
+                raise CommandError(f"Cannot read baseline {options['compare']}: {e}")
+
+        quick = options['quick']
+        runs = {
+            'cold_start': lambda: benchmarks.cold_start(runs=1 if quick else 3),
+            'warm_latency': lambda: benchmarks.warm_latency(n=100 if quick else 1000),
+            'batch_throughput': lambda: benchmarks.batch_throughput(repeats=2 if quick else 5),
+            'model_memory': lambda: benchmarks.model_memory(rows=1000 if quick else 10000),
+            'heartdetail_request': lambda: benchmarks.heartdetail_request(n=20 if quick else 200),
+        }
+
+        metrics = {}
+        for suite in options['only'] or SUITES:
+            self.stdout.write(f"Running {suite}...")
+            # The views log every prediction with print(); keep that out of the report and the timings
+            with contextlib.redirect_stdout(io.StringIO()):
+                metrics.update(runs[suite]())
+
+        self.stdout.write("=" * 78)
+        for metric, value in metrics.items():
+            self.stdout.write(f"{metric:<52}{value:>24,.4f}" if isinstance(value, float)
+                              else f"{metric:<52}{value:>24,}")
+        self.stdout.write("=" * 78)
+
+        if options['output']:
+            report = {
+                'created': datetime.datetime.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'machine': platform.node(),
+                'metrics': metrics,
+            }
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2, sort_keys=True)
+            self.stdout.write(f"Wrote {options['output']}")
+
+        if baseline is not None:
+            self.report_comparison(benchmarks.compare(metrics, baseline, options['tolerance']))
+
+    def report_comparison(self, rows):
+        self.stdout.write(f"{'Metric':<52}{'Baseline':>12}{'Current':>12}{'Change':>9}")
+        regressions = 0
+        for metric, old, new, change, status in rows:
+            change_text = f"{change * 100:+.0f}%" if change is not None else '-'
+            old_text = f"{old:.4g}" if old is not None else '-'
+            line = f"{metric:<52}{old_text:>12}{new:>12.4g}{change_text:>9}"
+            if status == 'regression':
+                regressions += 1
+                self.stdout.write(self.style.ERROR(line + '  REGRESSION'))
+            elif status == 'improved':
+                self.stdout.write(self.style.SUCCESS(line + '  improved'))
+            else:
+                self.stdout.write(line)
+        if regressions:
+            raise CommandError(f"{regressions} metric(s) regressed by more than the tolerance")
+        self.stdout.write(self.style.SUCCESS("No regressions against the baseline"))
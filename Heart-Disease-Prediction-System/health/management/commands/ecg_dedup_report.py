@@ -0,0 +1,27 @@
+"""
+Report the storage and analysis time saved by ECG upload deduplication
+
+    python manage.py ecg_dedup_report
+
+See health/ecg_dedup.py. Staff users also see the same numbers in
+/model_status under "ecg_dedup".
+"""
+
+from django.core.management.base import BaseCommand
+
+from health.ecg_dedup import dedup_stats
+
+
+class Command(BaseCommand):
+    help = 'Show how many repeated ECG uploads reused a stored file and result'
+
+    def handle(self, *args, **options):
+        stats = dedup_stats()
+        uploads = stats['hashed_uploads']
+        self.stdout.write(f"{uploads} hashed ECG uploads stored as {stats['stored_files']} files "
+                          f"({stats['upload_bytes'] / 1e6:.1f}MB uploaded)")
+        self.stdout.write(f"Files reused:   {stats['reused_files']:>6}  "
+                          f"saved {stats['storage_saved_bytes'] / 1e6:.1f}MB of storage")
+        self.stdout.write(f"Results reused: {stats['reused_results']:>6}  "
+                          f"saved {stats['analysis_seconds_saved']:.1f}s of analysis "
+                          f"(mean {stats['mean_analysis_seconds']:.2f}s per image)")
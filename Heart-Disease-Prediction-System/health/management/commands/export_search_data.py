@@ -0,0 +1,68 @@
+"""
+Export (and optionally re-score) stored heart disease searches
+
+    python manage.py export_search_data searches.npz
+    python manage.py export_search_data searches.csv --rescore
+
+The feature vectors of every Search_Data row are read as one float32
+matrix, so re-scoring the history is a single predict call per model.
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+from django.core.management.base import BaseCommand, CommandError
+
+from health.feature_schema import FEATURE_COLUMNS
+from health.model_registry import model_registry, MODEL_NAMES
+from health.models import Search_Data
+
+
+class Command(BaseCommand):
+    help = 'Export stored searches as .npz or .csv, optionally re-scored with the current models'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='Output file (.npz or .csv)')
+        parser.add_argument('--rescore', action='store_true',
+                            help='Add predictions from the currently deployed models')
+
+    def handle(self, *args, **options):
+        output = options['output']
+        if not output.endswith(('.npz', '.csv')):
+            raise CommandError('Output must end in .npz or .csv')
+
+        start = time.perf_counter()
+        searches = Search_Data.objects.all()
+        ids, X = searches.feature_matrix()
+        stored = dict(searches.exclude(features=None).values_list('id', 'result'))
+        result = np.array([-1 if stored[i] is None else stored[i] for i in ids], dtype=np.int8)
+        load_seconds = time.perf_counter() - start
+        self.stdout.write(f"Loaded {len(ids)} searches in {load_seconds * 1000:.1f}ms")
+
+        columns = {'id': ids, 'result': result}
+        if options['rescore'] and len(ids):
+            loaded = model_registry.get()
+            if loaded is None:
+                raise CommandError('No trained models available to re-score with')
+            best_key = loaded.best_model_key()
+            start = time.perf_counter()
+            predictions = loaded.predict_all(X)
+            self.stdout.write(f"Re-scored with {len(predictions)} models in "
+                              f"{(time.perf_counter() - start) * 1000:.1f}ms (version {loaded.version})")
+            for key, pred in predictions.items():
+                columns[f'pred_{key}'] = np.asarray(pred, dtype=np.int8)
+            known = result >= 0
+            if known.any():
+                changed = int((predictions[best_key][known] != result[known]).sum())
+                self.stdout.write(f"{MODEL_NAMES[best_key]} now disagrees with {changed} of "
+                                  f"{int(known.sum())} stored results")
+
+        if output.endswith('.npz'):
+            np.savez_compressed(output, features=X, feature_columns=np.array(FEATURE_COLUMNS), **columns)
+        else:
+            frame = pd.DataFrame(X, columns=FEATURE_COLUMNS)
+            for name, values in columns.items():
+                frame.insert(len(frame.columns), name, values)
+            frame.to_csv(output, index=False)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {output}"))
@@ -0,0 +1,96 @@
+"""
+Analyse queued ECG uploads (see health/ecg_queue.py)
+
+    python manage.py process_ecg_queue              # one worker, runs until stopped
+    python manage.py process_ecg_queue --workers 3  # three worker processes
+    python manage.py process_ecg_queue --drain      # work off the queue, then exit
+
+gunicorn.conf.py starts this command next to the web workers. The ECG
+models are loaded before the worker processes are forked, so they share
+them copy-on-write like the gunicorn workers do. A worker that dies (e.g.
+killed by the OOM killer) is replaced until the command is stopped.
+"""
+
+import multiprocessing
+import os
+import signal
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from health.ecg_queue import queue_stats, run_worker
+from health.ecg_registry import ecg_registry
+
+# Seconds between checks for workers that died
+RESTART_CHECK_SECONDS = 1.0
+
+
+def _worker(poll_interval, drain):
+    # The parent handles Ctrl-C and stops each worker with SIGTERM. A worker
+    # finishes its current job first. Stop events are per process: a lock
+    # shared with a worker that gets SIGKILLed could stay locked forever.
+    stop = threading.Event()
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    threading.Thread(target=_stop_when_orphaned, args=(os.getppid(), stop), daemon=True).start()
+    run_worker(poll_interval=poll_interval, stop=stop, drain=drain)
+
+
+def _stop_when_orphaned(parent, stop):
+    # A parent that was killed cannot stop its workers; they would keep running next to its replacement
+    while not stop.wait(RESTART_CHECK_SECONDS):
+        if os.getppid() != parent:
+            stop.set()
+
+
+class Command(BaseCommand):
+    help = 'Run worker processes that analyse queued ECG uploads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1, help='Worker processes')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Seconds between queue checks when it is empty')
+        parser.add_argument('--drain', action='store_true', help='Exit once the queue is empty')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        ecg_registry.reload()
+        stats = queue_stats()
+        self.stdout.write(f"ECG queue: {stats['depth']} pending, {stats['in_progress']} in progress; "
+                          f"starting {options['workers']} worker(s)")
+
+        context = multiprocessing.get_context('fork')
+        stop = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *_: stop.set())
+
+        def spawn(i):
+            # Each worker must open its own database connection
+            connections.close_all()
+            worker = context.Process(target=_worker, args=(options['poll_interval'], options['drain']),
+                                     name=f'ecg-queue-{i}')
+            worker.start()
+            return worker
+
+        workers = [spawn(i) for i in range(options['workers'])]
+        try:
+            # Until stopped, or (with --drain) every worker has finished cleanly
+            while not stop.is_set() and not all(worker.exitcode == 0 for worker in workers):
+                for i, worker in enumerate(workers):
+                    if worker.is_alive() or worker.exitcode == 0 or stop.is_set():
+                        continue
+                    self.stderr.write(f"{worker.name} exited with code {worker.exitcode}; restarting it")
+                    workers[i] = spawn(i)
+                stop.wait(RESTART_CHECK_SECONDS)
+        except KeyboardInterrupt:
+            pass
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+        for worker in workers:
+            worker.join()
+
+        stats = queue_stats()
+        self.stdout.write(self.style.SUCCESS(
+            f"ECG queue workers stopped after {time.perf_counter() - start:.1f}s; {stats['depth']} pending"))
@@ -0,0 +1,35 @@
+"""
+Apply doctor-confirmed outcomes to the deployed models
+
+    python manage.py update_models_incrementally
+
+Meant to run on a schedule (e.g. hourly cron). Only cases confirmed since
+the previous run are used; see health/incremental.py.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from health.incremental import IncrementalUpdater
+from health.model_registry import MODEL_NAMES
+
+
+class Command(BaseCommand):
+    help = 'Update Naive Bayes and Logistic Regression with newly confirmed cases'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--epochs', type=int, default=5, help='SGD passes over the new cases')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        result = IncrementalUpdater(epochs=options['epochs']).update()
+        if result is None:
+            self.stdout.write("No new confirmed cases (or no deployed models) - nothing to update")
+            return
+        for key, accuracy in result['prequential_accuracy'].items():
+            self.stdout.write(f"  {MODEL_NAMES[key]}: {accuracy:.1f}% on the new cases before the update")
+        self.stdout.write(self.style.SUCCESS(
+            f"Applied {result['cases']} confirmed cases in {time.perf_counter() - start:.2f}s, "
+            f"published version {result['version']} ({result['total_samples']} cases over "
+            f"{result['total_updates']} updates)"))
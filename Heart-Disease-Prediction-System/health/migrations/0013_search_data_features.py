@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('health', '0012_alter_appointment_options_appointment_related_ecg_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='search_data',
+            name='features',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,87 @@
+"""
+Move Search_Data feature vectors from the stringified list in values_list
+into the packed float32 features column, and clean prediction_accuracy
+and result so the next migration can turn them into numeric columns.
+
+Rows whose values_list cannot be read as 13 numbers (e.g. cut off at the
+old 100 character limit) keep features = NULL.
+"""
+
+import ast
+import re
+
+import numpy as np
+from django.db import migrations
+
+N_FEATURES = 13
+BATCH_SIZE = 1000
+
+
+def parse_values_list(text):
+    if not text:
+        return None
+    try:
+        values = ast.literal_eval(text)
+    except (ValueError, SyntaxError):
+        return None
+    if not isinstance(values, (list, tuple)) or len(values) != N_FEATURES:
+        return None
+    try:
+        row = np.array([float(value) for value in values], dtype='<f4')
+    except (TypeError, ValueError):
+        return None
+    return row.tobytes() if np.isfinite(row).all() else None
+
+
+def clean_number(text, cast):
+    if text is None:
+        return None
+    # Matches values like "88.52", "1" and numpy reprs such as "[1]"
+    match = re.fullmatch(r'\s*\[?\s*(-?\d+(?:\.\d*)?(?:[eE][-+]?\d+)?)\s*\]?\s*', str(text))
+    if not match:
+        return None
+    try:
+        return str(cast(float(match.group(1))))
+    except (ValueError, OverflowError):
+        return None
+
+
+def pack_features(apps, schema_editor):
+    Search_Data = apps.get_model('health', 'Search_Data')
+    batch = []
+    for search in Search_Data.objects.order_by('id').iterator(chunk_size=BATCH_SIZE):
+        search.features = parse_values_list(search.values_list)
+        search.prediction_accuracy = clean_number(search.prediction_accuracy, float)
+        search.result = clean_number(search.result, int)
+        batch.append(search)
+        if len(batch) >= BATCH_SIZE:
+            Search_Data.objects.bulk_update(batch, ['features', 'prediction_accuracy', 'result'])
+            batch = []
+    if batch:
+        Search_Data.objects.bulk_update(batch, ['features', 'prediction_accuracy', 'result'])
+
+
+def unpack_features(apps, schema_editor):
+    Search_Data = apps.get_model('health', 'Search_Data')
+    batch = []
+    for search in Search_Data.objects.exclude(features=None).order_by('id').iterator(chunk_size=BATCH_SIZE):
+        row = np.frombuffer(bytes(search.features), dtype='<f4')
+        values = [int(v) if float(v).is_integer() else float(str(v)) for v in row]
+        search.values_list = str(values)[:100]
+        batch.append(search)
+        if len(batch) >= BATCH_SIZE:
+            Search_Data.objects.bulk_update(batch, ['values_list'])
+            batch = []
+    if batch:
+        Search_Data.objects.bulk_update(batch, ['values_list'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('health', '0013_search_data_features'),
+    ]
+
+    operations = [
+        migrations.RunPython(pack_features, unpack_features),
+    ]
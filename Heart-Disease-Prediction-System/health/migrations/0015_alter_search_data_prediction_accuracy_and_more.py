@@ -0,0 +1,25 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('health', '0014_search_data_pack_features'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='search_data',
+            name='prediction_accuracy',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='search_data',
+            name='result',
+            field=models.SmallIntegerField(blank=True, null=True),
+        ),
+        migrations.RemoveField(
+            model_name='search_data',
+            name='values_list',
+        ),
+    ]
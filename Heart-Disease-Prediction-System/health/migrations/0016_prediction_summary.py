@@ -0,0 +1,26 @@
+# Generated by Django 5.0.1 on 2026-10-17 10:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('health', '0015_alter_search_data_prediction_accuracy_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Prediction_Summary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(max_length=20)),
+                ('bucket', models.CharField(max_length=40)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('positive', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('dimension', 'bucket')},
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('health', '0016_prediction_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='search_data',
+            name='confirmed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='search_data',
+            name='confirmed_result',
+            field=models.SmallIntegerField(blank=True, null=True),
+        ),
+    ]
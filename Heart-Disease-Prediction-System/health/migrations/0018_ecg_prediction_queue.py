@@ -0,0 +1,47 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('health', '0017_search_data_confirmed_result'),
+    ]
+
+    operations = [
+        # Rows from before the queue were analysed inside the upload request
+        migrations.AddField(
+            model_name='ecg_prediction',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Waiting for analysis'), ('extracting', 'Extracting ECG signals'), ('classifying', 'Classifying'), ('done', 'Done'), ('failed', 'Failed')], default='done', max_length=20),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name='ecg_prediction',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Waiting for analysis'), ('extracting', 'Extracting ECG signals'), ('classifying', 'Classifying'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='ecg_prediction',
+            name='error',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='ecg_prediction',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='ecg_prediction',
+            name='started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='ecg_prediction',
+            name='finished_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='ecg_prediction',
+            index=models.Index(fields=['status', 'created'], name='ecg_queue_idx'),
+        ),
+    ]
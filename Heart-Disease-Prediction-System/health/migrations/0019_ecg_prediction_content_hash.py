@@ -0,0 +1,38 @@
+# Generated by Django 5.0.1 on 2026-10-17 11:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('health', '0018_ecg_prediction_queue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ecg_prediction',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='ecg_prediction',
+            name='image_reused',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='ecg_prediction',
+            name='image_size',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='ecg_prediction',
+            name='model_version',
+            field=models.CharField(blank=True, max_length=20, null=True),
+        ),
+        migrations.AddField(
+            model_name='ecg_prediction',
+            name='result_reused',
+            field=models.BooleanField(default=False),
+        ),
+    ]
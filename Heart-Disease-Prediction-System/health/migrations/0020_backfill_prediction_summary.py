@@ -0,0 +1,40 @@
+"""
+Fill Prediction_Summary from the predictions stored before it existed.
+
+0016 created the table empty, so deleting an older Search_Data row
+subtracted counts that were never added. This recomputes every bucket
+from Search_Data, like the backfill_prediction_summary command.
+"""
+
+import numpy as np
+from django.db import migrations
+
+from health.analytics import summary_deltas
+from health.feature_schema import unpack_rows
+
+
+def backfill_summary(apps, schema_editor):
+    Search_Data = apps.get_model('health', 'Search_Data')
+    Prediction_Summary = apps.get_model('health', 'Prediction_Summary')
+    rows = list(Search_Data.objects.exclude(features=None).exclude(result=None)
+                .order_by('id').values_list('features', 'result'))
+    Prediction_Summary.objects.all().delete()
+    if not rows:
+        return
+    X = unpack_rows([features for features, _ in rows])
+    results = np.array([result for _, result in rows], dtype=np.int64)
+    Prediction_Summary.objects.bulk_create([
+        Prediction_Summary(dimension=dimension, bucket=bucket, total=total, positive=positive)
+        for (dimension, bucket), (total, positive) in summary_deltas(X, results).items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('health', '0019_ecg_prediction_content_hash'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_summary, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-17 12:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('health', '0020_backfill_prediction_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ecg_prediction',
+            name='retry_after',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
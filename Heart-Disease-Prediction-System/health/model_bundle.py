@@ -0,0 +1,252 @@
+"""
+Versioned, Memory-Mappable Model Bundles
+One on-disk format for the tabular and ECG models: a directory holding a
+manifest.json plus one .npy file per array.
+
+    heart_models.bundle/
+        manifest.json
+        random_forest__feature.npy
+        random_forest__threshold.npy
+        ...
+
+Arrays are opened with np.load(mmap_mode='r'), so large ones (PCA
+components, forest node tables) are only paged in when used and the pages
+are shared by every process that maps the same file. Every payload file
+carries a SHA-256 in the manifest, and the manifest records the bundle
+version. Objects that have no array form (e.g. the ECG voting ensemble)
+are stored as opaque blobs with the same checksum treatment.
+"""
+
+import datetime
+import hashlib
+import itertools
+import json
+import os
+import re
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+FORMAT_NAME = 'heart-model-bundle'
+FORMAT_VERSION = 1
+MANIFEST_NAME = 'manifest.json'
+
+
+class BundleError(Exception):
+    """Raised for missing, malformed or corrupted bundles"""
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _safe_name(name):
+    return re.sub(r'[^A-Za-z0-9_.-]', '_', name)
+
+
+def write_bundle(path, entries, version=None, metadata=None):
+    """
+    Write a bundle directory, atomically replacing any existing one
+
+    Args:
+        path: Bundle directory (e.g. trained_models/heart_models.bundle)
+        entries: dict of entry name -> {
+                     'kind': evaluator kind,
+                     'arrays': dict of name -> ndarray (0-d arrays become params),
+                     'params': optional dict of JSON scalars,
+                     'blobs': optional dict of name -> bytes,
+                     'metadata': optional dict of JSON values }
+        version: Bundle version string (default: current timestamp)
+        metadata: Optional bundle-level JSON metadata
+    Returns:
+        Path of the written bundle
+    """
+    path = Path(path)
+    tmp_path = path.with_name(f'.{path.name}.tmp')
+    if tmp_path.exists():
+        shutil.rmtree(tmp_path)
+    tmp_path.mkdir(parents=True)
+
+    manifest_entries = {}
+    for entry_name, entry in entries.items():
+        params = dict(entry.get('params', {}))
+        arrays = {}
+        for array_name, array in entry.get('arrays', {}).items():
+            array = np.asarray(array)
+            if array.ndim == 0:
+                params[array_name] = array.item()
+                continue
+            if array.dtype.kind not in 'biuf':
+                raise BundleError(f'{entry_name}.{array_name}: only numeric arrays can be bundled')
+            file_name = _safe_name(f'{entry_name}__{array_name}.npy')
+            np.save(tmp_path / file_name, np.ascontiguousarray(array), allow_pickle=False)
+            arrays[array_name] = {
+                'file': file_name,
+                'dtype': array.dtype.str,
+                'shape': list(array.shape),
+                'sha256': _sha256(tmp_path / file_name),
+            }
+
+        blobs = {}
+        for blob_name, data in entry.get('blobs', {}).items():
+            file_name = _safe_name(f'{entry_name}__{blob_name}.bin')
+            with open(tmp_path / file_name, 'wb') as f:
+                f.write(data)
+            blobs[blob_name] = {'file': file_name, 'size': len(data),
+                                'sha256': hashlib.sha256(data).hexdigest()}
+
+        manifest_entries[entry_name] = {
+            'kind': entry['kind'],
+            'params': params,
+            'arrays': arrays,
+            'blobs': blobs,
+            'metadata': entry.get('metadata', {}),
+        }
+
+    manifest = {
+        'format': FORMAT_NAME,
+        'format_version': FORMAT_VERSION,
+        'version': version or datetime.datetime.now().strftime('%Y%m%d-%H%M%S'),
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'metadata': metadata or {},
+        'entries': manifest_entries,
+    }
+    with open(tmp_path / MANIFEST_NAME, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+    _swap_into_place(tmp_path, path)
+    return path
+
+
+def copy_bundle(src, dst):
+    """Copy a bundle directory to dst, replacing any bundle already there"""
+    dst = Path(dst)
+    tmp_path = dst.with_name(f'.{dst.name}.tmp')
+    if tmp_path.exists():
+        shutil.rmtree(tmp_path)
+    shutil.copytree(src, tmp_path)
+    _swap_into_place(tmp_path, dst)
+    return dst
+
+
+def _swap_into_place(tmp_path, path):
+    """
+    Publish a finished bundle directory under its final name
+
+    The bundle path is a symlink to a uniquely named directory next to it
+    (.heart_models.bundle.<n>), and a new bundle is published by renaming a
+    fresh symlink over it, so readers always find either the old or the new
+    bundle. ModelBundle resolves the symlink on open and the previous
+    directory is kept until the next write, so readers that opened it keep
+    a consistent set of files. A bundle path that is still a plain
+    directory (as shipped) is moved aside first, leaving it missing for
+    the moment between the two renames; this happens once per path.
+    """
+    previous = path.resolve() if path.is_symlink() else None
+    for n in itertools.count(1):
+        target = path.with_name(f'.{path.name}.{os.getpid()}-{n}')
+        if not target.exists():
+            break
+    os.replace(tmp_path, target)
+    link_path = path.with_name(f'.{path.name}.link')
+    if link_path.is_symlink() or link_path.exists():
+        link_path.unlink()
+    os.symlink(target.name, link_path)
+
+    if path.is_dir() and not path.is_symlink():
+        old_path = path.with_name(f'.{path.name}.old')
+        if old_path.exists():
+            shutil.rmtree(old_path)
+        os.replace(path, old_path)
+        shutil.rmtree(old_path)
+    os.replace(link_path, path)
+
+    for stale in path.parent.glob(f'.{path.name}.*'):
+        if stale.is_dir() and not stale.is_symlink() and stale not in (target, previous, tmp_path):
+            shutil.rmtree(stale)
+
+
+class ModelBundle:
+    """
+    Read-only view of a bundle directory
+
+    The manifest is parsed on open; array files are mapped on first access.
+    """
+
+    def __init__(self, path, mmap=True):
+        self.path = Path(path).resolve()
+        self.mmap = mmap
+        manifest_path = self.path / MANIFEST_NAME
+        try:
+            with open(manifest_path) as f:
+                self.manifest = json.load(f)
+        except (OSError, ValueError) as e:
+            raise BundleError(f'Cannot read bundle manifest {manifest_path}: {e}')
+        if self.manifest.get('format') != FORMAT_NAME:
+            raise BundleError(f'{self.path} is not a model bundle')
+        if self.manifest.get('format_version', 0) > FORMAT_VERSION:
+            raise BundleError(f'{self.path} uses a newer bundle format')
+        self._arrays = {}
+
+    @property
+    def version(self):
+        return self.manifest['version']
+
+    @property
+    def entries(self):
+        return self.manifest['entries']
+
+    def kind(self, entry_name):
+        return self.entries[entry_name]['kind']
+
+    def params(self, entry_name):
+        return self.entries[entry_name]['params']
+
+    def metadata(self, entry_name):
+        return self.entries[entry_name]['metadata']
+
+    def array(self, entry_name, array_name):
+        """Memory-mapped (or loaded) array; checks the file size against the manifest"""
+        key = (entry_name, array_name)
+        if key not in self._arrays:
+            spec = self.entries[entry_name]['arrays'][array_name]
+            array = np.load(self.path / spec['file'], mmap_mode='r' if self.mmap else None,
+                            allow_pickle=False)
+            if list(array.shape) != spec['shape'] or array.dtype.str != spec['dtype']:
+                raise BundleError(f'{entry_name}.{array_name} does not match the manifest')
+            self._arrays[key] = array
+        return self._arrays[key]
+
+    def arrays(self, entry_name):
+        """All arrays of one entry as a dict"""
+        return {name: self.array(entry_name, name) for name in self.entries[entry_name]['arrays']}
+
+    def blob(self, entry_name, blob_name):
+        """Raw bytes of a blob, verified against its checksum"""
+        spec = self.entries[entry_name]['blobs'][blob_name]
+        with open(self.path / spec['file'], 'rb') as f:
+            data = f.read()
+        if hashlib.sha256(data).hexdigest() != spec['sha256']:
+            raise BundleError(f'{entry_name}.{blob_name} failed its checksum')
+        return data
+
+    def verify(self):
+        """
+        Check every payload file against its manifest checksum
+
+        Reads all files, so call it after deploying rather than per request.
+
+        Raises:
+            BundleError on the first mismatch
+        """
+        for entry_name, entry in self.entries.items():
+            for name, spec in list(entry['arrays'].items()) + list(entry['blobs'].items()):
+                file_path = self.path / spec['file']
+                if not file_path.exists() or _sha256(file_path) != spec['sha256']:
+                    raise BundleError(f'{entry_name}.{name} failed its checksum')
+        return True
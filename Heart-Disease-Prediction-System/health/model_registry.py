@@ -0,0 +1,389 @@
+"""
+Warm Model Registry for Heart Disease Prediction
+Loads the trained tabular models once per process and keeps them in memory,
+so a prediction request only pays for the predict call itself.
+
+The registry watches the artifact files in trained_models/ and swaps in a
+freshly loaded set of models when any of them change on disk.
+
+Models with a compiled evaluator (heart_models.bundle) are served from its
+memory-mapped arrays, which all workers share through the page cache. Their
+sklearn pickles are only unpickled when a batch too large for the evaluator
+arrives, so a worker serving single predictions never holds a private copy
+of the forest.
+"""
+
+import hashlib
+import os
+import pickle
+import threading
+import time
+import tracemalloc
+from collections.abc import Mapping
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .compiled_models import load_compiled
+from .feature_schema import FEATURE_COLUMNS
+
+
+# Model file key -> display name used on the result pages
+MODEL_NAMES = {
+    'logistic_regression': 'Logistic Regression',
+    'random_forest': 'Random Forest',
+    'decision_tree': 'Decision Tree',
+    'knn': 'KNN',
+    'naive_bayes': 'Naive Bayes'
+}
+
+# Above this many rows sklearn's compiled batch loops beat the NumPy
+# evaluators for the forest and KNN, so large batches go to sklearn
+COMPILED_MAX_ROWS = 256
+
+# Readiness states
+STATE_COLD = 'cold'                # nothing loaded yet
+STATE_LOADING = 'loading'          # first load in progress
+STATE_READY = 'ready'              # models loaded and serving
+STATE_UNAVAILABLE = 'unavailable'  # no artifacts on disk
+STATE_ERROR = 'error'              # last load failed and nothing to serve
+
+
+class ModelLoadError(Exception):
+    """Raised when a deferred model pickle changed or disappeared since the registry loaded"""
+
+
+def _rss_bytes():
+    """Resident set size of this process, or 0 where /proc is unavailable"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+class LazyModels(Mapping):
+    """
+    Model key -> sklearn estimator, with some models unpickled on first use
+
+    Membership and iteration never load anything; indexing loads the model
+    once (thread-safe) and keeps it.
+    """
+
+    def __init__(self, keys, models, loaders):
+        """
+        Args:
+            keys: Every model key, in serving order
+            models: dict of already loaded models
+            loaders: dict of model key -> callable returning the model
+        """
+        self._keys = list(keys)
+        self._models = dict(models)
+        self._loaders = dict(loaders)
+        self._lock = threading.Lock()
+
+    def __getitem__(self, model_key):
+        model = self._models.get(model_key)
+        if model is not None:
+            return model
+        loader = self._loaders[model_key]
+        with self._lock:
+            if model_key not in self._models:
+                self._models[model_key] = loader()
+        return self._models[model_key]
+
+    def __contains__(self, model_key):
+        return model_key in self._keys
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def is_loaded(self, model_key):
+        return model_key in self._models
+
+
+class LoadedModels:
+    """
+    Immutable set of models loaded from one version of the artifacts
+    """
+
+    def __init__(self, version, model_info, models, stats, compiled=None):
+        self.version = version
+        self.model_info = model_info
+        self.models = models
+        self.stats = stats
+        self.compiled = compiled or {}
+        self.loaded_at = time.time()
+
+    def best_model_key(self):
+        """
+        Key of the loaded model with the highest stored test accuracy
+
+        Models whose accuracy no longer describes them (changed by an
+        incremental update since it was measured) rank after the others.
+        """
+        return max(self.models, key=lambda key: (not self.model_info[key].get('test_accuracy_stale', False),
+                                                 self.model_info[key]['test_accuracy']))
+
+    def predict(self, model_key, X):
+        """
+        Score a matrix with one model
+
+        Uses the compiled NumPy evaluator when one matches the loaded
+        pickle and the batch is small, otherwise the sklearn estimator
+        (unpickling it on first use). If that pickle can no longer be
+        loaded, the evaluator scores the large batch too.
+
+        Args:
+            model_key: Key in MODEL_NAMES
+            X: DataFrame or 2D array with FEATURE_COLUMNS, one row per patient
+        Returns:
+            array of predictions
+        """
+        evaluator = self.compiled.get(model_key)
+        if evaluator is not None and len(X) <= COMPILED_MAX_ROWS:
+            return evaluator.predict(np.asarray(X, dtype=np.float64))
+        try:
+            model = self.models[model_key]
+        except ModelLoadError as e:
+            if evaluator is None:
+                raise
+            print(f"Scoring with the compiled model only: {e}")
+            return evaluator.predict(np.asarray(X, dtype=np.float64))
+        if not hasattr(X, 'columns'):
+            X = pd.DataFrame(np.asarray(X, dtype=np.float64), columns=FEATURE_COLUMNS)
+        return model.predict(X)
+
+    def predict_all(self, X):
+        """
+        Score a whole matrix with every loaded model
+
+        Args:
+            X: DataFrame (or 2D array) with FEATURE_COLUMNS, one row per patient
+        Returns:
+            dict of model key -> array of predictions
+        """
+        if len(X) > COMPILED_MAX_ROWS and not hasattr(X, 'columns'):
+            # Build the DataFrame for the sklearn path once, not once per model
+            X = pd.DataFrame(np.asarray(X, dtype=np.float64), columns=FEATURE_COLUMNS)
+        return {key: self.predict(key, X) for key in self.models}
+
+
+class ModelRegistry:
+    """
+    Process-wide cache of the trained heart disease models
+
+    The current LoadedModels object is replaced as a whole on reload, so a
+    request that already holds a reference keeps a consistent set of models.
+    """
+
+    def __init__(self, models_dir=None, check_interval=2.0):
+        """
+        Args:
+            models_dir: Directory holding model_info.pkl and the model pickles
+            check_interval: Minimum seconds between checks for changed artifacts
+        """
+        if models_dir is None:
+            models_dir = Path(__file__).resolve().parent.parent / 'trained_models'
+        self.models_dir = Path(models_dir)
+        self.check_interval = check_interval
+        self.state = STATE_COLD
+        self.error = None
+        self._loaded = None
+        self._fingerprint = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def model_info_path(self):
+        return self.models_dir / 'model_info.pkl'
+
+    @property
+    def compiled_path(self):
+        return self.models_dir / 'heart_models.bundle'
+
+    def artifact_paths(self):
+        """List of artifact files the registry depends on"""
+        paths = [self.model_info_path, self.compiled_path / 'manifest.json']
+        for model_key in MODEL_NAMES:
+            paths.append(self.models_dir / f'{model_key}.pkl')
+        return paths
+
+    def is_available(self):
+        """Whether there is anything to load (model_info.pkl exists)"""
+        return self.model_info_path.exists()
+
+    def fingerprint(self):
+        """
+        Cheap identity of the artifacts currently on disk
+
+        Returns:
+            tuple of (file name, mtime, size), or None if is_available() is false
+        """
+        if not self.is_available():
+            return None
+        parts = []
+        for path in self.artifact_paths():
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            parts.append((path.name, stat.st_mtime_ns, stat.st_size))
+        return tuple(parts)
+
+    def _load(self, fingerprint):
+        """Load every artifact into a new LoadedModels object"""
+        # Import the estimator modules first so their import cost is not
+        # counted against the first model's load time and memory
+        import sklearn.linear_model, sklearn.ensemble, sklearn.tree, sklearn.neighbors, sklearn.naive_bayes
+
+        with open(self.model_info_path, 'rb') as f:
+            model_info = pickle.load(f)
+
+        stats = {}
+        sources = {}
+        for model_key in MODEL_NAMES:
+            model_path = self.models_dir / f'{model_key}.pkl'
+            if not model_path.exists():
+                continue
+            with open(model_path, 'rb') as f:
+                data = f.read()
+            sources[model_key] = hashlib.sha1(data).hexdigest()
+            stats[model_key] = {'file_bytes': len(data)}
+
+        # NumPy evaluators exported by train_and_save_models.py; ones built
+        # from a different pickle than the one on disk are ignored
+        compiled = {}
+        if (self.compiled_path / 'manifest.json').exists():
+            try:
+                compiled = load_compiled(self.compiled_path, sources)
+            except Exception as e:
+                print(f"Ignoring compiled models: {e}")
+
+        models = {}
+        loaders = {}
+        for model_key in sources:
+            if model_key in compiled:
+                stats[model_key].update({'compiled': True, 'loaded': False})
+                loaders[model_key] = self._loader(model_key, sources[model_key], stats[model_key])
+            else:
+                models[model_key] = self._unpickle(model_key, sources[model_key], stats[model_key])
+
+        version = hashlib.sha1(repr(fingerprint).encode()).hexdigest()[:12]
+        return LoadedModels(version, model_info, LazyModels(sources, models, loaders), stats, compiled)
+
+    def _loader(self, model_key, source, stats):
+        return lambda: self._unpickle(model_key, source, stats)
+
+    def _unpickle(self, model_key, source, stats):
+        """
+        Unpickle one model, recording its load time and memory in stats
+
+        Raises:
+            ModelLoadError if the pickle no longer matches `source`
+        """
+        model_path = self.models_dir / f'{model_key}.pkl'
+        tracing = tracemalloc.is_tracing()
+        if not tracing:
+            tracemalloc.start()
+        before, _ = tracemalloc.get_traced_memory()
+        rss_before = _rss_bytes()
+        start = time.perf_counter()
+        try:
+            with open(model_path, 'rb') as f:
+                data = f.read()
+        except OSError as e:
+            raise ModelLoadError(f'{model_path.name}: {e}')
+        if hashlib.sha1(data).hexdigest() != source:
+            raise ModelLoadError(f'{model_path.name} changed on disk')
+        model = pickle.loads(data)
+        load_seconds = time.perf_counter() - start
+        after, _ = tracemalloc.get_traced_memory()
+        rss_after = _rss_bytes()
+        if not tracing:
+            tracemalloc.stop()
+
+        stats.update({
+            'load_seconds': load_seconds,
+            # tracemalloc misses buffers allocated in C (e.g. tree nodes)
+            'resident_bytes': max(after - before, rss_after - rss_before, 0),
+            'loaded': True,
+        })
+        return model
+
+    def reload(self, force=False):
+        """
+        Load the artifacts if they changed since the last load
+
+        A failed reload keeps serving the previous models.
+
+        Returns:
+            The current LoadedModels, or None if nothing could be loaded
+        """
+        with self._lock:
+            fingerprint = self.fingerprint()
+            self._last_check = time.monotonic()
+
+            if fingerprint is None:
+                self.state = STATE_UNAVAILABLE if self._loaded is None else STATE_READY
+                return self._loaded
+
+            if not force and fingerprint == self._fingerprint:
+                return self._loaded
+
+            if self._loaded is None:
+                self.state = STATE_LOADING
+            try:
+                loaded = self._load(fingerprint)
+            except Exception as e:
+                self.error = str(e)
+                print(f"Model registry reload failed: {e}")
+                self.state = STATE_READY if self._loaded is not None else STATE_ERROR
+                return self._loaded
+
+            # Swap the whole set in one assignment
+            self._loaded = loaded
+            self._fingerprint = fingerprint
+            self.error = None
+            self.state = STATE_READY
+            print(f"Model registry loaded version {loaded.version} ({len(loaded.models)} models)")
+            return loaded
+
+    def get(self):
+        """
+        Return the current models, reloading them if the artifacts changed
+
+        Returns:
+            LoadedModels, or None if no trained models are available
+        """
+        loaded = self._loaded
+        if loaded is not None and time.monotonic() - self._last_check < self.check_interval:
+            return loaded
+        return self.reload()
+
+    def is_ready(self):
+        return self.state == STATE_READY
+
+    def status(self):
+        """
+        Readiness and per-model load statistics
+
+        Returns:
+            dict suitable for a JSON response
+        """
+        loaded = self._loaded
+        return {
+            'state': self.state,
+            'error': self.error,
+            'version': loaded.version if loaded else None,
+            'loaded_at': loaded.loaded_at if loaded else None,
+            'models': loaded.stats if loaded else {},
+        }
+
+
+# One registry per worker process
+model_registry = ModelRegistry()
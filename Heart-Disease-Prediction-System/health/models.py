@@ -1,8 +1,10 @@
 from django.db import models
 from django.contrib.auth.models import User
+import numpy as np
 
 # Create your models here.
 from .choices import DOCTOR_STATUS
+from .feature_schema import pack_row, unpack_rows, row_values
 
 class Patient(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True)
@@ -40,16 +42,65 @@ class Admin_Helath_CSV(models.Model):
     def __str__(self):
         return self.name
 
+class SearchDataQuerySet(models.QuerySet):
+    def feature_matrix(self):
+        """
+        Stored feature vectors of this queryset as one array
+
+        Returns:
+            tuple: (array of Search_Data ids, float32 matrix of shape (rows, 13))
+        """
+        rows = list(self.exclude(features=None).order_by('id').values_list('id', 'features'))
+        ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+        return ids, unpack_rows(row[1] for row in rows)
+
+
 class Search_Data(models.Model):
     patient = models.ForeignKey(Patient, on_delete=models.CASCADE, null=True)
-    prediction_accuracy = models.CharField(max_length=100,null=True,blank=True)
-    result = models.CharField(max_length=100,null=True,blank=True)
-    values_list = models.CharField(max_length=100,null=True,blank=True)
+    prediction_accuracy = models.FloatField(null=True,blank=True)
+    result = models.SmallIntegerField(null=True,blank=True)
+    # The 13 input features as packed little-endian float32 (feature_schema.pack_row)
+    features = models.BinaryField(null=True,blank=True)
     created = models.DateTimeField(auto_now=True,null=True)
+    # Outcome confirmed by a doctor (0 healthy, 1 heart disease); feeds incremental.py
+    confirmed_result = models.SmallIntegerField(null=True,blank=True)
+    confirmed_at = models.DateTimeField(null=True,blank=True)
+
+    objects = SearchDataQuerySet.as_manager()
 
     def __str__(self):
         return self.patient.user.username
 
+    @property
+    def feature_row(self):
+        if self.features is None:
+            return None
+        return unpack_rows([self.features])[0]
+
+    @feature_row.setter
+    def feature_row(self, row):
+        self.features = pack_row(row)
+
+    @property
+    def values_list(self):
+        """Features as a plain list for display, e.g. [57, 1, 1, 130, ...]"""
+        row = self.feature_row
+        return None if row is None else row_values(row)
+
+class Prediction_Summary(models.Model):
+    """Running prediction counts per analytics bucket, maintained by analytics.py"""
+    dimension = models.CharField(max_length=20)
+    bucket = models.CharField(max_length=40)
+    total = models.PositiveIntegerField(default=0)
+    positive = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.dimension}: {self.bucket}"
+
+    class Meta:
+        unique_together = ('dimension', 'bucket')
+
+
 class Feedback(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True)
     messages = models.TextField(null=True)
@@ -61,6 +112,20 @@ class Feedback(models.Model):
 
 class ECG_Prediction(models.Model):
     """Store ECG image predictions"""
+    # Analysis progress; pending rows are the queue worked by ecg_queue.py
+    STATUS_PENDING = 'pending'
+    STATUS_EXTRACTING = 'extracting'
+    STATUS_CLASSIFYING = 'classifying'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = (
+        (STATUS_PENDING, 'Waiting for analysis'),
+        (STATUS_EXTRACTING, 'Extracting ECG signals'),
+        (STATUS_CLASSIFYING, 'Classifying'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    )
+    
     patient = models.ForeignKey(Patient, on_delete=models.CASCADE, null=True)
     ecg_image = models.ImageField(upload_to='ecg_images/', null=True)
     prediction_code = models.IntegerField(null=True)  # 0=Abnormal, 1=MI, 2=Normal, 3=History of MI
@@ -68,12 +133,30 @@ class ECG_Prediction(models.Model):
     prediction_message = models.TextField(null=True)
     confidence = models.FloatField(null=True, blank=True)
     created = models.DateTimeField(auto_now_add=True, null=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    error = models.TextField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # A pending job whose classification failed is not picked up again before this
+    retry_after = models.DateTimeField(null=True, blank=True)
+    # SHA-256 of the uploaded bytes; repeated images share the stored file and result (ecg_dedup.py)
+    content_hash = models.CharField(max_length=64, null=True, blank=True, db_index=True)
+    image_size = models.PositiveIntegerField(null=True, blank=True)
+    model_version = models.CharField(max_length=20, null=True, blank=True)
+    image_reused = models.BooleanField(default=False)
+    result_reused = models.BooleanField(default=False)
     
     def __str__(self):
-        return f"{self.patient.user.username} - {self.prediction_label}"
+        return f"{self.patient.user.username} - {self.prediction_label or self.get_status_display()}"
+    
+    @property
+    def is_finished(self):
+        return self.status in (self.STATUS_DONE, self.STATUS_FAILED)
     
     class Meta:
         ordering = ['-created']
+        indexes = [models.Index(fields=['status', 'created'], name='ecg_queue_idx')]
 
 
 class Appointment(models.Model):
@@ -0,0 +1,103 @@
+"""
+Prediction Result Cache
+Stores heart disease predictions keyed on the canonicalized 13-feature
+vector and the model version, in the 'predictions' Django cache.
+Identical inputs skip model evaluation entirely.
+
+With REDIS_URL set the cache is Redis, shared by all gunicorn workers,
+evicting by its maxmemory-policy (configure allkeys-lru). Otherwise it is
+a per-process LocMemCache: a lookup costs microseconds, while a shared
+file-based cache cost more per request (~7-8ms, a directory listing on
+every set) than scoring the best model (~0.25ms). LocMemCache moves an
+entry to the front on every read and, when full, drops the least
+recently used third (CULL_FREQUENCY).
+
+Entries expire after PREDICTION_CACHE_TIMEOUT seconds. The model version
+is part of every key, so redeploying the models makes all earlier
+entries unreachable.
+"""
+
+import hashlib
+import threading
+
+import numpy as np
+from django.core.cache import caches
+from django.core.cache.backends.base import InvalidCacheBackendError
+
+CACHE_ALIAS = 'predictions'
+
+
+def canonical_key(version, features):
+    """
+    Cache key for one feature vector
+
+    Values are compared as float64 rounded to 6 decimals, so "1", 1 and 1.0
+    map to the same entry.
+
+    Args:
+        version: Model version string from the registry
+        features: Sequence of the 13 feature values in training order
+    Returns:
+        Cache key string
+    """
+    row = np.round(np.asarray(features, dtype=np.float64), 6) + 0.0  # + 0.0 folds -0.0 into 0.0
+    digest = hashlib.sha1(row.astype('<f8').tobytes()).hexdigest()
+    return f'prediction:{version}:{digest}'
+
+
+class PredictionCache:
+    """
+    Front cache for prdict_heart_disease
+
+    Hits and misses are counted in this process only: writing shared
+    counters to the cache on every request would cost as much as the
+    lookup it measures.
+    """
+
+    def __init__(self, alias=CACHE_ALIAS):
+        self.alias = alias
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def cache(self):
+        try:
+            return caches[self.alias]
+        except InvalidCacheBackendError:
+            return caches['default']
+
+    def get(self, version, features):
+        """
+        Returns:
+            tuple: (accuracy, prediction) or None on a miss
+        """
+        value = self.cache.get(canonical_key(version, features))
+        with self._lock:
+            if value is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return value
+
+    def set(self, version, features, accuracy, prediction):
+        self.cache.set(canonical_key(version, features), (float(accuracy), int(prediction)))
+
+    def stats(self):
+        """
+        Hit-rate metrics of this worker process
+
+        Returns:
+            dict with hits, misses and hit_rate
+        """
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {'hits': hits, 'misses': misses, 'hit_rate': hits / total if total else None}
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = self.misses = 0
+
+
+prediction_cache = PredictionCache()
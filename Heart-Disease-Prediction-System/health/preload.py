@@ -0,0 +1,71 @@
+"""
+Preloaded Server Startup
+Warms the application in the gunicorn master before the workers are forked
+(see gunicorn.conf.py). Django, the heavy modules imported by the views
+(pandas, sklearn, matplotlib, seaborn, skimage) and the tabular models are
+then loaded once and inherited by every worker as copy-on-write pages,
+instead of being imported and loaded again in each worker. The ECG
+scaler, PCA and classifier (ecg_registry.py) are loaded the same way.
+
+gc.freeze() moves everything allocated so far into a permanent generation
+the collector never scans, so garbage collections in the workers do not
+write to (and thereby copy) the shared pages.
+"""
+
+import gc
+import time
+
+import numpy as np
+
+# Sample patient used to run each model once during warm-up
+WARM_UP_ROW = [57, 0, 1, 130, 236, 0, 0, 174, 0, 0.0, 1, 1, 2]
+
+
+def warm_up():
+    """
+    Import the whole app and load the models in this process
+
+    Models with a compiled evaluator are normally unpickled on demand in
+    each worker; here they are all unpickled up front, since in the master
+    they are loaded once for every worker.
+
+    Returns:
+        dict of step -> seconds
+    """
+    timings = {}
+    start = time.perf_counter()
+    from django.urls import get_resolver
+    get_resolver().url_patterns  # imports every view module
+    from . import ecg_predictor  # noqa: F401  (upload_ecg imports it on first use)
+    timings['imports'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    from .model_registry import model_registry
+    loaded = model_registry.reload()
+    if loaded is not None:
+        for model_key in loaded.models:
+            loaded.models[model_key]
+        loaded.predict_all(np.array([WARM_UP_ROW], dtype=np.float64))
+    timings['models'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    from .ecg_registry import ecg_registry
+    ecg_registry.reload()  # runs a warm-up inference on load
+    timings['ecg_models'] = time.perf_counter() - start
+
+    # Workers must open their own database connections, not share the master's
+    from django.db import connections
+    connections.close_all()
+    return timings
+
+
+def freeze():
+    """
+    Collect garbage once, then exclude every surviving object from future collections
+
+    Returns:
+        Number of frozen objects
+    """
+    gc.collect()
+    gc.freeze()
+    return gc.get_freeze_count()
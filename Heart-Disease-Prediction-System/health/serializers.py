@@ -17,6 +17,9 @@ class PatientSerializer(serializers.ModelSerializer):
         model = models.Patient
         fields = ('address', 'contact',)#'user','username', 'first_name', 'last_name', 'email')
 
+class BatchPredictionOptionsSerializer(serializers.Serializer):
+    save = serializers.BooleanField(required=False, default=False)
+
 # assigned = serializers.SlugRelatedField(
 #         slug_field=User.USERNAME_FIELD, required=False, allow_null=True,
 #         queryset=User.objects.all())
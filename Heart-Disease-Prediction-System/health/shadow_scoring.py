@@ -0,0 +1,124 @@
+"""
+Shadow Evaluation of the Non-Selected Heart Disease Models
+The request path only scores the best model. The remaining models score
+the same input on a background thread pool, and their agreement with the
+served prediction is tracked for auditing without adding request latency.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from .model_registry import MODEL_NAMES
+
+
+class ShadowScorer:
+    """
+    Runs shadow predictions off the request path and counts agreement
+
+    Work is dropped rather than queued once max_pending jobs are waiting,
+    so a traffic burst never builds an unbounded backlog.
+    """
+
+    def __init__(self, max_workers=1, max_pending=100, report_every=100):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.report_every = report_every
+        self._executor = None
+        self._pid = None
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._counts = {}  # model key -> [agreements, total]
+        self.evaluated = 0
+        self.dropped = 0
+
+    def _get_executor(self):
+        # Threads do not survive a fork, so each worker process builds its own pool
+        if self._executor is None or self._pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                thread_name_prefix='shadow-scoring')
+            self._pid = os.getpid()
+        return self._executor
+
+    def submit(self, loaded, served_key, served_prediction, X):
+        """
+        Queue shadow scoring of X with every model except the served one
+
+        Args:
+            loaded: LoadedModels the served prediction came from
+            served_key: Key of the model whose prediction was returned
+            served_prediction: Array of served predictions for X
+            X: Input matrix that was scored
+        """
+        if not getattr(settings, 'SHADOW_SCORING', True):
+            return
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.dropped += 1
+                return
+            self._pending += 1
+        try:
+            self._get_executor().submit(self._run, loaded, served_key, served_prediction, X)
+        except RuntimeError:
+            # Interpreter shutting down
+            with self._lock:
+                self._pending -= 1
+
+    def _run(self, loaded, served_key, served_prediction, X):
+        try:
+            results = {}
+            for model_key in loaded.models:
+                if model_key == served_key:
+                    continue
+                shadow_prediction = loaded.predict(model_key, X)
+                results[model_key] = int((shadow_prediction == served_prediction).sum())
+            self._record(results, len(served_prediction))
+        except Exception as e:
+            print(f"Shadow scoring failed: {e}")
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def _record(self, results, total):
+        with self._lock:
+            for model_key, agreements in results.items():
+                counts = self._counts.setdefault(model_key, [0, 0])
+                counts[0] += agreements
+                counts[1] += total
+            self.evaluated += 1
+            report = self.evaluated % self.report_every == 0
+        if report:
+            print(f"Shadow agreement after {self.evaluated} predictions: {self.agreement_summary()}")
+
+    def agreement(self):
+        """
+        Agreement rate of each shadow model with the served prediction
+
+        Returns:
+            dict of model key -> {'agreements', 'total', 'rate'}
+        """
+        with self._lock:
+            return {
+                model_key: {'agreements': agree, 'total': total,
+                            'rate': agree / total if total else None}
+                for model_key, (agree, total) in self._counts.items()
+            }
+
+    def agreement_summary(self):
+        parts = []
+        for model_key, stats in self.agreement().items():
+            if stats['rate'] is not None:
+                parts.append(f"{MODEL_NAMES.get(model_key, model_key)} {stats['rate'] * 100:.1f}%")
+        return ', '.join(parts)
+
+    def wait(self, timeout=10.0):
+        """Block until queued shadow work has finished (used by tests/benchmarks)"""
+        deadline = time.monotonic() + timeout
+        while self._pending and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+
+shadow_scorer = ShadowScorer(max_workers=getattr(settings, 'SHADOW_SCORING_WORKERS', 1))
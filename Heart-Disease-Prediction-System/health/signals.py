@@ -0,0 +1,39 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .analytics import record_change, record_search
+from .models import Admin_Helath_CSV, Search_Data
+from .training import background_trainer
+
+
+@receiver(post_save, sender=Admin_Helath_CSV)
+def retrain_on_csv_upload(sender, instance, **kwargs):
+    """Train and publish new models whenever an admin uploads a training CSV"""
+    if instance.csv_file:
+        transaction.on_commit(lambda: background_trainer.start(instance))
+
+
+@receiver(pre_save, sender=Search_Data)
+def remember_counted_values(sender, instance, update_fields=None, **kwargs):
+    """Keep the stored features and result of an existing row so post_save can move its counts"""
+    instance._counted_values = None
+    if instance.pk is None or kwargs.get('raw'):
+        return
+    if update_fields is not None and not {'features', 'result'} & set(update_fields):
+        return
+    instance._counted_values = sender.objects.filter(pk=instance.pk).values_list('features', 'result').first()
+
+
+@receiver(post_save, sender=Search_Data)
+def count_new_prediction(sender, instance, created, **kwargs):
+    """Add a stored prediction to the analytics summary (bulk_create callers use record_predictions)"""
+    if created:
+        record_search(instance)
+    else:
+        record_change(getattr(instance, '_counted_values', None), instance)
+
+
+@receiver(post_delete, sender=Search_Data)
+def uncount_deleted_prediction(sender, instance, **kwargs):
+    record_search(instance, sign=-1)
@@ -1,3 +1,799 @@
-from django.test import TestCase
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import transaction
+from django.http import QueryDict
+from django.utils import timezone
+from django.test import SimpleTestCase, TestCase, override_settings
+from pathlib import Path
+import pickle
+import tempfile
+import time
+import warnings
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+from PIL import Image
+
+from .analytics import rebuild_summary, record_predictions
+from .benchmarks import compare
+from .compiled_models import (EVALUATORS, compile_model, save_compiled, load_compiled,
+                              StandardScalerTransform, PCATransform, ProjectionTransform)
+from .ecg_dedup import dedup_stats
+from .ecg_predictor import WORKING_SHAPE, ECGPredictor, export_ecg_bundle
+from .ecg_queue import MAX_ATTEMPTS, claim_next, process, queue_stats, requeue_stale, run_worker
+from .ecg_registry import ECG_MODEL_FILE, ECGModelRegistry
+from .incremental import INCREMENTAL_MODELS, IncrementalUpdater
+from .ingestion import ingest_csv
+from .feature_schema import FeatureValidationError, pack_row, parse_frame, parse_row, row_values
+from .model_bundle import ModelBundle, write_bundle
+from .model_registry import FEATURE_COLUMNS, MODEL_NAMES, ModelRegistry
+from .models import Doctor, ECG_Prediction, Patient, Prediction_Summary, Search_Data
+from .prediction_cache import PredictionCache
+from .shadow_scoring import ShadowScorer
+from .training import BackgroundTrainer, ModelTrainingFailed, ModelWarmingError, fit_models, publish_models
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+MODELS_DIR = BASE_DIR / 'trained_models'
+HEART_CSV = BASE_DIR / 'Machine_Learning' / 'heart.csv'
+
+
+def load_pickled_model(model_key):
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        with open(MODELS_DIR / f'{model_key}.pkl', 'rb') as f:
+            return pickle.load(f)
+
+
+class CompiledModelParityTest(SimpleTestCase):
+    """Compiled NumPy evaluators must agree with sklearn's predict"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        X = pd.read_csv(HEART_CSV)[FEATURE_COLUMNS].values.astype(np.float64)
+        # Jittered copy so inputs also fall between the training points
+        rng = np.random.default_rng(123)
+        cls.X = np.vstack([X, X + rng.normal(0, 1.0, X.shape)])
+
+    def test_predictions_match_sklearn(self):
+        for model_key in EVALUATORS:
+            with self.subTest(model=model_key):
+                model = load_pickled_model(model_key)
+                expected = model.predict(pd.DataFrame(self.X, columns=FEATURE_COLUMNS))
+                actual = compile_model(model_key, model).predict(self.X)
+                np.testing.assert_array_equal(actual, expected)
+
+    def test_inputs_on_split_thresholds(self):
+        # float32 thresholds must send values at (and one ulp around) every split the sklearn way
+        model = load_pickled_model('random_forest')
+        tree = model.estimators_[0].tree_
+        splits = np.flatnonzero(tree.children_left != -1)
+        X = np.repeat(self.X[:len(splits)].astype(np.float32), 3, axis=0)
+        for i, node in enumerate(splits):
+            value = np.float32(tree.threshold[node])
+            for j, x in enumerate((np.nextafter(value, -np.inf), value, np.nextafter(value, np.inf))):
+                X[3 * i + j, tree.feature[node]] = x
+        evaluator = compile_model('random_forest', model)
+        expected = model.apply(pd.DataFrame(X, columns=FEATURE_COLUMNS))
+        np.testing.assert_array_equal(evaluator.leaves(X) - evaluator.roots, expected)
+
+    def test_saved_evaluators_round_trip(self):
+        evaluators = {key: compile_model(key, load_pickled_model(key)) for key in EVALUATORS}
+        sources = {key: f'digest-{key}' for key in EVALUATORS}
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'heart_models.bundle'
+            save_compiled(path, evaluators, sources)
+            loaded = load_compiled(path, sources)
+            stale = load_compiled(path, {**sources, 'knn': 'other'})
+        self.assertEqual(set(loaded), set(EVALUATORS))
+        self.assertNotIn('knn', stale)
+        for model_key, evaluator in loaded.items():
+            np.testing.assert_array_equal(evaluator.predict(self.X), evaluators[model_key].predict(self.X))
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'predictions': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests'},
+})
+class FeatureSchemaTest(SimpleTestCase):
+    """Form, API and CSV input all parse to the same float32 rows"""
+
+    def test_form_post_parses_in_training_order(self):
+        # Field order of the POST does not matter; the form names chole/old_peak map to chol/oldpeak
+        post = QueryDict('csrfmiddlewaretoken=x&thal=2&ca=1&slope=1&old_peak=0.5&exang=0&thalach=174'
+                         '&restecg=0&fbs=0&chole=236&trestbps=130&cp=1&sex=Male&age=57')
+        row = parse_row(post)
+        self.assertEqual(row.dtype, np.float32)
+        self.assertEqual(row_values(row), [57, 1, 1, 130, 236, 0, 0, 174, 0, 0.5, 1, 1, 2])
+
+    def test_bad_fields_are_reported_individually(self):
+        with self.assertRaises(FeatureValidationError) as ctx:
+            parse_row({'age': '450', 'sex': '0', 'cp': 'x', 'oldpeak': '1.5'})
+        errors = ctx.exception.errors
+        self.assertIn('between', errors['age'])
+        self.assertIn('number', errors['cp'])
+        self.assertIn('required', errors['thal'])
+        self.assertNotIn('sex', errors)
+        self.assertNotIn('oldpeak', errors)
+
+    def test_frame_matches_row_parser(self):
+        df = pd.read_csv(HEART_CSV)
+        X, errors = parse_frame(df)
+        self.assertEqual(errors, [])
+        self.assertEqual(X.dtype, np.float32)
+        np.testing.assert_array_equal(X, df[FEATURE_COLUMNS].values.astype(np.float32))
+        np.testing.assert_array_equal(X[3], parse_row(df.iloc[3].to_dict()))
+
+        df.loc[2, 'ca'] = 'two'
+        df.loc[5, 'sex'] = ' female '
+        X, errors = parse_frame(df)
+        self.assertIsNone(X)
+        self.assertEqual([(e['row'], list(e['errors'])) for e in errors], [(2, ['ca'])])
+
+
+class SearchDataFeaturesTest(TestCase):
+    """Stored feature vectors load back as one float32 matrix"""
+
+    def test_feature_matrix_round_trip(self):
+        X = pd.read_csv(HEART_CSV)[FEATURE_COLUMNS].values[:50].astype(np.float32)
+        Search_Data.objects.bulk_create([Search_Data(result=0, prediction_accuracy=85.2, features=pack_row(row))
+                                         for row in X])
+        Search_Data.objects.create(result=1)  # legacy row without features
+        ids, matrix = Search_Data.objects.feature_matrix()
+        self.assertEqual(len(ids), 50)
+        np.testing.assert_array_equal(matrix, X)
+        self.assertEqual(Search_Data.objects.get(id=ids[0]).values_list, row_values(X[0]))
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class PredictionSummaryTest(TestCase):
+    """Incrementally maintained analytics match a full rebuild"""
+
+    def counts(self):
+        return {(s.dimension, s.bucket): (s.total, s.positive) for s in Prediction_Summary.objects.all()}
+
+    def test_incremental_counts_match_backfill(self):
+        df = pd.read_csv(HEART_CSV)[:40]
+        X = df[FEATURE_COLUMNS].values.astype(np.float32)
+        searches = [Search_Data.objects.create(result=int(target), prediction_accuracy=85.0, features=pack_row(row))
+                    for row, target in zip(X[:30], df['target'][:30])]
+        with transaction.atomic():
+            Search_Data.objects.bulk_create([Search_Data(result=int(t), features=pack_row(row))
+                                             for row, t in zip(X[30:], df['target'][30:])])
+            record_predictions(X[30:], df['target'][30:].values)
+        searches[0].delete()
+
+        incremental = self.counts()
+        self.assertEqual(incremental[('all', 'All')], (39, int(df['target'][1:].sum())))
+        rebuild_summary()
+        self.assertEqual(self.counts(), incremental)
+
+        staff = User.objects.create_user('admin1', password='x', is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get('/admin_analytics')
+        self.assertContains(response, 'Chest pain type')
+
+    def test_updates_move_counts_and_uncounted_deletes_are_ignored(self):
+        df = pd.read_csv(HEART_CSV)[:2]
+        X = df[FEATURE_COLUMNS].values.astype(np.float32)
+        with transaction.atomic():
+            # Stored before the summary existed: never counted
+            old = Search_Data.objects.bulk_create([Search_Data(result=1, features=pack_row(X[0]))])[0]
+        old.delete()
+        self.assertEqual(self.counts(), {})
+
+        search = Search_Data.objects.create(result=0, features=pack_row(X[0]))
+        search.result = 1
+        search.features = pack_row(X[1])
+        search.save()
+        incremental = self.counts()
+        self.assertEqual(incremental[('all', 'All')], (1, 1))
+        rebuild_summary()
+        self.assertEqual({key: value for key, value in self.counts().items() if value != (0, 0)},
+                         {key: value for key, value in incremental.items() if value != (0, 0)})
+
+
+class BenchmarkCompareTest(SimpleTestCase):
+    def test_direction_follows_metric_unit(self):
+        baseline = {'warm_p50_ms': 1.0, 'batch_rows_per_sec': 1000.0, 'model_bytes': 100}
+        current = {'warm_p50_ms': 1.5, 'batch_rows_per_sec': 1500.0, 'model_bytes': 105, 'new_ms': 2.0}
+        status = {row[0]: row[4] for row in compare(current, baseline, tolerance=0.2)}
+        self.assertEqual(status, {'warm_p50_ms': 'regression', 'batch_rows_per_sec': 'improved',
+                                  'model_bytes': 'ok', 'new_ms': 'new'})
+
+
+class StreamingIngestionTest(SimpleTestCase):
+    """Chunked CSV ingestion keeps valid rows in order and reports bad ones"""
+
+    def test_chunks_validate_and_store(self):
+        df = pd.read_csv(HEART_CSV)
+        df['ca'] = df['ca'].astype(object)
+        df.loc[7, 'ca'] = 'n/a'
+        df.loc[120, 'target'] = 5
+        with tempfile.TemporaryDirectory() as tmp:
+            csv_path = Path(tmp) / 'upload.csv'
+            df.to_csv(csv_path, index=False)
+            with open(csv_path, 'rb') as f:
+                store = ingest_csv(f, Path(tmp) / 'store', chunk_rows=100)
+
+            keep = np.ones(len(df), dtype=bool)
+            keep[[7, 120]] = False
+            self.assertEqual(store.rows, keep.sum())
+            np.testing.assert_array_equal(store.features, df[FEATURE_COLUMNS][keep].values.astype(np.float32))
+            np.testing.assert_array_equal(store.target, df['target'][keep].values)
+            self.assertEqual([(e['line'], list(e['errors'])) for e in store.errors()],
+                             [(9, ['ca']), (122, ['target'])])
+
+            X, y = store.load(max_rows=100)
+            self.assertEqual((X.shape, y.shape), ((100, 13), (100,)))
+
+
+class IncrementalUpdateTest(TestCase):
+    """Confirmed cases update Naive Bayes and Logistic Regression in place"""
+
+    def test_confirmed_cases_are_applied_once(self):
+        df = pd.read_csv(HEART_CSV)
+        models, model_info = fit_models(df[:600])
+        new = df[600:700]
+        for row, target in zip(new[FEATURE_COLUMNS].values, new['target']):
+            Search_Data.objects.create(result=0, features=pack_row(row), confirmed_result=int(target),
+                                       confirmed_at=timezone.now())
+
+        with tempfile.TemporaryDirectory() as tmp:
+            publish_models(models, model_info, tmp, version='base')
+            registry = ModelRegistry(tmp)
+            updater = IncrementalUpdater(tmp, registry=registry)
+            result = updater.update()
+            self.assertEqual(result['cases'], 100)
+
+            loaded = registry.get()
+            self.assertEqual(loaded.models['naive_bayes'].class_count_.sum(),
+                             models['naive_bayes'].class_count_.sum() + 100)
+            self.assertFalse(np.allclose(loaded.models['logistic_regression'].coef_,
+                                         models['logistic_regression'].coef_))
+            np.testing.assert_array_equal(loaded.models['random_forest'].predict(df[FEATURE_COLUMNS][:50]),
+                                          models['random_forest'].predict(df[FEATURE_COLUMNS][:50]))
+            self.assertIsNone(updater.update())
+
+            row = df.iloc[700]
+            Search_Data.objects.create(result=0, features=pack_row(row[FEATURE_COLUMNS].values),
+                                       confirmed_result=int(row['target']), confirmed_at=timezone.now())
+            self.assertEqual(updater.update()['cases'], 1)
+            info = registry.get().model_info
+            self.assertTrue(info['naive_bayes']['test_accuracy_stale'])
+            self.assertNotIn(registry.get().best_model_key(), INCREMENTAL_MODELS)
+
+    def test_only_approved_doctors_confirm_and_only_once(self):
+        search = Search_Data.objects.create(result=0)
+        pending = User.objects.create_user('pending', password='x')
+        Doctor.objects.create(user=pending, status=2)
+        self.client.force_login(pending)
+        self.client.post(f'/confirm_outcome/{search.id}', {'outcome': '1'})
+        search.refresh_from_db()
+        self.assertIsNone(search.confirmed_result)
+
+        doctor = User.objects.create_user('doctor', password='x')
+        Doctor.objects.create(user=doctor, status=1)
+        self.client.force_login(doctor)
+        self.client.post(f'/confirm_outcome/{search.id}', {'outcome': '1'})
+        search.refresh_from_db()
+        confirmed_at = search.confirmed_at
+        self.assertEqual(search.confirmed_result, 1)
+        self.client.post(f'/confirm_outcome/{search.id}', {'outcome': '1'})
+        search.refresh_from_db()
+        self.assertEqual(search.confirmed_at, confirmed_at)
+        self.client.post(f'/confirm_outcome/{search.id}', {'outcome': '0'})
+        search.refresh_from_db()
+        self.assertEqual(search.confirmed_result, 0)
+        self.assertGreater(search.confirmed_at, confirmed_at)
+
+
+class PredictionCacheTest(SimpleTestCase):
+
+    def setUp(self):
+        self.cache = PredictionCache()
+        self.cache.cache.clear()
+
+    def test_equivalent_inputs_share_an_entry(self):
+        self.cache.set('v1', [57, 0, 1, 130, 236, 0, 0, 174, 0, 0.0, 1, 1, 2], 91.5, 1)
+        hit = self.cache.get('v1', ['57', '0', '1', '130', '236', '0', '0', '174', '0', '-0.0', '1', '1', '2.0'])
+        self.assertEqual(hit, (91.5, 1))
+
+    def test_new_model_version_misses(self):
+        features = [57, 0, 1, 130, 236, 0, 0, 174, 0, 0.0, 1, 1, 2]
+        self.cache.set('v1', features, 91.5, 1)
+        self.assertIsNone(self.cache.get('v2', features))
+        self.assertEqual(self.cache.stats(), {'hits': 0, 'misses': 1, 'hit_rate': 0.0})
+
+
+class PublishModelsTest(SimpleTestCase):
+
+    def test_published_version_is_served_by_registry(self):
+        df = pd.read_csv(HEART_CSV).sample(200, random_state=0)
+        models, model_info = fit_models(df)
+        with tempfile.TemporaryDirectory() as tmp:
+            version = publish_models(models, model_info, tmp, version='test')
+            self.assertTrue((Path(tmp) / 'versions' / 'test' / 'model_info.pkl').exists())
+
+            loaded = ModelRegistry(tmp).get()
+            self.assertEqual(set(loaded.compiled), set(models))
+            self.assertEqual(loaded.model_info['knn']['version'], version)
+            row = df[FEATURE_COLUMNS].values[:5].astype(np.float64)
+            np.testing.assert_array_equal(loaded.predict('knn', row), models['knn'].predict(df[FEATURE_COLUMNS][:5]))
+
+    @override_settings(MODEL_VERSIONS_KEPT=2)
+    def test_versions_are_unique_and_pruned(self):
+        df = pd.read_csv(HEART_CSV).sample(200, random_state=0)
+        models, model_info = fit_models(df)
+        with tempfile.TemporaryDirectory() as tmp:
+            versions = [publish_models(models, model_info, tmp, version='same-second') for _ in range(3)]
+            self.assertEqual(versions, ['same-second', 'same-second-2', 'same-second-3'])
+            self.assertEqual(sorted(p.name for p in (Path(tmp) / 'versions').iterdir()), versions[1:])
+            self.assertEqual(ModelRegistry(tmp).get().model_info['knn']['version'], versions[-1])
+
+    def test_compiled_models_unpickle_only_for_large_batches(self):
+        df = pd.read_csv(HEART_CSV)
+        models, model_info = fit_models(df.sample(200, random_state=0))
+        with tempfile.TemporaryDirectory() as tmp:
+            publish_models(models, model_info, tmp, version='test')
+            loaded = ModelRegistry(tmp).get()
+            X = df[FEATURE_COLUMNS].values.astype(np.float64)
+            loaded.predict('random_forest', X[:10])
+            self.assertFalse(loaded.models.is_loaded('random_forest'))
+            np.testing.assert_array_equal(loaded.predict('random_forest', X),
+                                          models['random_forest'].predict(df[FEATURE_COLUMNS]))
+            self.assertTrue(loaded.stats['random_forest']['loaded'])
+
+    def test_missing_models_raise_warming_error(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            trainer = BackgroundTrainer(tmp)
+            with mock.patch.object(trainer, 'start') as start:
+                with self.assertRaises(ModelWarmingError):
+                    trainer.ensure_models()
+                start.assert_called_once()
+
+    def test_recent_failure_is_reported_then_retried(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            trainer = BackgroundTrainer(tmp)
+            trainer.state, trainer.error = 'failed', 'No training CSV has been uploaded'
+            trainer.finished_at = time.time()
+            with mock.patch.object(trainer, 'start') as start:
+                with self.assertRaisesMessage(ModelTrainingFailed, 'No training CSV has been uploaded'):
+                    trainer.ensure_models()
+                start.assert_not_called()
+
+                trainer.finished_at -= 600
+                with self.assertRaises(ModelWarmingError) as ctx:
+                    trainer.ensure_models()
+                self.assertNotIsInstance(ctx.exception, ModelTrainingFailed)
+                start.assert_called_once()
+
+    def test_no_thread_while_another_process_trains(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            trainer = BackgroundTrainer(tmp)
+            other = trainer._acquire_lock()  # a second open file description locks like another process
+            try:
+                self.assertFalse(trainer.start())
+            finally:
+                other.close()
+            self.assertEqual(trainer.state, 'running elsewhere')
+            self.assertIsNone(trainer._thread)
+
+
+class ModelStatusTest(TestCase):
+    """Anyone can check readiness; only staff see the model and queue statistics"""
+
+    def test_statistics_are_staff_only(self):
+        public = self.client.get('/model_status')
+        self.assertEqual(set(public.json()), {'ready'})
+
+        self.client.force_login(User.objects.create_user('status-user', password='secret'))
+        self.assertEqual(set(self.client.get('/model_status').json()), {'ready'})
+
+        self.client.force_login(User.objects.create_user('status-staff', password='secret', is_staff=True))
+        staff = self.client.get('/model_status')
+        self.assertEqual(staff.status_code, public.status_code)
+        self.assertIn('ecg_queue', staff.json())
+        self.assertIn('training', staff.json())
+
+
+class BatchPredictionAPITest(TestCase):
+    """Rows posted to the batch API are scored by every model in one call"""
+
+    def test_rows_scored_and_saved_for_patients_only(self):
+        df = pd.read_csv(HEART_CSV)
+        models, model_info = fit_models(df.sample(200, random_state=0))
+        rows = df[FEATURE_COLUMNS][:20]
+        patient_user = User.objects.create_user('batch-patient', password='secret')
+        Patient.objects.create(user=patient_user)
+        staff = User.objects.create_user('batch-staff', password='secret')
+
+        with tempfile.TemporaryDirectory() as tmp:
+            publish_models(models, model_info, tmp, version='test')
+            registry = ModelRegistry(tmp)
+            loaded = registry.get()
+            with mock.patch('health.api_views.model_registry', registry):
+                self.client.force_login(staff)
+                forbidden = self.client.post('/api/v1/predict-batch/?save=true',
+                                             rows.to_dict('records'), content_type='application/json')
+                self.client.force_login(patient_user)
+                response = self.client.post('/api/v1/predict-batch/?save=true',
+                                            rows.to_dict('records'), content_type='application/json')
+
+        self.assertEqual(forbidden.status_code, 403)
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual((body['count'], body['saved'], body['model_version']), (20, 20, loaded.version))
+        X = rows.values.astype(np.float64)
+        best_key = loaded.best_model_key()
+        np.testing.assert_array_equal([r['prediction'] for r in body['results']], loaded.predict(best_key, X))
+        for key in loaded.models:
+            np.testing.assert_array_equal([r['predictions'][MODEL_NAMES[key]] for r in body['results']],
+                                          loaded.predict(key, X))
+        self.assertEqual(Search_Data.objects.filter(patient__user=patient_user).count(), 20)
+        self.assertFalse(Search_Data.objects.filter(patient=None).exists())
+
+    def test_no_models_is_503(self):
+        with tempfile.TemporaryDirectory() as tmp, \
+                mock.patch('health.api_views.model_registry', ModelRegistry(tmp)), \
+                mock.patch('health.api_views.background_trainer.ensure_models') as ensure_models:
+            row = pd.read_csv(HEART_CSV)[FEATURE_COLUMNS].iloc[0].to_dict()
+            response = self.client.post('/api/v1/predict-batch/', [row], content_type='application/json')
+        ensure_models.assert_called_once()
+        self.assertEqual(response.status_code, 503)
+
+
+class QueuedExecutor:
+    """Executor that holds submitted work until run_all(), so tests control when it runs"""
+
+    def __init__(self):
+        self.queued = []
+
+    def submit(self, fn, *args):
+        self.queued.append((fn, args))
+
+    def run_all(self):
+        while self.queued:
+            fn, args = self.queued.pop(0)
+            fn(*args)
+
+
+class ShadowScorerTest(SimpleTestCase):
+    """Shadow models are compared with the served prediction; excess work is dropped"""
+
+    def test_agreement_counts_and_dropped_work(self):
+        predictions = {'served': np.array([1, 0, 1, 1]), 'same': np.array([1, 0, 1, 1]),
+                       'half': np.array([1, 1, 0, 1])}
+        loaded = mock.Mock(models=predictions, predict=lambda key, X: predictions[key])
+        scorer = ShadowScorer(max_pending=2)
+        executor = QueuedExecutor()
+        scorer._get_executor = lambda: executor
+
+        for _ in range(3):
+            scorer.submit(loaded, 'served', predictions['served'], np.zeros((4, 13)))
+        self.assertEqual((scorer.dropped, len(executor.queued)), (1, 2))
+        executor.run_all()
+
+        self.assertEqual(scorer.agreement(), {
+            'same': {'agreements': 8, 'total': 8, 'rate': 1.0},
+            'half': {'agreements': 4, 'total': 8, 'rate': 0.5},
+        })
+        self.assertEqual((scorer.evaluated, scorer._pending), (2, 0))
+        scorer.submit(loaded, 'served', predictions['served'], np.zeros((4, 13)))
+        self.assertEqual(scorer.dropped, 1)
+
+
+class ECGBundleTransformTest(SimpleTestCase):
+    """Bundled scaler/PCA arrays must reproduce the joblib transforms"""
+
+    def test_scaler_and_pca_match_sklearn(self):
+        import joblib
+        scaler = joblib.load(MODELS_DIR / 'scaler_ECG.pkl')
+        pca = joblib.load(MODELS_DIR / 'PCA_ECG (1).pkl')
+        X = np.random.default_rng(0).random((4, scaler.n_features_in_))
+        expected = pca.transform(scaler.transform(X))
+
+        with tempfile.TemporaryDirectory() as tmp:
+            for name in ('scaler_ECG.pkl', 'PCA_ECG (1).pkl'):
+                (Path(tmp) / name).write_bytes((MODELS_DIR / name).read_bytes())
+            bundle = ModelBundle(export_ecg_bundle(tmp))
+            bundle.verify()
+            scaled = StandardScalerTransform(**bundle.arrays('scaler')).transform(X)
+            actual = PCATransform(**bundle.arrays('pca'), **bundle.params('pca')).transform(scaled)
+            projection = ProjectionTransform(**bundle.arrays('projection'))
+            fused = projection.transform(X)
+            single = projection.transform(X[0])
+        np.testing.assert_allclose(actual, expected, rtol=1e-6, atol=1e-8)
+        # float32 fold: errors relative to the size of the projected values
+        self.assertEqual(fused.dtype, np.float32)
+        tolerance = 1e-5 * np.abs(expected).max()
+        np.testing.assert_allclose(fused, expected, rtol=0, atol=tolerance)
+        np.testing.assert_allclose(single, expected[0], rtol=0, atol=tolerance)
+
+
+class ModelBundleSwapTest(SimpleTestCase):
+    """Rewriting a bundle must not disturb readers of the previous one"""
+
+    def test_rewrite_swaps_symlink_and_keeps_open_bundle(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'models.bundle'
+            path.mkdir()  # a plain directory, as shipped
+            write_bundle(path, {'m': {'kind': 'k', 'arrays': {'w': np.arange(3.0)}}}, version='v1')
+            reader = ModelBundle(path)
+            write_bundle(path, {'m': {'kind': 'k', 'arrays': {'w': np.ones(3)}}}, version='v2')
+            self.assertTrue(path.is_symlink())
+            np.testing.assert_array_equal(reader.array('m', 'w'), np.arange(3.0))
+            self.assertEqual(ModelBundle(path).version, 'v2')
+            write_bundle(path, {'m': {'kind': 'k', 'arrays': {'w': np.zeros(3)}}}, version='v3')
+            self.assertEqual(len([p for p in Path(tmp).iterdir() if not p.is_symlink()]), 2)
+
+
+def write_ecg_models(models_dir, seed):
+    """The real ECG scaler and PCA plus a small stand-in classifier (the trained ensemble is not in the repo)"""
+    import joblib
+    from sklearn.linear_model import LogisticRegression
+    for name in ('scaler_ECG.pkl', 'PCA_ECG (1).pkl'):
+        (Path(models_dir) / name).write_bytes((MODELS_DIR / name).read_bytes())
+    X = np.random.default_rng(seed).normal(size=(40, 150))
+    classifier = LogisticRegression(max_iter=200).fit(X, np.arange(40) % 4)
+    joblib.dump(classifier, Path(models_dir) / ECG_MODEL_FILE)
+
+
+class ECGModelRegistryTest(SimpleTestCase):
+    """ECG models are loaded once and swapped when the artifacts change"""
+
+    def test_models_loaded_once_and_reloaded_on_change(self):
+        import joblib
+        with tempfile.TemporaryDirectory() as tmp:
+            write_ecg_models(tmp, seed=0)
+            registry = ECGModelRegistry(tmp, check_interval=0)
+            predictor = ECGPredictor(lead_workers=1, registry=registry)
+
+            result = predictor.predict_from_ecg_image(BASE_DIR / 'media' / 'ecg_images' / 'HB2.jpg')
+            self.assertTrue(result['success'], result.get('error'))
+            loaded = registry.get()
+            self.assertTrue(loaded.stats['warm_up']['classifier'])
+            X = np.random.default_rng(1).random((2, 3060))
+            expected = joblib.load(Path(tmp) / 'PCA_ECG (1).pkl').transform(
+                joblib.load(Path(tmp) / 'scaler_ECG.pkl').transform(X))
+            np.testing.assert_allclose(predictor.dimensional_reduction(X), expected, rtol=0, atol=1e-4)
+            predictor.model_load_predict(predictor.dimensional_reduction(X[:1]))
+            self.assertIs(registry.get(), loaded)
+
+            write_ecg_models(tmp, seed=1)
+            reloaded = registry.get()
+            self.assertNotEqual(reloaded.version, loaded.version)
+            self.assertIsNot(reloaded.classifier, loaded.classifier)
+
+            (Path(tmp) / ECG_MODEL_FILE).unlink()
+            result = predictor.predict_from_ecg_image(BASE_DIR / 'media' / 'ecg_images' / 'HB2.jpg')
+            self.assertFalse(result['success'])
+            self.assertIn('classifier not found', result['error'])
+
+
+    def test_bundle_not_served_after_joblibs_are_retrained(self):
+        import joblib
+        from sklearn.decomposition import PCA
+        with tempfile.TemporaryDirectory() as tmp:
+            write_ecg_models(tmp, seed=0)
+            export_ecg_bundle(tmp)
+            registry = ECGModelRegistry(tmp, check_interval=0)
+            loaded = registry.get()
+            self.assertEqual(loaded.stats['projection']['source'], 'bundle')
+            self.assertEqual(loaded.stats['classifier']['source'], 'bundle')
+
+            # What the retraining scripts do: rewrite the joblib files, leave the bundle alone
+            X = np.random.default_rng(2).normal(size=(200, 3060))
+            write_ecg_models(tmp, seed=1)
+            joblib.dump(PCA(n_components=150, random_state=0).fit(X), Path(tmp) / 'PCA_ECG (1).pkl')
+            retrained = registry.get()
+
+            self.assertEqual(retrained.stats['projection']['source'], 'folded from joblib')
+            self.assertEqual(retrained.stats['classifier']['source'], 'joblib')
+            self.assertEqual(retrained.stats['bundle']['stale_entries'], ['classifier', 'pca', 'projection'])
+            expected = joblib.load(Path(tmp) / 'PCA_ECG (1).pkl').transform(
+                joblib.load(Path(tmp) / 'scaler_ECG.pkl').transform(X[:2]))
+            np.testing.assert_allclose(retrained.reduce(X[:2]), expected, rtol=0,
+                                       atol=1e-5 * np.abs(expected).max())
+
+            export_ecg_bundle(tmp)
+            self.assertEqual(registry.get().stats['projection']['source'], 'bundle')
+
+
+class ECGFeatureExtractionTest(SimpleTestCase):
+    """The ECG pipeline turns an image into features without touching the filesystem"""
+
+    def test_sample_image_features(self):
+        cwd = Path.cwd()
+        features = ECGPredictor().extract_features(BASE_DIR / 'media' / 'ecg_images' / 'HB2.jpg')
+        self.assertEqual(Path.cwd(), cwd)
+        self.assertEqual(features.shape, (1, 3060))
+        self.assertAlmostEqual(features.min(), 0.0)
+        self.assertAlmostEqual(features.max(), 1.0)
+
+    def test_parallel_leads_match_serial(self):
+        image_path = BASE_DIR / 'media' / 'ecg_images' / 'MI2.jpg'
+        serial = ECGPredictor(lead_workers=1).extract_features(image_path)
+        np.testing.assert_array_equal(ECGPredictor(lead_workers=5).extract_features(image_path), serial)
+
+    def test_cropped_leads_match_full_resize(self):
+        predictor = ECGPredictor(lead_workers=1)
+        # Already on the working grid, and an upload that has to be resampled
+        for name in ('HB2.jpg', 'norm_2x.png'):
+            image = predictor.get_image(BASE_DIR / 'media' / 'ecg_images' / name)
+            full = predictor.divide_leads(predictor.gray_image(image))
+            cropped = predictor.crop_leads(image)
+            self.assertEqual(len(cropped), len(full))
+            for expected, lead in zip(full, cropped):
+                np.testing.assert_allclose(lead, expected, rtol=0, atol=1e-9)
+
+    def test_large_jpeg_decoded_at_reduced_size(self):
+        sample = BASE_DIR / 'media' / 'ecg_images' / 'HB2.jpg'
+        predictor = ECGPredictor(lead_workers=1, reduced_decode=True)
+        with tempfile.TemporaryDirectory() as tmp, Image.open(sample) as image:
+            scan = Path(tmp) / 'scan.jpg'
+            image.resize((image.width * 2, image.height * 2)).save(scan, quality=90)
+            reduced = predictor.get_image(scan, min_shape=WORKING_SHAPE)
+            self.assertEqual(reduced.shape, WORKING_SHAPE)
+            self.assertEqual(predictor.extract_features(scan).shape, (1, 3060))
+            full = ECGPredictor(reduced_decode=False).get_image(scan, min_shape=WORKING_SHAPE)
+            self.assertEqual(full.shape, (image.height * 2, image.width * 2, 3))
+        # Uploads under twice the working size decode exactly as before
+        np.testing.assert_array_equal(predictor.get_image(sample, min_shape=WORKING_SHAPE),
+                                      predictor.get_image(sample))
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class ECGBatchPredictionTest(TestCase):
+    """Many ECG images are classified in one model call and stored in bulk"""
+
+    def test_batch_matches_single_image_pipeline(self):
+        user = User.objects.create_user('ecg-batch', password='secret')
+        Patient.objects.create(user=user)
+        self.client.force_login(user)
+        images = [BASE_DIR / 'media' / 'ecg_images' / name for name in ('HB2.jpg', 'ID_Lead_1_Signal.png', 'MI2.jpg')]
+
+        with tempfile.TemporaryDirectory() as models_dir, tempfile.TemporaryDirectory() as media:
+            write_ecg_models(models_dir, seed=0)
+            predictor = ECGPredictor(lead_workers=1, registry=ECGModelRegistry(models_dir))
+            files = [SimpleUploadedFile(path.name, path.read_bytes()) for path in images]
+            with override_settings(MEDIA_ROOT=media), mock.patch('health.ecg_predictor._shared_predictor', predictor):
+                response = self.client.post('/api/v1/ecg-predict-batch/', {'images': files})
+                stored_files = sorted(p.name for p in Path(media, 'ecg_images').iterdir())
+            expected = [predictor.predict_from_ecg_image(images[0]), predictor.predict_from_ecg_image(images[2])]
+
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual([r['success'] for r in body['results']], [True, False, True])
+        self.assertEqual(body['saved'], 2)
+        self.assertEqual(stored_files, ['HB2.jpg', 'MI2.jpg'])
+        for result, single in zip([body['results'][0], body['results'][2]], expected):
+            self.assertEqual(result['prediction_code'], single['prediction_code'])
+            self.assertAlmostEqual(result['confidence'], single['confidence'], places=2)
+            record = ECG_Prediction.objects.get(id=result['id'], patient__user=user)
+            self.assertEqual(record.prediction_label, single['prediction_label'])
+
+
+
+class ECGQueueTest(TestCase):
+    """Uploads are queued, shown as in progress, and analysed by a queue worker"""
+
+    def test_upload_is_queued_and_processed(self):
+        user = User.objects.create_user('ecg-queue', password='secret')
+        Patient.objects.create(user=user, address='Pune')
+        self.client.force_login(user)
+        image = BASE_DIR / 'media' / 'ecg_images' / 'HB2.jpg'
+
+        with tempfile.TemporaryDirectory() as models_dir, tempfile.TemporaryDirectory() as media:
+            write_ecg_models(models_dir, seed=0)
+            predictor = ECGPredictor(lead_workers=1, registry=ECGModelRegistry(models_dir))
+            with override_settings(MEDIA_ROOT=media, ECG_ASYNC_ANALYSIS=True,
+                                   STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage'):
+                response = self.client.post('/upload_ecg', {
+                    'ecg_image': SimpleUploadedFile(image.name, image.read_bytes())})
+                job = ECG_Prediction.objects.get(patient__user=user)
+                self.assertRedirects(response, f'/ecg_result/{job.id}/', fetch_redirect_response=False)
+                self.assertEqual(job.status, ECG_Prediction.STATUS_PENDING)
+                page = self.client.get(f'/ecg_result/{job.id}/')
+                self.assertContains(page, 'number 1 in the analysis queue')
+
+                bad = ECG_Prediction.objects.create(
+                    patient=job.patient, ecg_image=SimpleUploadedFile('bad.jpg', b'not an image'))
+                self.assertEqual(run_worker(drain=True, predictor=predictor), 2)
+                page = self.client.get(f'/ecg_result/{job.id}/')
+            expected = predictor.predict_from_ecg_image(image)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, ECG_Prediction.STATUS_DONE)
+        self.assertEqual(job.prediction_code, expected['prediction_code'])
+        self.assertEqual(job.attempts, 1)
+        self.assertNotContains(page, 'analysis queue')
+        bad.refresh_from_db()
+        self.assertEqual(bad.status, ECG_Prediction.STATUS_FAILED)
+        self.assertTrue(bad.error)
+        stats = queue_stats()
+        self.assertEqual((stats['depth'], stats['failed'], stats['recent_jobs']), (0, 1, 2))
+
+    def test_stale_job_is_requeued(self):
+        user = User.objects.create_user('ecg-stale', password='secret')
+        job = ECG_Prediction.objects.create(patient=Patient.objects.create(user=user), ecg_image='ecg_images/x.jpg')
+        self.assertEqual(claim_next(), job)
+        self.assertIsNone(claim_next())
+        self.assertEqual(requeue_stale(stale_seconds=60), 0)
+        ECG_Prediction.objects.filter(id=job.id).update(started_at=timezone.now() - timezone.timedelta(seconds=120))
+        self.assertEqual(requeue_stale(stale_seconds=60), 1)
+        self.assertEqual(claim_next().attempts, 2)
+
+        # A job that keeps killing its worker fails after MAX_ATTEMPTS instead of looping
+        ECG_Prediction.objects.filter(id=job.id).update(
+            attempts=MAX_ATTEMPTS, started_at=timezone.now() - timezone.timedelta(seconds=120))
+        self.assertEqual(requeue_stale(stale_seconds=60), 0)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ECG_Prediction.STATUS_FAILED)
+        self.assertIn('did not finish', job.error)
+
+    def test_failed_classification_waits_before_retry(self):
+        user = User.objects.create_user('ecg-retry', password='secret')
+        job = ECG_Prediction.objects.create(patient=Patient.objects.create(user=user), ecg_image='ecg_images/x.jpg')
+        predictor = mock.Mock()
+        predictor.loaded_models.side_effect = RuntimeError('ECG models are not available')
+        self.assertEqual(process(claim_next(), predictor), ECG_Prediction.STATUS_PENDING)
+        job.refresh_from_db()
+        self.assertGreater(job.retry_after, timezone.now())
+        self.assertIsNone(claim_next())
+        self.assertEqual(queue_stats()['waiting_retry'], 1)
+        ECG_Prediction.objects.filter(id=job.id).update(retry_after=timezone.now())
+        self.assertEqual(claim_next(), job)
+
+    def test_worker_survives_database_errors(self):
+        from django.db import OperationalError
+        with mock.patch('health.ecg_queue.claim_next', side_effect=[OperationalError('database is locked'), None]), \
+                mock.patch('health.ecg_queue.ERROR_BACKOFF', 0):
+            self.assertEqual(run_worker(drain=True), 0)
+
+
+class ECGDedupTest(TestCase):
+    """A repeated ECG image reuses the stored file and the current model version's result"""
+
+    def test_repeated_uploads_reuse_file_and_result(self):
+        user = User.objects.create_user('ecg-dedup', password='secret')
+        Patient.objects.create(user=user, address='Pune')
+        self.client.force_login(user)
+        image = BASE_DIR / 'media' / 'ecg_images' / 'HB2.jpg'
+
+        def upload():
+            return self.client.post('/upload_ecg', {'ecg_image': SimpleUploadedFile(image.name, image.read_bytes())})
+
+        with tempfile.TemporaryDirectory() as models_dir, tempfile.TemporaryDirectory() as media:
+            write_ecg_models(models_dir, seed=0)
+            registry = ECGModelRegistry(models_dir)
+            predictor = ECGPredictor(lead_workers=1, registry=registry)
+            with override_settings(MEDIA_ROOT=media, ECG_ASYNC_ANALYSIS=True), \
+                    mock.patch('health.views.ecg_registry', registry), \
+                    mock.patch('health.ecg_predictor._shared_predictor', predictor):
+                upload()
+                upload()
+                self.assertEqual(run_worker(drain=True, predictor=predictor), 2)
+                upload()
+                response = self.client.post('/api/v1/ecg-predict-batch/', {
+                    'images': [SimpleUploadedFile(image.name, image.read_bytes()) for _ in range(2)]})
+                stored_files = list(Path(media, 'ecg_images').iterdir())
+
+        first, *repeats = ECG_Prediction.objects.filter(patient__user=user).order_by('id')
+        self.assertEqual(len(stored_files), 1)
+        self.assertFalse(first.image_reused or first.result_reused)
+        self.assertEqual(first.model_version, registry.get().version)
+        for record in repeats:
+            self.assertEqual(record.ecg_image.name, first.ecg_image.name)
+            self.assertEqual(record.status, ECG_Prediction.STATUS_DONE)
+            self.assertEqual(record.prediction_code, first.prediction_code)
+            self.assertTrue(record.image_reused and record.result_reused)
+        self.assertEqual(response.json()['analysed'], 0)
+
+        stats = dedup_stats()
+        self.assertEqual((stats['hashed_uploads'], stats['stored_files']), (5, 1))
+        self.assertEqual(stats['storage_saved_bytes'], 4 * image.stat().st_size)
+        self.assertEqual(stats['reused_results'], 4)
+        self.assertAlmostEqual(stats['analysis_seconds_saved'],
+                               4 * (first.finished_at - first.started_at).total_seconds())
@@ -0,0 +1,475 @@
+"""
+Background Training of the Tabular Heart Disease Models
+Fits the five models from the admin-uploaded CSV outside the request path
+and publishes them as a new versioned set of artifacts in trained_models/.
+
+Requests that arrive while no models exist get a "model warming" response
+instead of training inline. Only one process trains at a time: the job
+holds an exclusive lock file in trained_models/ while it runs.
+"""
+
+import datetime
+import hashlib
+import os
+import pickle
+import shutil
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db import connection
+from sklearn.model_selection import train_test_split, StratifiedKFold, ParameterGrid
+from sklearn.linear_model import LogisticRegression
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.tree import DecisionTreeClassifier
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.naive_bayes import GaussianNB
+
+from .compiled_models import compile_model, save_compiled, file_digest
+from .ingestion import ingest_upload
+from .model_bundle import copy_bundle
+from .model_registry import MODEL_NAMES, FEATURE_COLUMNS
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process locking only
+    fcntl = None
+
+MODELS_DIR = Path(__file__).resolve().parent.parent / 'trained_models'
+
+# Hyperparameter grids searched by cross_validate_models. KNN stays on
+# uniform weights so it can still be compiled to a NumPy evaluator.
+PARAM_GRIDS = {
+    'logistic_regression': {'C': [0.01, 0.1, 1.0, 10.0]},
+    'random_forest': {'n_estimators': [100, 200], 'max_depth': [None, 8], 'min_samples_leaf': [1, 3]},
+    'decision_tree': {'criterion': ['entropy', 'gini'], 'max_depth': [None, 5, 10]},
+    'knn': {'n_neighbors': [5, 7, 11, 15]},
+    'naive_bayes': {'var_smoothing': [1e-9, 1e-8, 1e-7]},
+}
+
+
+class ModelWarmingError(Exception):
+    """Raised when a prediction is requested before any models are trained"""
+
+    def __init__(self, message="The prediction models are warming up. Please try again in a minute."):
+        super().__init__(message)
+
+
+class ModelTrainingFailed(ModelWarmingError):
+    """Raised instead of ModelWarmingError while the last training job's failure is recent"""
+
+    def __init__(self, error):
+        self.error = error
+        super().__init__(f"The prediction models could not be trained: {error}")
+
+
+def build_models():
+    """Fresh, unfitted instances of the five models"""
+    return {
+        'logistic_regression': LogisticRegression(max_iter=1000),
+        'random_forest': RandomForestClassifier(n_estimators=100, random_state=123),
+        'decision_tree': DecisionTreeClassifier(criterion='entropy', random_state=123),
+        'knn': KNeighborsClassifier(n_neighbors=7),
+        'naive_bayes': GaussianNB()
+    }
+
+
+def fit_models(df):
+    """
+    Fit all five models on an 80/20 split of a heart dataset
+
+    Args:
+        df: DataFrame with FEATURE_COLUMNS and 'target'
+    Returns:
+        tuple: (dict of fitted models, model_info dict)
+    """
+    return fit_arrays(df[FEATURE_COLUMNS], df['target'])
+
+
+def fit_arrays(X, y):
+    """
+    Fit all five models on an 80/20 split of feature/target arrays
+
+    Args:
+        X: Feature matrix (array or DataFrame) in FEATURE_COLUMNS order
+        y: Target vector
+    Returns:
+        tuple: (dict of fitted models, model_info dict)
+    """
+    if not hasattr(X, 'columns'):
+        # Fit with column names so the models accept DataFrames at predict time
+        X = pd.DataFrame(X, columns=FEATURE_COLUMNS)
+    X_train, X_test, y_train, y_test = train_test_split(X, y, train_size=0.8, random_state=123, stratify=y)
+
+    models = build_models()
+    model_info = {}
+    for name, model in models.items():
+        model.fit(X_train, y_train)
+        model_info[name] = {
+            'train_accuracy': model.score(X_train, y_train) * 100,
+            'test_accuracy': model.score(X_test, y_test) * 100,
+        }
+    return models, model_info
+
+
+def make_folds(y, k=5, seed=123, cache_dir=None):
+    """
+    Stratified k-fold splits, cached on disk per label vector
+
+    Args:
+        y: Label array
+        k: Number of folds
+        seed: Shuffle seed
+        cache_dir: Directory for cached splits; not cached when None
+    Returns:
+        list of (train_indices, validation_indices)
+    """
+    y = np.asarray(y)
+    cache_path = None
+    if cache_dir is not None:
+        digest = hashlib.sha1(y.astype(np.int64).tobytes()).hexdigest()[:12]
+        cache_path = Path(cache_dir) / f'folds-{digest}-k{k}-s{seed}.npz'
+        if cache_path.exists():
+            with np.load(cache_path) as data:
+                return [(data[f'train_{i}'], data[f'val_{i}']) for i in range(k)]
+
+    splitter = StratifiedKFold(n_splits=k, shuffle=True, random_state=seed)
+    folds = list(splitter.split(np.zeros(len(y)), y))
+    if cache_path is not None:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        arrays = {}
+        for i, (train_idx, val_idx) in enumerate(folds):
+            arrays[f'train_{i}'] = train_idx
+            arrays[f'val_{i}'] = val_idx
+        np.savez(cache_path, **arrays)
+    return folds
+
+
+# Training data of a cross-validation worker process, set once by the
+# pool initializer instead of being pickled with every task
+_cv_data = {}
+
+
+def _init_cv_worker(X, y):
+    _cv_data['X'] = X
+    _cv_data['y'] = y
+
+
+def _evaluate_candidate(name, params, train_idx, val_idx):
+    """Fit one model/parameter combination on one fold"""
+    X = _cv_data['X']
+    y = _cv_data['y']
+    model = build_models()[name].set_params(**params)
+
+    start = time.perf_counter()
+    model.fit(X[train_idx], y[train_idx])
+    fit_seconds = time.perf_counter() - start
+
+    accuracy = float((model.predict(X[val_idx]) == y[val_idx]).mean() * 100)
+
+    # Single-row latency is what a prediction request pays
+    row = X[val_idx[:1]]
+    latencies = []
+    for _ in range(10):
+        start = time.perf_counter()
+        model.predict(row)
+        latencies.append(time.perf_counter() - start)
+    return name, params, accuracy, fit_seconds, float(np.median(latencies) * 1000)
+
+
+def cross_validate_models(X, y, k=5, n_jobs=None, grids=None, cache_dir=None):
+    """
+    k-fold cross-validation over a hyperparameter grid for every model
+
+    All (model, parameters, fold) fits run in parallel on a process pool.
+
+    Args:
+        X: Feature array in FEATURE_COLUMNS order
+        y: Label array
+        k: Number of folds
+        n_jobs: Worker processes (default: all cores)
+        grids: dict of model name -> parameter grid (default PARAM_GRIDS)
+        cache_dir: Where to cache the fold splits
+    Returns:
+        dict of model name -> {'best_params', 'cv_mean_accuracy',
+        'cv_std_accuracy', 'fit_seconds', 'predict_latency_ms', 'candidates'}
+    """
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y)
+    grids = grids or PARAM_GRIDS
+    folds = make_folds(y, k, cache_dir=cache_dir)
+
+    scores = {}
+    with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_cv_worker, initargs=(X, y)) as pool:
+        futures = []
+        for name, grid in grids.items():
+            for params in ParameterGrid(grid):
+                for train_idx, val_idx in folds:
+                    futures.append(pool.submit(_evaluate_candidate, name, params, train_idx, val_idx))
+        for future in futures:
+            name, params, accuracy, fit_seconds, latency_ms = future.result()
+            key = (name, tuple(sorted(params.items(), key=lambda item: item[0])))
+            scores.setdefault(key, []).append((accuracy, fit_seconds, latency_ms))
+
+    results = {}
+    for (name, params), runs in scores.items():
+        runs = np.array(runs)
+        candidate = {
+            'params': dict(params),
+            'cv_mean_accuracy': float(runs[:, 0].mean()),
+            'cv_std_accuracy': float(runs[:, 0].std()),
+            'fit_seconds': float(runs[:, 1].mean()),
+            'predict_latency_ms': float(np.median(runs[:, 2])),
+        }
+        entry = results.setdefault(name, {'candidates': []})
+        entry['candidates'].append(candidate)
+
+    for name, entry in results.items():
+        best = max(entry['candidates'], key=lambda c: c['cv_mean_accuracy'])
+        entry['best_params'] = best['params']
+        for field in ('cv_mean_accuracy', 'cv_std_accuracy', 'fit_seconds', 'predict_latency_ms'):
+            entry[field] = best[field]
+    return results
+
+
+def export_compiled_models(models_dir=MODELS_DIR, models=None, version=None):
+    """
+    Export the models as compact NumPy evaluators (heart_models.bundle)
+
+    Args:
+        models_dir: Directory holding the model pickles
+        models: Optional dict of name -> fitted model; loaded from the
+                pickles in models_dir when not given
+        version: Optional bundle version string
+    Returns:
+        Path of the written bundle
+    """
+    models_dir = Path(models_dir)
+    evaluators = {}
+    sources = {}
+    for name in MODEL_NAMES:
+        model_path = models_dir / f'{name}.pkl'
+        if not model_path.exists():
+            continue
+        if models is not None and name in models:
+            model = models[name]
+        else:
+            with open(model_path, 'rb') as f:
+                model = pickle.load(f)
+        evaluators[name] = compile_model(name, model)
+        sources[name] = file_digest(model_path)
+
+    return save_compiled(models_dir / 'heart_models.bundle', evaluators, sources, version=version)
+
+
+def new_version():
+    return datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
+
+
+def create_version_dir(versions_dir, version=None):
+    """
+    Create the directory of a new artifact version
+
+    mkdir fails if the directory exists, so two publishes within the same
+    second (e.g. a retrain and an incremental update) get distinct
+    versions: the later one is suffixed -2, -3, ...
+
+    Returns:
+        tuple: (version, directory path)
+    """
+    base = version or new_version()
+    version, n = base, 1
+    while True:
+        version_dir = versions_dir / version
+        try:
+            version_dir.mkdir(parents=True)
+            return version, version_dir
+        except FileExistsError:
+            n += 1
+            version = f'{base}-{n}'
+
+
+def prune_versions(versions_dir, keep, current):
+    """
+    Delete all but the `keep` most recently published versions
+
+    Args:
+        versions_dir: trained_models/versions
+        keep: Number of versions to keep (the current one always stays)
+        current: Version just published
+    Returns:
+        List of deleted versions
+    """
+    versions = sorted((path for path in versions_dir.iterdir() if path.is_dir()),
+                      key=lambda path: path.stat().st_mtime, reverse=True)
+    deleted = []
+    for path in versions[max(keep, 1):]:
+        if path.name != current:
+            shutil.rmtree(path, ignore_errors=True)
+            deleted.append(path.name)
+    return deleted
+
+
+def publish_models(models, model_info, models_dir=MODELS_DIR, version=None):
+    """
+    Publish fitted models as a new artifact version
+
+    The artifacts are written to trained_models/versions/<version>/ first and
+    then swapped into trained_models/ one file at a time with os.replace.
+    model_info.pkl goes last, since the model registry treats it as the
+    marker for a complete set. Only the MODEL_VERSIONS_KEPT most recent
+    version directories are kept.
+
+    Returns:
+        The published version string
+    """
+    models_dir = Path(models_dir)
+    version, version_dir = create_version_dir(models_dir / 'versions', version)
+
+    for name, model in models.items():
+        with open(version_dir / f'{name}.pkl', 'wb') as f:
+            pickle.dump(model, f)
+        model_info[name]['version'] = version
+        model_info[name]['path'] = os.path.join('trained_models', f'{name}.pkl')
+    export_compiled_models(version_dir, models, version=version)
+    with open(version_dir / 'model_info.pkl', 'wb') as f:
+        pickle.dump(model_info, f)
+
+    for file_name in [f'{name}.pkl' for name in models]:
+        tmp_path = models_dir / f'.{file_name}.tmp'
+        shutil.copyfile(version_dir / file_name, tmp_path)
+        os.replace(tmp_path, models_dir / file_name)
+    copy_bundle(version_dir / 'heart_models.bundle', models_dir / 'heart_models.bundle')
+    tmp_path = models_dir / '.model_info.pkl.tmp'
+    shutil.copyfile(version_dir / 'model_info.pkl', tmp_path)
+    os.replace(tmp_path, models_dir / 'model_info.pkl')
+    prune_versions(models_dir / 'versions', getattr(settings, 'MODEL_VERSIONS_KEPT', 5), version)
+    return version
+
+
+class BackgroundTrainer:
+    """
+    Runs at most one training job at a time, in a background thread
+
+    States: 'idle', 'running', 'running elsewhere' (another process holds
+    the training lock), 'done', 'failed'
+    """
+
+    def __init__(self, models_dir=MODELS_DIR):
+        self.models_dir = Path(models_dir)
+        self.state = 'idle'
+        self.error = None
+        self.version = None
+        self.started_at = None
+        self.finished_at = None
+        self.ingestion = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def lock_path(self):
+        return self.models_dir / '.training.lock'
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, csv_record=None):
+        """
+        Start a training job unless one is already running in this process
+
+        Args:
+            csv_record: Admin_Helath_CSV to train on; defaults to the latest upload
+        Returns:
+            True if a new job was started
+        """
+        with self._lock:
+            if self.is_running():
+                return False
+            # Take the lock here rather than in the thread, so requests in the
+            # other workers do not each start a thread that exits at once
+            lock_file = self._acquire_lock()
+            if lock_file is None:
+                self.state = 'running elsewhere'
+                return False
+            self.state = 'running'
+            self.error = None
+            self.started_at = time.time()
+            self._thread = threading.Thread(target=self._run, args=(csv_record, lock_file),
+                                            name='model-training', daemon=True)
+            self._thread.start()
+            return True
+
+    def _acquire_lock(self):
+        """Open and lock the training lock file, or return None if another process holds it"""
+        self.models_dir.mkdir(parents=True, exist_ok=True)
+        lock_file = open(self.lock_path, 'w')
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                lock_file.close()
+                return None
+        return lock_file
+
+    def ensure_models(self):
+        """
+        Called when no trained models exist: start training and tell the
+        caller to come back later
+
+        A failed job is retried once TRAINING_RETRY_SECONDS have passed
+        since it finished; until then its error is reported.
+
+        Raises:
+            ModelTrainingFailed while the last failure is recent
+            ModelWarmingError otherwise
+        """
+        if self.state == 'failed':
+            retry_after = getattr(settings, 'TRAINING_RETRY_SECONDS', 300)
+            if time.time() - (self.finished_at or 0) < retry_after:
+                raise ModelTrainingFailed(self.error)
+        self.start()
+        raise ModelWarmingError()
+
+    def _run(self, csv_record, lock_file):
+        from .models import Admin_Helath_CSV
+
+        try:
+            if csv_record is None:
+                csv_record = Admin_Helath_CSV.objects.exclude(csv_file='').order_by('-id').first()
+            if csv_record is None or not csv_record.csv_file:
+                raise ValueError("No training CSV has been uploaded")
+
+            print(f"Ingesting {csv_record.csv_file.name}...")
+            store = ingest_upload(csv_record, self.models_dir / 'datasets')
+            self.ingestion = store.summary()
+            print(f"Training store has {store.rows} valid rows, {self.ingestion['bad_rows']} rejected")
+            X, y = store.load(max_rows=getattr(settings, 'TRAINING_MAX_ROWS', None))
+            models, model_info = fit_arrays(X, y)
+            self.version = publish_models(models, model_info, self.models_dir)
+            self.state = 'done'
+            print(f"Published model version {self.version}")
+        except Exception as e:
+            self.state = 'failed'
+            self.error = str(e)
+            print(f"Model training failed: {e}")
+        finally:
+            self.finished_at = time.time()
+            lock_file.close()
+            connection.close()
+
+    def status(self):
+        return {
+            'state': self.state,
+            'error': self.error,
+            'version': self.version,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'ingestion': self.ingestion,
+        }
+
+
+background_trainer = BackgroundTrainer()
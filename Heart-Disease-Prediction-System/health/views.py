@@ -1,10 +1,22 @@
 from django.contrib import messages
+from django.conf import settings
+from django.db import transaction
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import render, redirect
+from django.utils import timezone
 import datetime
 
 from .forms import DoctorForm
 from .models import *
+from .model_registry import model_registry, MODEL_NAMES
+from .ecg_registry import ecg_registry
+from .ecg_queue import queue_position, queue_stats
+from .ecg_dedup import dedup_stats, ingest
+from .feature_schema import parse_row, pack_row, FeatureValidationError
+from .analytics import summary_tables
+from .shadow_scoring import shadow_scorer
+from .prediction_cache import prediction_cache
+from .training import background_trainer, ModelWarmingError
 from django.contrib.auth import authenticate, login, logout
 import numpy as np
 import pandas as pd
@@ -14,15 +26,7 @@ import seaborn as sns
 sns.set_style('darkgrid')
 
 from sklearn.preprocessing import StandardScaler, MinMaxScaler, RobustScaler
-from sklearn.model_selection import train_test_split
-
-from sklearn.linear_model import LogisticRegression
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.tree import DecisionTreeClassifier
-from sklearn.neighbors import KNeighborsClassifier
-from sklearn.naive_bayes import GaussianNB
-from sklearn.metrics import accuracy_score
-from django.http import HttpResponse
+from django.http import HttpResponse, JsonResponse
 import pickle
 import os
 # Create your views here.
@@ -39,6 +43,13 @@ def Admin_Home(request):
     d = {'dis':dis.count(),'pat':pat.count(),'doc':doc.count(),'feed':feed.count()}
     return render(request,'admin_home.html',d)
 
+@login_required(login_url="login")
+def admin_analytics(request):
+    """Risk rates by age band, sex and chest pain type, read from the summary table only"""
+    if not request.user.is_staff:
+        return redirect('login')
+    return render(request, 'admin_analytics.html', {'tables': summary_tables()})
+
 @login_required(login_url="login")
 def assign_status(request,pid):
     doctor = Doctor.objects.get(id=pid)
@@ -177,48 +188,37 @@ def preprocess_inputs(df, scaler):
 def prdict_heart_disease(list_data):
     """
     Predict heart disease using pre-trained models.
-    Loads saved models from trained_models/ directory.
-    If models don't exist, falls back to training on-the-fly.
+    Models are served from the process-wide registry in model_registry.py,
+    which loads the trained_models/ artifacts once per worker and scores
+    with the compiled NumPy evaluators when they have been exported.
+    Only the most accurate model runs on the request path; the rest are
+    scored in shadow mode by shadow_scoring.py. Results are cached per
+    feature vector and model version in prediction_cache.py.
+    If models don't exist, starts background training (training.py) and
+    raises ModelWarmingError.
     """
-    models_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'trained_models')
-    model_info_path = os.path.join(models_dir, 'model_info.pkl')
+    loaded = model_registry.get()
     
     # Check if pre-trained models exist
-    if os.path.exists(model_info_path):
-        print("Loading pre-trained models...")
-        
-        # Load model info
-        with open(model_info_path, 'rb') as f:
-            model_info = pickle.load(f)
-        
-        # Load all models and make predictions
-        predictions = {}
-        accuracies = {}
-        
-        model_names = {
-            'logistic_regression': 'Logistic Regression',
-            'random_forest': 'Random Forest',
-            'decision_tree': 'Decision Tree',
-            'knn': 'KNN',
-            'naive_bayes': 'Naive Bayes'
-        }
-        
-        for model_key, display_name in model_names.items():
-            model_path = os.path.join(models_dir, f'{model_key}.pkl')
-            if os.path.exists(model_path):
-                with open(model_path, 'rb') as f:
-                    model = pickle.load(f)
-                
-                pred = model.predict([list_data])
-                accuracy = model_info[model_key]['test_accuracy']
-                predictions[display_name] = pred[0]
-                accuracies[display_name] = accuracy
-                print(f"{display_name} Accuracy: {accuracy:.2f}%")
-        
-        # Use the model with highest accuracy
-        best_model_name = max(accuracies, key=accuracies.get)
-        best_accuracy = accuracies[best_model_name]
-        final_prediction = predictions[best_model_name]
+    if loaded is not None:
+        # Repeated inputs are answered from the shared cache
+        cached = prediction_cache.get(loaded.version, list_data)
+        if cached is not None:
+            best_accuracy, final_prediction = cached
+            print(f"Cached prediction: {final_prediction} ({best_accuracy:.2f}%)")
+            return best_accuracy, np.array([final_prediction])
+        
+        # The best model is known from the stored test accuracies, so only
+        # it is scored here; the others run as shadow models in the background
+        best_model_key = loaded.best_model_key()
+        best_model_name = MODEL_NAMES[best_model_key]
+        best_accuracy = loaded.model_info[best_model_key]['test_accuracy']
+        
+        row = np.asarray(list_data, dtype=np.float32).reshape(1, -1)
+        pred = loaded.predict(best_model_key, row)
+        final_prediction = pred[0]
+        shadow_scorer.submit(loaded, best_model_key, pred, row)
+        prediction_cache.set(loaded.version, list_data, best_accuracy, final_prediction)
         
         print(f"\nBest Model: {best_model_name}")
         print(f"Best Accuracy: {best_accuracy:.2f}%")
@@ -226,49 +226,31 @@ def prdict_heart_disease(list_data):
         
         return best_accuracy, np.array([final_prediction])
     
-    else:
-        # Fallback: Train models on-the-fly if pre-trained models don't exist
-        print("Pre-trained models not found. Training on-the-fly...")
-        print("Run 'python train_and_save_models.py' to create pre-trained models for faster predictions.")
-        
-        csv_file = Admin_Helath_CSV.objects.get(id=1)
-        df = pd.read_csv(csv_file.csv_file)
+    # No trained models yet: train them once in the background and tell the
+    # caller to retry, instead of fitting five models inside the request
+    print("Pre-trained models not found. Starting background training...")
+    background_trainer.ensure_models()
+    raise ModelWarmingError()
 
-        X = df[['age','sex','cp',  'trestbps',  'chol',  'fbs',  'restecg',  'thalach',  'exang',  'oldpeak',  'slope',  'ca',  'thal']]
-        y = df['target']
-        X_train, X_test, y_train, y_test = train_test_split(X, y, train_size=0.8, random_state=123, stratify=y)
-        
-        # Initialize multiple models
-        models = {
-            'Logistic Regression': LogisticRegression(max_iter=1000),
-            'Random Forest': RandomForestClassifier(n_estimators=100, random_state=123),
-            'Decision Tree': DecisionTreeClassifier(criterion='entropy', random_state=123),
-            'KNN': KNeighborsClassifier(n_neighbors=7),
-            'Naive Bayes': GaussianNB()
-        }
-        
-        # Train all models and get predictions
-        predictions = {}
-        accuracies = {}
-        
-        for name, model in models.items():
-            model.fit(X_train, y_train)
-            pred = model.predict([list_data])
-            accuracy = model.score(X_test, y_test) * 100
-            predictions[name] = pred[0]
-            accuracies[name] = accuracy
-            print(f"{name} Accuracy: {accuracy:.2f}%")
-        
-        # Use the model with highest accuracy
-        best_model_name = max(accuracies, key=accuracies.get)
-        best_accuracy = accuracies[best_model_name]
-        final_prediction = predictions[best_model_name]
-        
-        print(f"\nBest Model: {best_model_name}")
-        print(f"Best Accuracy: {best_accuracy:.2f}%")
-        print(f"Predicted Value: {final_prediction}")
-        
-        return best_accuracy, np.array([final_prediction])
+def model_status(request):
+    """
+    Readiness of the heart disease models (200 ready, 503 not), usable as a
+    health check; staff users also get the load statistics of the models,
+    caches, training job and ECG queue
+    """
+    model_registry.get()
+    code = 200 if model_registry.is_ready() else 503
+    if not request.user.is_staff:
+        return JsonResponse({'ready': code == 200}, status=code)
+    status = model_registry.status()
+    status['shadow_agreement'] = shadow_scorer.agreement()
+    status['prediction_cache'] = prediction_cache.stats()
+    status['training'] = background_trainer.status()
+    ecg_registry.get()
+    status['ecg'] = ecg_registry.status()
+    status['ecg_queue'] = queue_stats()
+    status['ecg_dedup'] = dedup_stats()
+    return JsonResponse(status, status=code)
 
 @login_required(login_url="login")
 def add_doctor(request,pid=None):
@@ -292,36 +274,19 @@ def add_doctor(request,pid=None):
 def add_heartdetail(request):
     if request.method == "POST":
         # list_data = [57, 0, 1, 130, 236, 0, 0, 174, 0, 0.0, 1, 1, 2]
-        list_data = []
-        value_dict = eval(str(request.POST)[12:-1])
-        count = 0
-        for key,value in value_dict.items():
-            if count == 0:
-                count =1
-                continue
-            if key == "sex" and value[0] == "Male" or value[0] == 'male' or value[0]=='m' or value[0] == 'M':
-                list_data.append(0)
-                continue
-            elif key == "sex":
-                list_data.append(1)
-                continue
-            # Convert string values to numeric (int or float)
-            try:
-                # Try to convert to float first (handles both int and float values)
-                numeric_value = float(value[0])
-                # If it's a whole number, convert to int
-                if numeric_value.is_integer():
-                    list_data.append(int(numeric_value))
-                else:
-                    list_data.append(numeric_value)
-            except (ValueError, TypeError):
-                # If conversion fails, append as is (shouldn't happen with valid input)
-                list_data.append(value[0])
-
-        # list_data = [57, 0, 1, 130, 236, 0, 0, 174, 0, 0.0, 1, 1, 2]
-        accuracy,pred = prdict_heart_disease(list_data)
+        try:
+            row = parse_row(request.POST)
+        except FeatureValidationError as e:
+            return render(request, 'add_heartdetail.html', {'error': 'Please correct the following values:',
+                                                            'field_errors': e.errors})
+        try:
+            accuracy,pred = prdict_heart_disease(row)
+        except ModelWarmingError as e:
+            return render(request, 'add_heartdetail.html', {'error': str(e)})
         patient = Patient.objects.get(user=request.user)
-        Search_Data.objects.create(patient=patient, prediction_accuracy=accuracy, result=pred[0], values_list=list_data)
+        # post_save updates the analytics summary (signals.py); keep both in one transaction
+        with transaction.atomic():
+            Search_Data.objects.create(patient=patient, prediction_accuracy=accuracy, result=int(pred[0]), features=pack_row(row))
         rem = int(pred[0])
         print("Result = ",rem)
         if pred[0] == 0:
@@ -375,6 +340,23 @@ def delete_searched(request,pid):
     doc.delete()
     return redirect('view_search_pat')
 
+@login_required(login_url="login")
+def confirm_outcome(request,pid):
+    """Approved doctors record the diagnosed outcome of a prediction; incremental.py learns from it"""
+    if request.method != "POST" or not Doctor.objects.filter(user=request.user, status=1).exists():
+        return redirect('view_search_pat')
+    outcome = request.POST.get('outcome')
+    if outcome in ('0', '1'):
+        # Confirming the same outcome again must not re-stamp confirmed_at,
+        # which would make the incremental update learn the case twice
+        changed = (Search_Data.objects.filter(id=pid).exclude(confirmed_result=int(outcome))
+                   .update(confirmed_result=int(outcome), confirmed_at=timezone.now()))
+        if changed:
+            messages.success(request, 'Outcome confirmed.')
+        else:
+            messages.info(request, 'This outcome was already confirmed.')
+    return redirect('view_search_pat')
+
 @login_required(login_url="login")
 def View_Doctor(request):
     doc = Doctor.objects.all()
@@ -495,23 +477,28 @@ def upload_ecg(request):
     error = ""
     if request.method == "POST" and request.FILES.get('ecg_image'):
         try:
-            from .ecg_predictor import ECGPredictor
+            from .ecg_predictor import shared_predictor
             
             # Get uploaded file
             ecg_file = request.FILES['ecg_image']
             
-            # Save temporarily
+            # Save the upload as a pending analysis; a repeated image reuses the
+            # stored file and the current model version's result (ecg_dedup.py)
             patient = Patient.objects.get(user=request.user)
-            ecg_record = ECG_Prediction.objects.create(
-                patient=patient,
-                ecg_image=ecg_file
-            )
+            loaded = ecg_registry.get()
+            ecg_record = ingest(ECG_Prediction(patient=patient), ecg_file,
+                                version=loaded.version if loaded is not None else None)
+            
+            # A queue worker (ecg_queue.py) analyses it; the result page shows the progress
+            if settings.ECG_ASYNC_ANALYSIS or ecg_record.is_finished:
+                return redirect('ecg_result', ecg_record.id)
             
             # Get file path
             ecg_image_path = ecg_record.ecg_image.path
             
-            # Process ECG
-            predictor = ECGPredictor()
+            # Process ECG (models stay loaded in the process-wide ECG registry)
+            predictor = shared_predictor()
+            ecg_record.started_at = timezone.now()
             result = predictor.predict_from_ecg_image(ecg_image_path)
             
             if result['success']:
@@ -520,6 +507,9 @@ def upload_ecg(request):
                 ecg_record.prediction_label = result['prediction_label']
                 ecg_record.prediction_message = result['prediction_message']
                 ecg_record.confidence = result.get('confidence')
+                ecg_record.model_version = predictor.loaded_models().version
+                ecg_record.status = ECG_Prediction.STATUS_DONE
+                ecg_record.finished_at = timezone.now()
                 ecg_record.save()
                 
                 # Redirect to result page
@@ -546,7 +536,9 @@ def ecg_result(request, ecg_id):
         
         d = {
             'ecg_record': ecg_record,
-            'doctors': doctors
+            'doctors': doctors,
+            # Place in the queue while the analysis has not started
+            'queue_position': queue_position(ecg_record),
         }
         return render(request, 'ecg_result.html', d)
     
@@ -3,3 +3,5 @@ from health import api_views as hire_viewed
 
 routerep = routers.DefaultRouter()
 routerep.register(r'patient', hire_viewed.PatientViewset)
+routerep.register(r'predict-batch', hire_viewed.BatchPredictionViewSet, basename='predict-batch')
+routerep.register(r'ecg-predict-batch', hire_viewed.ECGBatchPredictionViewSet, basename='ecg-predict-batch')
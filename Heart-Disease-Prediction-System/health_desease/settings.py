@@ -40,6 +40,36 @@ ALLOWED_HOSTS = ['*']
 # Google Maps API Key
 GOOGLE_MAPS_API_KEY = os.getenv('GOOGLE_MAPS_API_KEY', '')
 
+# Score the non-selected heart disease models in the background and track
+# how often they agree with the served prediction
+SHADOW_SCORING = os.getenv('SHADOW_SCORING', 'True') == 'True'
+SHADOW_SCORING_WORKERS = int(os.getenv('SHADOW_SCORING_WORKERS', '1'))
+
+# ECG analysis
+# The 12 leads of an uploaded ECG are extracted concurrently on a thread pool
+# shared by the worker process; one image never uses more than this many
+# threads at a time (1 extracts the leads one after another).
+ECG_LEAD_WORKERS = int(os.getenv('ECG_LEAD_WORKERS', str(min(4, os.cpu_count() or 1))))
+# Set to True to decode JPEG uploads at least twice the working resolution
+# at 1/2, 1/4 or 1/8 scale in grayscale instead of full-size RGB. This saves
+# time and memory but moves the extracted features (up to ~0.19 on a 0-1
+# scale), and the ECG models were trained on full decodes: enable it only
+# after `benchmark_ecg_pipeline.py --only decode` and a comparison of the
+# predictions on your own scans show no change.
+ECG_REDUCED_DECODE = os.getenv('ECG_REDUCED_DECODE', 'False') == 'True'
+# Images of one batch API request (/api/v1/ecg-predict-batch/) are
+# extracted concurrently on this many threads.
+ECG_BATCH_WORKERS = int(os.getenv('ECG_BATCH_WORKERS', str(min(4, os.cpu_count() or 1))))
+# True queues uploads from the ECG page for `python manage.py
+# process_ecg_queue` instead of analysing them inside the request. Off by
+# default so `runserver` works without a queue worker; gunicorn.conf.py
+# turns it on when it starts the workers itself (ECG_QUEUE_WORKERS > 0).
+# Set it to True explicitly when the queue runs as a separate service.
+ECG_ASYNC_ANALYSIS = os.getenv('ECG_ASYNC_ANALYSIS', 'False') == 'True'
+# A job in progress for longer than this is assumed to belong to a worker
+# that died and is queued again.
+ECG_QUEUE_STALE_SECONDS = int(os.getenv('ECG_QUEUE_STALE_SECONDS', '300'))
+
 # Base URL for Twilio callbacks (use ngrok URL for local development with AI conversation)
 BASE_URL = os.getenv('BASE_URL', 'https://1ccc533a786f.ngrok-free.app')
 
@@ -101,6 +131,51 @@ DATABASES = {
 }
 
 
+# Model training
+# Uploaded training CSVs are ingested in chunks into trained_models/datasets/;
+# training samples at most this many rows from the store to bound memory.
+
+TRAINING_MAX_ROWS = int(os.getenv('TRAINING_MAX_ROWS', '1000000'))
+# After a failed training job, predictions report its error for this many
+# seconds before the next request starts another attempt.
+TRAINING_RETRY_SECONDS = int(os.getenv('TRAINING_RETRY_SECONDS', '300'))
+# Every publish (retrain or incremental update) writes a full copy of the
+# models to trained_models/versions/<version>/; older copies are deleted.
+MODEL_VERSIONS_KEPT = int(os.getenv('MODEL_VERSIONS_KEPT', '5'))
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+# The 'predictions' cache holds heart disease prediction results: Redis,
+# shared by all gunicorn workers, when REDIS_URL is set (configure it with
+# maxmemory-policy allkeys-lru), otherwise an in-memory LRU cache per worker
+# (a shared file-based cache was slower than scoring the model).
+
+PREDICTION_CACHE_TIMEOUT = int(os.getenv('PREDICTION_CACHE_TIMEOUT', '3600'))
+PREDICTION_CACHE_MAX_ENTRIES = int(os.getenv('PREDICTION_CACHE_MAX_ENTRIES', '10000'))
+
+if os.getenv('REDIS_URL'):
+    PREDICTION_CACHE = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('REDIS_URL'),
+        'TIMEOUT': PREDICTION_CACHE_TIMEOUT,
+    }
+else:
+    PREDICTION_CACHE = {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'predictions',
+        'TIMEOUT': PREDICTION_CACHE_TIMEOUT,
+        'OPTIONS': {'MAX_ENTRIES': PREDICTION_CACHE_MAX_ENTRIES},
+    }
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'predictions': PREDICTION_CACHE,
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
 
@@ -29,6 +29,7 @@ urlpatterns = [
     path('patient_home', User_Home,name="patient_home"),
     path('doctor_home', Doctor_Home,name="doctor_home"),
     path('admin_home', Admin_Home,name="admin_home"),
+    path('admin_analytics', admin_analytics,name="admin_analytics"),
     path('gallery', Gallery,name="gallery"),
     path('login', Login_User,name="login"),
     path('login_admin', Login_admin,name="login_admin"),
@@ -37,6 +38,7 @@ urlpatterns = [
     path('change_password', Change_Password,name="change_password"),
     # path('prdict_heart_disease', prdict_heart_disease,name="prdict_heart_disease"),
     path('add_heartdetail', add_heartdetail,name="add_heartdetail"),
+    path('model_status', model_status,name="model_status"),
     path('view_search_pat', view_search_pat,name="view_search_pat"),
 
     path('view_doctor', View_Doctor,name="view_doctor"),
@@ -49,6 +51,7 @@ urlpatterns = [
     path('sent_feedback', sent_feedback,name="sent_feedback"),
 
     path('delete_searched/<int:pid>', delete_searched, name="delete_searched"),
+    path('confirm_outcome/<int:pid>', confirm_outcome, name="confirm_outcome"),
     path('delete_doctor<int:pid>', delete_doctor, name="delete_doctor"),
     path('assign_status<int:pid>', assign_status, name="assign_status"),
     path('delete_patient<int:pid>', delete_patient, name="delete_patient"),
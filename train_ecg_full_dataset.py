@@ -62,18 +62,11 @@ for category_folder, label in categories.items():
         try:
             image_path = os.path.join(category_path, image_file)
             
-            # Create temp workspace
-            predictor.create_temp_workspace()
-            
             # Process image through ECG pipeline
-            ecg_image = predictor.get_image(image_path)
-            gray_image = predictor.gray_image(ecg_image)
-            leads = predictor.divide_leads(gray_image)
-            predictor.signal_extraction_scaling(leads)
-            combined_signal = predictor.combine_convert_1d_signal()
+            combined_signal = predictor.extract_features(image_path)
             
             # Get features (should be 3060)
-            features = combined_signal.values.flatten()
+            features = combined_signal.flatten()
             
             if len(features) == 3060:
                 all_features.append(features)
@@ -82,16 +75,12 @@ for category_folder, label in categories.items():
             else:
                 error_count += 1
             
-            # Cleanup
-            predictor.cleanup_temp_workspace()
-            
             # Progress update every 100 images
             if (idx + 1) % 100 == 0:
                 print(f"   Processed {idx + 1}/{len(image_files)} images...")
                 
         except Exception as e:
             error_count += 1
-            predictor.cleanup_temp_workspace()
             if error_count < 5:  # Only show first few errors
                 print(f"   ⚠️  Error processing {image_file}: {str(e)[:50]}")
             continue